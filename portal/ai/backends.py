@@ -0,0 +1,163 @@
+"""Backends that create the pipelines ``ImageGenerator`` runs.
+
+``ImageGenerator`` only relies on the diffusers pipeline call convention:
+a pipeline is called with sizes, step counts and ``callback_on_step_end``,
+checks ``_interrupt`` between steps and returns an object with ``images``.
+A backend decides how such pipelines are made. The default diffusers
+backend lives in ``portal.ai.image_generator``; ``StubBackend`` here makes
+deterministic CPU pipelines that follow the same convention without torch
+or model weights, for tests and for benchmarking the code around the model.
+Select it with ``"backend": "stub"`` in ``portal/ai/config.json``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+from portal.ai.latent_preview import LATENT_SCALE, latents_to_image
+from portal.ai.pipeline_cache import pipeline_mode
+
+
+class DiffusionBackend(ABC):
+    """Creates pipelines for ``ImageGenerator``."""
+
+    name = "base"
+
+    def unavailable_reason(self, check_cuda: bool = True) -> tuple[str, str] | None:
+        """``(title, message)`` explaining why generation cannot run, if it cannot."""
+
+        return None
+
+    @abstractmethod
+    def create_pipeline(
+        self,
+        model_name: str,
+        model_cfg: dict,
+        is_img2img: bool,
+        is_inpaint: bool,
+        sibling=None,
+    ):
+        """Return ``(pipeline, source)``; ``source`` is ``"derived"`` or ``"disk"``.
+
+        ``sibling`` is a cached pipeline of the same model in another mode
+        whose weights may be shared.
+        """
+
+        raise NotImplementedError
+
+
+class StubPipeline:
+    """Deterministic CPU stand-in for a diffusers pipeline.
+
+    Latents start from noise seeded by the prompt (or the ``generator``
+    seeds) and move towards a seeded target on every step, so previews
+    change over time and the same request always gives the same images.
+    img2img runs ``steps * strength`` steps and blends with the input, and
+    inpainting only changes the masked pixels. ``step_seconds`` adds a sleep
+    per step to imitate a real model.
+    """
+
+    def __init__(self, model_name: str, mode: str, step_seconds: float = 0.0) -> None:
+        self.model_name = model_name
+        self.mode = mode
+        self.step_seconds = max(0.0, float(step_seconds))
+        self.device = "cpu"
+        self.components: dict = {}
+        self._interrupt = False
+        self.steps_run = 0
+
+    @classmethod
+    def from_pipe(cls, pipe: "StubPipeline", mode: str) -> "StubPipeline":
+        return cls(pipe.model_name, mode, pipe.step_seconds)
+
+    @staticmethod
+    def _seeds(prompt, generator, count: int) -> list[int]:
+        generators = generator if isinstance(generator, (list, tuple)) else [generator] * count
+        seeds = []
+        for index, item in enumerate(generators[:count]):
+            initial_seed = getattr(item, "initial_seed", None)
+            if callable(initial_seed):
+                seeds.append(int(initial_seed()))
+                continue
+            digest = hashlib.sha256(f"{prompt}:{index}".encode("utf-8")).digest()
+            seeds.append(int.from_bytes(digest[:8], "little"))
+        return seeds
+
+    def __call__(
+        self,
+        prompt=None,
+        *,
+        image: Image.Image | None = None,
+        mask_image: Image.Image | None = None,
+        strength: float = 1.0,
+        num_inference_steps: int = 20,
+        width: int | None = None,
+        height: int | None = None,
+        num_images_per_prompt: int = 1,
+        generator=None,
+        callback_on_step_end=None,
+        **_kwargs,
+    ):
+        self._interrupt = False
+        self.steps_run = 0
+        if image is not None:
+            width = width or image.width
+            height = height or image.height
+        width, height = int(width or 512), int(height or 512)
+        steps = max(1, int(num_inference_steps))
+        if image is not None:
+            steps = max(1, int(steps * min(1.0, max(0.0, float(strength)))))
+
+        count = max(1, int(num_images_per_prompt))
+        shape = (4, max(1, height // LATENT_SCALE), max(1, width // LATENT_SCALE))
+        starts, targets = [], []
+        for seed in self._seeds(prompt, generator, count):
+            rng = np.random.default_rng(seed)
+            starts.append(rng.standard_normal(shape, dtype=np.float32))
+            targets.append(rng.uniform(-1.5, 1.5, (4, 1, 1)).astype(np.float32) * np.ones(shape, np.float32))
+        latents, target = np.stack(starts), np.stack(targets)
+
+        for step in range(steps):
+            if self._interrupt:
+                break
+            latents = latents + (target - latents) / (steps - step)
+            if self.step_seconds:
+                time.sleep(self.step_seconds)
+            self.steps_run = step + 1
+            if callback_on_step_end is not None:
+                callback_on_step_end(self, step, 1000 * (steps - step) // steps, {"latents": latents})
+
+        images = []
+        for latent in latents:
+            result = latents_to_image(latent, self.model_name, upscale=False)
+            result = result.resize((width, height), Image.Resampling.NEAREST)
+            if image is not None:
+                source = image.convert("RGB").resize((width, height), Image.Resampling.NEAREST)
+                if mask_image is not None:
+                    mask = mask_image.convert("L").resize((width, height), Image.Resampling.NEAREST)
+                    result = Image.composite(result, source, mask)
+                else:
+                    result = Image.blend(source, result, min(1.0, max(0.0, float(strength))))
+            images.append(result)
+        return SimpleNamespace(images=images)
+
+
+class StubBackend(DiffusionBackend):
+    """Creates ``StubPipeline`` objects; never needs torch or weights."""
+
+    name = "stub"
+
+    def __init__(self, step_seconds: float = 0.0) -> None:
+        self.step_seconds = step_seconds
+
+    def create_pipeline(self, model_name, model_cfg, is_img2img, is_inpaint, sibling=None):
+        mode = pipeline_mode(is_img2img, is_inpaint)
+        if isinstance(sibling, StubPipeline):
+            return StubPipeline.from_pipe(sibling, mode), "derived"
+        return StubPipeline(model_name, mode, self.step_seconds), "disk"
@@ -0,0 +1,333 @@
+"""Queued generation jobs and an on-disk cache of their results.
+
+A ``GenerationJob`` holds everything one generation request needs, so jobs
+can wait in a ``JobQueue`` while the user keeps editing. The queue is
+ordered by priority, first in first out within a priority, and can be
+reordered or have jobs cancelled while they wait. A running job is
+cancelled through the generator's ``cancellation_token``.
+
+Jobs queued without a seed get a random one when they are queued, so every
+result can be reproduced. Results are deterministic for a given seed, so
+``ResultCache`` stores them under a hash of the job parameters and input
+images; running an identical job again reads the images back instead of
+generating them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import os
+import random
+import threading
+from dataclasses import dataclass, field
+
+from PIL import Image
+
+from portal.ai.enums import GenerationMode
+
+DEFAULT_RESULT_CACHE_ENTRIES = 200
+# Seeds drawn for "random" jobs fit the seed field of the AI panel.
+MAX_SEED = 2**31 - 1
+
+_job_ids = itertools.count(1)
+
+
+@dataclass
+class GenerationJob:
+    """One queued generation request."""
+
+    mode: GenerationMode
+    prompt: str
+    model_name: str
+    negative_prompt: str | None = None
+    seed: int | None = None
+    original_size: tuple[int, int] | None = None
+    generation_size: tuple[int, int] | None = None
+    num_inference_steps: int | None = None
+    guidance_scale: float | None = None
+    strength: float | None = None
+    image: Image.Image | None = None
+    mask_image: Image.Image | None = None
+    remove_background: bool = False
+    num_images: int = 1
+    preview_mode: str | None = None
+    preview_interval: int | None = None
+    crop_to_mask: bool | None = None
+    palette: tuple[str, ...] | None = None
+    priority: int = 0
+    job_id: int = field(default_factory=lambda: next(_job_ids))
+    cancelled: bool = field(default=False, compare=False)
+
+    @property
+    def is_img2img(self) -> bool:
+        return self.mode == GenerationMode.IMAGE_TO_IMAGE
+
+    @property
+    def is_inpaint(self) -> bool:
+        return self.is_img2img and self.mask_image is not None
+
+    @property
+    def expected_steps(self) -> int:
+        """Denoising steps the pipeline will run; img2img skips part of them."""
+
+        steps = int(self.num_inference_steps or 0)
+        if self.is_img2img and self.strength is not None:
+            steps = int(steps * min(1.0, max(0.0, float(self.strength))))
+        return max(1, steps)
+
+    @property
+    def cacheable(self) -> bool:
+        # Unseeded jobs draw fresh noise, so their results cannot be reused.
+        return self.seed is not None
+
+    def resolve_seed(self) -> int:
+        """Replace a missing seed with a random one and return the seed."""
+
+        if self.seed is None:
+            self.seed = random.randint(0, MAX_SEED)
+        return self.seed
+
+    def describe(self) -> str:
+        prompt = self.prompt if len(self.prompt) <= 32 else self.prompt[:31] + "…"
+        kind = "inpaint" if self.is_inpaint else "img2img" if self.is_img2img else "txt2img"
+        count = f" ×{self.num_images}" if self.num_images > 1 else ""
+        seed = f" seed {self.seed}" if self.seed is not None else ""
+        return f"#{self.job_id} {kind}{count}{seed}: {prompt}"
+
+    def cache_key(self, model_path: str | None = None, settings: dict | None = None) -> str:
+        """Hash of everything that determines the result of this job.
+
+        ``settings`` are the generator-wide options that change results, as
+        returned by ``ImageGenerator.result_settings``, so cached images are
+        not reused after the configuration changes.
+        """
+
+        parameters = {
+            "mode": self.mode.name,
+            "is_inpaint": self.is_inpaint,
+            "prompt": self.prompt,
+            "negative_prompt": self.negative_prompt,
+            "model": self.model_name,
+            "model_path": model_path,
+            "seed": self.seed,
+            "original_size": list(self.original_size) if self.original_size else None,
+            "generation_size": list(self.generation_size) if self.generation_size else None,
+            "num_inference_steps": self.num_inference_steps,
+            "guidance_scale": self.guidance_scale,
+            "strength": self.strength if self.is_img2img else None,
+            "remove_background": self.remove_background,
+            "num_images": self.num_images,
+            "crop_to_mask": self.crop_to_mask if self.is_inpaint else None,
+            "palette": list(self.palette) if self.palette else None,
+            "settings": settings or {},
+        }
+        digest = hashlib.sha256(json.dumps(parameters, sort_keys=True).encode("utf-8"))
+        for image in (self.image, self.mask_image):
+            if image is None:
+                digest.update(b"-")
+                continue
+            digest.update(f"{image.mode}:{image.width}x{image.height}:".encode("ascii"))
+            digest.update(image.tobytes())
+        return digest.hexdigest()
+
+
+def run_job(generator, job: GenerationJob, *, step_callback=None, progress_callback=None, cancellation_token=None):
+    """Run ``job`` on an ``ImageGenerator`` whose pipeline is already loaded."""
+
+    common = {
+        "negative_prompt": job.negative_prompt,
+        "num_inference_steps": job.num_inference_steps,
+        "guidance_scale": job.guidance_scale,
+        "step_callback": step_callback,
+        "cancellation_token": cancellation_token,
+        "remove_background": job.remove_background,
+        "preview_mode": job.preview_mode,
+        "preview_interval": job.preview_interval,
+        "num_images_per_prompt": job.num_images,
+        "seed": job.seed,
+        "progress_callback": progress_callback,
+        "generation_size": job.generation_size,
+        "palette": job.palette,
+    }
+    if job.is_inpaint:
+        return generator.inpaint_image(
+            job.image,
+            job.mask_image,
+            job.prompt,
+            strength=job.strength,
+            crop_to_mask=job.crop_to_mask,
+            **common,
+        )
+    if job.is_img2img:
+        return generator.image_to_image(job.image, job.prompt, strength=job.strength, **common)
+    return generator.prompt_to_image(job.prompt, original_size=job.original_size, **common)
+
+
+class JobQueue:
+    """Thread-safe priority queue of pending jobs that can be reordered."""
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._pending: list[GenerationJob] = []
+        self._closed = False
+        self.running: GenerationJob | None = None
+
+    def put(self, job: GenerationJob) -> int:
+        job.resolve_seed()
+        with self._condition:
+            self._insert(job)
+            self._condition.notify()
+        return job.job_id
+
+    def _insert(self, job: GenerationJob) -> None:
+        index = len(self._pending)
+        while index and self._pending[index - 1].priority < job.priority:
+            index -= 1
+        self._pending.insert(index, job)
+
+    def take(self, timeout: float | None = None) -> GenerationJob | None:
+        """Wait for the next job and mark it running; ``None`` once closed."""
+
+        with self._condition:
+            while not self._pending and not self._closed:
+                if not self._condition.wait(timeout):
+                    return None
+            if self._closed:
+                return None
+            self.running = self._pending.pop(0)
+            return self.running
+
+    def task_done(self, job: GenerationJob) -> None:
+        with self._condition:
+            if self.running is job:
+                self.running = None
+
+    def pending(self) -> list[GenerationJob]:
+        with self._condition:
+            return list(self._pending)
+
+    def _find(self, job_id: int) -> GenerationJob | None:
+        for job in self._pending:
+            if job.job_id == job_id:
+                return job
+        return None
+
+    def cancel(self, job_id: int) -> bool:
+        """Drop a pending job or flag the running one; ``False`` if unknown."""
+
+        with self._condition:
+            job = self._find(job_id)
+            if job is not None:
+                self._pending.remove(job)
+            elif self.running is not None and self.running.job_id == job_id:
+                job = self.running
+            else:
+                return False
+            job.cancelled = True
+            return True
+
+    def move(self, job_id: int, index: int) -> bool:
+        """Move a pending job to ``index``; it takes that neighbour's priority."""
+
+        with self._condition:
+            job = self._find(job_id)
+            if job is None:
+                return False
+            self._pending.remove(job)
+            index = max(0, min(int(index), len(self._pending)))
+            if self._pending:
+                neighbour = self._pending[min(index, len(self._pending) - 1)]
+                job.priority = neighbour.priority
+            self._pending.insert(index, job)
+            return True
+
+    def set_priority(self, job_id: int, priority: int) -> bool:
+        with self._condition:
+            job = self._find(job_id)
+            if job is None:
+                return False
+            self._pending.remove(job)
+            job.priority = int(priority)
+            self._insert(job)
+            return True
+
+    def close(self) -> None:
+        """Cancel everything and release any thread waiting in ``take``."""
+
+        with self._condition:
+            for job in self._pending:
+                job.cancelled = True
+            self._pending.clear()
+            if self.running is not None:
+                self.running.cancelled = True
+            self._closed = True
+            self._condition.notify_all()
+
+
+class ResultCache:
+    """Generated images stored as PNG files under the job's cache key."""
+
+    def __init__(self, directory: str, max_entries: int = DEFAULT_RESULT_CACHE_ENTRIES) -> None:
+        self.directory = directory
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+
+    def _manifest_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _image_path(self, key: str, index: int) -> str:
+        return os.path.join(self.directory, f"{key}_{index}.png")
+
+    def get(self, key: str) -> list[Image.Image] | None:
+        manifest = self._manifest_path(key)
+        # Locked so a concurrent ``put`` cannot prune or rewrite the entry
+        # between reading the manifest and its images.
+        with self._lock:
+            try:
+                with open(manifest, "r", encoding="utf-8") as handle:
+                    count = int(json.load(handle)["images"])
+                images = []
+                for index in range(count):
+                    with Image.open(self._image_path(key, index)) as image:
+                        image.load()
+                        images.append(image.copy())
+                os.utime(manifest)
+            except (OSError, ValueError, KeyError, TypeError):
+                return None
+        return images
+
+    def put(self, key: str, images: list[Image.Image]) -> None:
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            for index, image in enumerate(images):
+                image.save(self._image_path(key, index), format="PNG")
+            # The manifest is written last, so a partial entry is never read.
+            temp_path = self._manifest_path(key) + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                json.dump({"images": len(images)}, handle)
+            os.replace(temp_path, self._manifest_path(key))
+            self._prune()
+
+    def _prune(self) -> None:
+        manifests = [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(".json")
+        ]
+        if len(manifests) <= self.max_entries:
+            return
+        manifests.sort(key=os.path.getmtime)
+        for manifest in manifests[: len(manifests) - self.max_entries]:
+            key = os.path.basename(manifest)[: -len(".json")]
+            try:
+                with open(manifest, "r", encoding="utf-8") as handle:
+                    count = int(json.load(handle)["images"])
+            except (OSError, ValueError, KeyError, TypeError):
+                count = 0
+            for path in [manifest] + [self._image_path(key, index) for index in range(count)]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
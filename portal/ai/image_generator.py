@@ -3,30 +3,68 @@ import importlib.util
 import json
 import math
 import os
-from dataclasses import dataclass
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
 from datetime import datetime
 from fractions import Fraction
 from typing import Any, TYPE_CHECKING
 
 from PIL import Image
 
+from portal.ai.backends import DiffusionBackend, StubBackend
+from portal.ai.inpaint_crop import (
+    DEFAULT_CONTEXT_MARGIN,
+    MaskCropCache,
+    binarize_mask,
+    paste_masked,
+)
+from portal.ai.latent_preview import (
+    DEFAULT_PREVIEW_INTERVAL,
+    DEFAULT_PREVIEW_MODE,
+    make_step_callback,
+)
+from portal.ai.output_writer import OutputWriter
+from portal.ai.pipeline_cache import (
+    DEFAULT_MAX_MEMORY_MB,
+    DEFAULT_MAX_PIPELINES,
+    PipelineCache,
+    PipelineLoad,
+    pipeline_mode,
+)
+from portal.ai.pixel_art import PixelArtOptions, pixelate
+
 
 if TYPE_CHECKING:  # pragma: no cover - imported for type checking only
     import torch as torch_module  # noqa: F401
 
 
-def _import_optional_module(name: str) -> Any | None:
-    """Return the imported module when available, otherwise ``None``."""
+def _module_available(name: str) -> bool:
+    """Return ``True`` when ``name`` can be imported, without importing it."""
 
-    spec = importlib.util.find_spec(name)
-    if spec is None:
-        return None
-    return importlib.import_module(name)
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
 
 
-torch = _import_optional_module("torch")
-_diffusers_module = _import_optional_module("diffusers")
-_rembg_module = _import_optional_module("rembg")
+# torch, diffusers and rembg take seconds and hundreds of MB to import, so
+# only their presence is checked here; they are imported on first use.
+_OPTIONAL_MODULES: dict[str, Any] = {}
+
+
+def _import_optional_module(name: str) -> Any | None:
+    """Import ``name`` on first use; ``None`` when missing or broken."""
+
+    if name not in _OPTIONAL_MODULES:
+        module = None
+        if _module_available(name):
+            try:
+                module = importlib.import_module(name)
+            except Exception as exc:  # broken installs, missing native libs
+                print(f"Unable to import {name}: {exc}")
+        _OPTIONAL_MODULES[name] = module
+    return _OPTIONAL_MODULES[name]
 
 
 PIPELINE_CLASS_NAMES = (
@@ -38,21 +76,28 @@ PIPELINE_CLASS_NAMES = (
     "StableDiffusionXLInpaintPipeline",
 )
 
-_PIPELINES: dict[str, Any] = {}
-if _diffusers_module is not None:
-    for class_name in PIPELINE_CLASS_NAMES:
-        _PIPELINES[class_name] = getattr(_diffusers_module, class_name, None)
+REMBG_AVAILABLE = _module_available("rembg")
+
 
-StableDiffusionPipeline = _PIPELINES.get("StableDiffusionPipeline")
-StableDiffusionImg2ImgPipeline = _PIPELINES.get("StableDiffusionImg2ImgPipeline")
-StableDiffusionInpaintPipeline = _PIPELINES.get("StableDiffusionInpaintPipeline")
-StableDiffusionXLPipeline = _PIPELINES.get("StableDiffusionXLPipeline")
-StableDiffusionXLImg2ImgPipeline = _PIPELINES.get("StableDiffusionXLImg2ImgPipeline")
-StableDiffusionXLInpaintPipeline = _PIPELINES.get("StableDiffusionXLInpaintPipeline")
+def _pipeline_class(class_name: str) -> Any | None:
+    diffusers = _import_optional_module("diffusers")
+    return getattr(diffusers, class_name, None)
 
 
-rembg_remove = getattr(_rembg_module, "remove", None)
-REMBG_AVAILABLE = callable(rembg_remove)
+def _rembg_remove():
+    return getattr(_import_optional_module("rembg"), "remove", None)
+
+
+def __getattr__(name: str) -> Any:
+    # ``torch``, the pipeline classes and ``rembg_remove`` used to be module
+    # globals; resolve them lazily for code that still looks them up here.
+    if name == "torch":
+        return _import_optional_module("torch")
+    if name in PIPELINE_CLASS_NAMES:
+        return _pipeline_class(name)
+    if name == "rembg_remove":
+        return _rembg_remove()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 @dataclass(frozen=True)
@@ -70,12 +115,19 @@ MODEL_DIMENSION_CONSTRAINTS: dict[str, DimensionConstraints] = {
 
 ASPECT_RATIO_DENOMINATOR_LIMIT = 64
 
+PROMPT_EMBED_CACHE_SIZE = 8
+
 
 def is_torch_available() -> bool:
-    return torch is not None
+    return _module_available("torch")
 
 
 def is_cuda_available() -> bool:
+    """Whether torch sees a CUDA device; imports torch."""
+
+    if not is_torch_available():
+        return False
+    torch = _import_optional_module("torch")
     return bool(
         torch is not None
         and hasattr(torch, "cuda")
@@ -85,25 +137,130 @@ def is_cuda_available() -> bool:
 
 
 def is_diffusers_available() -> bool:
-    return _diffusers_module is not None and all(
-        _PIPELINES.get(name) is not None for name in PIPELINE_CLASS_NAMES
-    )
+    return _module_available("diffusers")
 
 
 def generation_dependencies_ready() -> bool:
     return is_torch_available() and is_diffusers_available()
 
 
+class DiffusersBackend(DiffusionBackend):
+    """Loads Stable Diffusion checkpoints with diffusers on CUDA or CPU."""
+
+    name = "diffusers"
+
+    def unavailable_reason(self, check_cuda: bool = True) -> tuple[str, str] | None:
+        title = "AI Dependencies Missing"
+        if not is_torch_available():
+            return title, "PyTorch is not installed. Install torch to enable AI features."
+        if not is_diffusers_available():
+            return title, (
+                "diffusers is not installed or missing required pipelines. Install diffusers to enable AI features."
+            )
+        if check_cuda and not is_cuda_available():
+            return "CUDA Not Available", "CUDA is not available. AI features will be disabled."
+        return None
+
+    def create_pipeline(self, model_name, model_cfg, is_img2img, is_inpaint, sibling=None):
+        if not is_torch_available():
+            raise RuntimeError(
+                "PyTorch is not installed. Install torch to enable AI image generation."
+            )
+        if not is_diffusers_available():
+            raise RuntimeError(
+                "diffusers is not installed or missing required pipelines. Install diffusers to enable AI image generation."
+            )
+
+        torch = _import_optional_module("torch")
+        if torch is None:
+            raise RuntimeError("PyTorch could not be imported.")
+        device = "cuda" if is_cuda_available() else "cpu"
+        torch_dtype = torch.float16 if device == "cuda" else torch.float32
+
+        pipeline_params = {
+            "torch_dtype": torch_dtype,
+            "use_safetensors": True,
+        }
+        if "clip_skip" in model_cfg:
+            pipeline_params["clip_skip"] = model_cfg["clip_skip"]
+
+        pipeline_class = None
+        model_key = str(model_name).strip().upper()
+        if model_key == "SDXL":
+            if is_inpaint:
+                pipeline_class = _pipeline_class("StableDiffusionXLInpaintPipeline")
+            elif is_img2img:
+                pipeline_class = _pipeline_class("StableDiffusionXLImg2ImgPipeline")
+            else:
+                pipeline_class = _pipeline_class("StableDiffusionXLPipeline")
+        elif model_key in {"SD1.5", "SD15"}:
+            if is_inpaint:
+                pipeline_class = _pipeline_class("StableDiffusionInpaintPipeline")
+            elif is_img2img:
+                pipeline_class = _pipeline_class("StableDiffusionImg2ImgPipeline")
+            else:
+                pipeline_class = _pipeline_class("StableDiffusionPipeline")
+        else:
+            raise ValueError("Invalid model name")
+
+        if pipeline_class is None:
+            raise RuntimeError(
+                "The requested diffusion pipeline is unavailable. Update diffusers to a version that provides the required pipelines."
+            )
+
+        if sibling is not None and hasattr(pipeline_class, "from_pipe"):
+            return pipeline_class.from_pipe(sibling), "derived"
+
+        print(f"Loading {model_name} AI pipeline...")
+        pipe = pipeline_class.from_single_file(
+            model_cfg["path"],
+            **pipeline_params,
+        ).to(device)
+        return pipe, "disk"
+
+
+BACKENDS: dict[str, type[DiffusionBackend]] = {
+    DiffusersBackend.name: DiffusersBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+def create_backend(name: str | None) -> DiffusionBackend:
+    backend_class = BACKENDS.get(str(name or DiffusersBackend.name).strip().lower())
+    if backend_class is None:
+        print(f"Unknown AI backend {name!r}; using {DiffusersBackend.name}.")
+        backend_class = DiffusersBackend
+    return backend_class()
+
+
 class ImageGenerator:
     """Wrapper around Stable Diffusion pipelines with configurable defaults."""
 
-    def __init__(self, config_path: str | None = None) -> None:
+    def __init__(
+        self, config_path: str | None = None, backend: DiffusionBackend | None = None
+    ) -> None:
         if config_path is None:
             config_path = os.path.join(os.path.dirname(__file__), "config.json")
         with open(config_path, "r") as f:
             cfg = json.load(f)
         self.model_configs = cfg.get("models", {})
         self.defaults = cfg.get("defaults", {})
+        self.backend = backend or create_backend(cfg.get("backend"))
+
+        cache_cfg = cfg.get("pipeline_cache", {})
+        max_memory_mb = cache_cfg.get("max_memory_mb", DEFAULT_MAX_MEMORY_MB)
+        self.pipeline_cache = PipelineCache(
+            max_pipelines=cache_cfg.get("max_pipelines", DEFAULT_MAX_PIPELINES),
+            max_bytes=None if max_memory_mb is None else int(max_memory_mb) << 20,
+            on_evict=self._on_pipeline_evicted,
+        )
+        self.last_load: PipelineLoad | None = None
+        # Text encoder outputs per (model, prompt, negative prompt), so repeated
+        # and batched runs skip re-encoding the prompt.
+        self._prompt_embeds: "OrderedDict[tuple[str, str, str], dict]" = OrderedDict()
+        self.mask_crop_cache = MaskCropCache()
+        self.pixel_art = PixelArtOptions.from_config(cfg.get("pixel_art"))
+        self.output_writer = OutputWriter.from_config(self.defaults)
 
         self.pipe = None
         self.current_model = None
@@ -118,8 +275,7 @@ class ImageGenerator:
         if mask.size != size:
             mask = mask.resize(size, Image.Resampling.NEAREST)
         # Ensure the mask is strictly binary so the diffusion pipeline treats it as opaque/transparent
-        mask = mask.point(lambda value: 255 if value >= 128 else 0)
-        return mask
+        return binarize_mask(mask)
 
     @staticmethod
     def _flatten_transparency(
@@ -153,8 +309,9 @@ class ImageGenerator:
         prepared_image = prepared_image.resize(target_size, Image.Resampling.NEAREST)
 
         if prepared_mask is not None:
-            prepared_mask = prepared_mask.resize(target_size, Image.Resampling.NEAREST)
-            prepared_mask = prepared_mask.point(lambda value: 255 if value >= 128 else 0)
+            prepared_mask = binarize_mask(
+                prepared_mask.resize(target_size, Image.Resampling.NEAREST)
+            )
 
         return prepared_image, prepared_mask
 
@@ -450,92 +607,97 @@ class ImageGenerator:
         return 512, 512
 
     def load_pipeline(self, model_name: str, is_img2img: bool = False, is_inpaint: bool = False):
-        """Load and cache the requested pipeline."""
-        if (
-            self.pipe
-            and self.current_model == model_name
-            and self.is_img2img == is_img2img
-            and self.is_inpaint == is_inpaint
-        ):
-            return self.pipe
-
-        self.cleanup()
+        """Return the requested pipeline, reusing cached weights where possible.
+
+        A pipeline already cached for the model and mode is returned as is.
+        Another mode of a cached model is derived from its components with
+        ``from_pipe``; only a model with nothing cached is read from disk.
+        ``last_load`` records which of these happened and how long it took.
+        """
+        started = time.perf_counter()
+        mode = pipeline_mode(is_img2img, is_inpaint)
+        pipe = self.pipeline_cache.get(model_name, mode)
+        source = "cache"
+        if pipe is None:
+            pipe, source = self._create_pipeline(model_name, is_img2img, is_inpaint)
+            self.pipeline_cache.put(model_name, mode, pipe)
+
+        self.pipe = pipe
+        self.current_model = model_name
+        self.is_img2img = is_img2img
+        self.is_inpaint = is_inpaint
+        self.last_load = PipelineLoad(model_name, mode, source, time.perf_counter() - started)
+        print(f"AI pipeline {self.last_load.describe()}.")
+        return self.pipe
 
+    def _create_pipeline(self, model_name: str, is_img2img: bool, is_inpaint: bool):
         model_cfg = self.model_configs.get(model_name)
         if not model_cfg:
             raise ValueError("Invalid model name")
+        return self.backend.create_pipeline(
+            model_name,
+            model_cfg,
+            is_img2img,
+            is_inpaint,
+            self.pipeline_cache.sibling(model_name),
+        )
 
-        if not is_torch_available():
-            raise RuntimeError(
-                "PyTorch is not installed. Install torch to enable AI image generation."
-            )
-        if not is_diffusers_available():
-            raise RuntimeError(
-                "diffusers is not installed or missing required pipelines. Install diffusers to enable AI image generation."
-            )
-
-        device = "cuda" if is_cuda_available() else "cpu"
-        torch_dtype = torch.float16 if device == "cuda" else torch.float32
-
-        pipeline_params = {
-            "torch_dtype": torch_dtype,
-            "use_safetensors": True,
-        }
-        if "clip_skip" in model_cfg:
-            pipeline_params["clip_skip"] = model_cfg["clip_skip"]
-
-        pipeline_class = None
-        model_key = str(model_name).strip().upper()
-        if model_key == "SDXL":
-            if is_inpaint:
-                pipeline_class = StableDiffusionXLInpaintPipeline
-            elif is_img2img:
-                pipeline_class = StableDiffusionXLImg2ImgPipeline
-            else:
-                pipeline_class = StableDiffusionXLPipeline
-        elif model_key in {"SD1.5", "SD15"}:
-            if is_inpaint:
-                pipeline_class = StableDiffusionInpaintPipeline
-            elif is_img2img:
-                pipeline_class = StableDiffusionImg2ImgPipeline
-            else:
-                pipeline_class = StableDiffusionPipeline
-        else:
-            raise ValueError("Invalid model name")
-
-        if pipeline_class is None:
-            raise RuntimeError(
-                "The requested diffusion pipeline is unavailable. Update diffusers to a version that provides the required pipelines."
-            )
+    def _step_callback(
+        self, step_callback, cancellation_token, preview_mode, preview_interval, progress_callback=None
+    ):
+        if preview_mode is None:
+            preview_mode = self.defaults.get("preview_mode", DEFAULT_PREVIEW_MODE)
+        if preview_interval is None:
+            preview_interval = self.defaults.get("preview_interval", DEFAULT_PREVIEW_INTERVAL)
+        return make_step_callback(
+            step_callback,
+            cancellation_token,
+            mode=preview_mode,
+            interval=preview_interval,
+            model_name=self.current_model,
+            progress_callback=progress_callback,
+        )
 
-        print(f"Loading {model_name} AI pipeline...")
-        self.pipe = pipeline_class.from_single_file(
-            model_cfg["path"],
-            **pipeline_params,
-        ).to(device)
-        print("AI pipeline loaded successfully.")
+    def _on_pipeline_evicted(self, key, pipe) -> None:
+        if self.pipeline_cache.sibling(key[0]) is None:
+            for cached in [k for k in self._prompt_embeds if k[0] == key[0]]:
+                del self._prompt_embeds[cached]
+        if pipe is self.pipe:
+            self.pipe = None
+            self.current_model = None
+        print(f"Evicted {key[0]} {key[1]} AI pipeline from the cache.")
+        self._empty_gpu_cache()
 
-        self.current_model = model_name
-        self.is_img2img = is_img2img
-        self.is_inpaint = is_inpaint
-        return self.pipe
+    @staticmethod
+    def _empty_gpu_cache() -> None:
+        torch = _OPTIONAL_MODULES.get("torch")
+        if torch is not None and is_cuda_available() and hasattr(torch.cuda, "empty_cache"):
+            torch.cuda.empty_cache()
 
     def cleanup(self):
-        if self.pipe is not None:
-            del self.pipe
+        self._prompt_embeds.clear()
+        if self.pipe is not None or len(self.pipeline_cache):
             self.pipe = None
-            if is_cuda_available() and hasattr(torch.cuda, "empty_cache"):
-                torch.cuda.empty_cache()
-            print("AI pipeline and GPU cache cleared.")
+            self.pipeline_cache.clear()
+            self._empty_gpu_cache()
+            print("AI pipelines and GPU cache cleared.")
+
+    def shutdown(self) -> None:
+        """Finish writing queued outputs; call before the application exits."""
+
+        self.output_writer.close()
 
     def _remove_background(self, image: Image.Image) -> Image.Image:
-        if not REMBG_AVAILABLE:
+        rembg_remove = _rembg_remove() if REMBG_AVAILABLE else None
+        if rembg_remove is None:
             print(
                 "Background removal unavailable: rembg or its dependencies are not installed."
             )
             return image
+        from portal.core.services.background_removal_service import remove_background
+
         try:
-            return rembg_remove(image)
+            return remove_background(image)
         except Exception as e:
             print(f"Background removal failed: {e}")
             return image
@@ -544,6 +706,138 @@ class ImageGenerator:
     def is_background_removal_available() -> bool:
         return REMBG_AVAILABLE
 
+    def _prompt_kwargs(self, prompt: str, negative_prompt: str | None) -> dict:
+        """Pipeline keyword arguments carrying the (cached) prompt embeddings."""
+
+        fallback = {"prompt": prompt}
+        if negative_prompt is not None:
+            fallback["negative_prompt"] = str(negative_prompt)
+        encode = getattr(self.pipe, "encode_prompt", None)
+        if not callable(encode):
+            return fallback
+
+        key = (str(self.current_model), prompt, str(negative_prompt or ""))
+        cached = self._prompt_embeds.get(key)
+        if cached is not None:
+            self._prompt_embeds.move_to_end(key)
+            return dict(cached)
+
+        encode_kwargs = {
+            "prompt": prompt,
+            "device": getattr(self.pipe, "_execution_device", None),
+            "num_images_per_prompt": 1,
+            "do_classifier_free_guidance": True,
+            "negative_prompt": negative_prompt or None,
+        }
+        clip_skip = self.model_configs.get(self.current_model, {}).get("clip_skip")
+        if clip_skip is not None:
+            encode_kwargs["clip_skip"] = clip_skip
+        torch = _OPTIONAL_MODULES.get("torch")
+        try:
+            if torch is not None:
+                with torch.no_grad():
+                    outputs = encode(**encode_kwargs)
+            else:
+                outputs = encode(**encode_kwargs)
+        except TypeError as e:  # encode_prompt signature differs between pipelines
+            print(f"Prompt embedding cache unavailable: {e}")
+            return fallback
+
+        # SD 1.x returns (embeds, negative); SDXL adds the pooled pair.
+        names = (
+            "prompt_embeds",
+            "negative_prompt_embeds",
+            "pooled_prompt_embeds",
+            "negative_pooled_prompt_embeds",
+        )
+        embeds = dict(zip(names, outputs))
+        self._prompt_embeds[key] = embeds
+        while len(self._prompt_embeds) > PROMPT_EMBED_CACHE_SIZE:
+            self._prompt_embeds.popitem(last=False)
+        return dict(embeds)
+
+    def _batch_kwargs(
+        self, prompt: str, negative_prompt: str | None, num_images: int, seed: int | None
+    ) -> dict:
+        kwargs = self._prompt_kwargs(prompt, negative_prompt)
+        num_images = max(1, int(num_images))
+        kwargs["num_images_per_prompt"] = num_images
+        if seed is not None:
+            torch = _import_optional_module("torch")
+            if torch is not None:
+                device = getattr(self.pipe, "device", "cpu")
+                # One generator per image so each result is reproducible on its own.
+                kwargs["generator"] = [
+                    torch.Generator(device=device).manual_seed(int(seed) + index)
+                    for index in range(num_images)
+                ]
+        return kwargs
+
+    def _finish_images(
+        self,
+        images: list[Image.Image],
+        original_size: tuple[int, int],
+        output_dir: str,
+        remove_background: bool,
+        num_images: int,
+        palette=None,
+        post_process: bool = True,
+        parameters: dict | None = None,
+    ) -> Image.Image | list[Image.Image]:
+        """Queue the results for saving and resize them; a list only when a batch was requested.
+
+        ``parameters`` are recorded in the output index next to each file.
+        """
+
+        now = datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
+        parameters = {
+            "created": now.isoformat(timespec="seconds"),
+            "model": self.current_model,
+            "original_size": list(original_size),
+            "remove_background": remove_background,
+            **(parameters or {}),
+        }
+        seed = parameters.get("seed")
+        results = []
+        for index, generated_image in enumerate(images):
+            if remove_background:
+                generated_image = self._remove_background(generated_image)
+            suffix = f"_{index + 1}" if len(images) > 1 else ""
+            filename = f"generated_{timestamp}{suffix}.png"
+            image_parameters = dict(parameters, size=list(generated_image.size))
+            if seed is not None:
+                # Each image of a batch has its own generator seed.
+                image_parameters["seed"] = int(seed) + index
+            self.output_writer.submit(
+                generated_image, os.path.join(output_dir, filename), image_parameters
+            )
+            if post_process:
+                generated_image = self._post_process(generated_image, original_size, palette)
+            results.append(generated_image)
+        if num_images <= 1:
+            return results[0]
+        return results
+
+    def result_settings(self) -> dict:
+        """Configuration besides the job parameters that changes generated images."""
+
+        return {
+            "pixel_art": asdict(self.pixel_art),
+            "inpaint_crop_to_mask": bool(self.defaults.get("inpaint_crop_to_mask", True)),
+            "inpaint_context_margin": int(
+                self.defaults.get("inpaint_context_margin", DEFAULT_CONTEXT_MARGIN)
+            ),
+        }
+
+    def _post_process(self, image: Image.Image, size: tuple[int, int], palette=None) -> Image.Image:
+        """Reduce a generated image to ``size`` with the ``pixel_art`` settings."""
+
+        options = self.pixel_art
+        if not options.enabled:
+            return image.resize(size, Image.Resampling.NEAREST)
+        return pixelate(image, size, options, palette if options.use_palette else None)
+
     def prompt_to_image(
         self,
         prompt: str,
@@ -557,52 +851,53 @@ class ImageGenerator:
         step_callback=None,
         cancellation_token=None,
         remove_background: bool = False,
-    ) -> Image.Image:
+        preview_mode: str | None = None,
+        preview_interval: int | None = None,
+        num_images_per_prompt: int = 1,
+        seed: int | None = None,
+        progress_callback=None,
+        palette=None,
+    ) -> Image.Image | list[Image.Image]:
         output_dir = output_dir or self.defaults.get("output_dir", "output")
         num_inference_steps = num_inference_steps or self.defaults.get("num_inference_steps", 20)
         guidance_scale = guidance_scale or self.defaults.get("guidance_scale", 7.0)
-        os.makedirs(output_dir, exist_ok=True)
-
-        def callback(pipe, step_index, timestep, callback_kwargs):
-            if cancellation_token and cancellation_token():
-                pipe._interrupt = True
-            if step_callback:
-                latents = callback_kwargs["latents"]
-                latents = 1 / 0.18215 * latents
-                image = pipe.vae.decode(latents).sample
-                image = (image / 2 + 0.5).clamp(0, 1)
-                image = image.cpu().permute(0, 2, 3, 1).numpy()
-                image = (image[0] * 255).round().astype("uint8")
-                image = Image.fromarray(image)
-                step_callback(image)
-            return callback_kwargs
+
+        callback = self._step_callback(
+            step_callback, cancellation_token, preview_mode, preview_interval, progress_callback
+        )
 
         coerced_generation_size = self._coerce_size(generation_size)
         if coerced_generation_size is None:
             coerced_generation_size = self.get_generation_size(self.current_model) or (512, 512)
 
         pipe_kwargs = {
-            "prompt": prompt,
             "num_inference_steps": num_inference_steps,
             "guidance_scale": guidance_scale,
             "callback_on_step_end": callback,
         }
         if coerced_generation_size:
             pipe_kwargs["width"], pipe_kwargs["height"] = coerced_generation_size
-        if negative_prompt is not None:
-            pipe_kwargs["negative_prompt"] = str(negative_prompt)
+        pipe_kwargs.update(self._batch_kwargs(prompt, negative_prompt, num_images_per_prompt, seed))
 
         print("Generating image from prompt...")
-        generated_image = self.pipe(**pipe_kwargs).images[0]
-
-        if remove_background:
-            generated_image = self._remove_background(generated_image)
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"generated_{timestamp}.png"
-        generated_image.save(os.path.join(output_dir, filename))
-        final_image = generated_image.resize(original_size, Image.Resampling.NEAREST)
-        return final_image
+        generated_images = self.pipe(**pipe_kwargs).images
+        return self._finish_images(
+            generated_images,
+            original_size,
+            output_dir,
+            remove_background,
+            num_images_per_prompt,
+            palette,
+            parameters={
+                "mode": "txt2img",
+                "prompt": prompt,
+                "negative_prompt": negative_prompt,
+                "seed": seed,
+                "num_inference_steps": num_inference_steps,
+                "guidance_scale": guidance_scale,
+                "generation_size": list(coerced_generation_size),
+            },
+        )
 
     def image_to_image(
         self,
@@ -617,28 +912,23 @@ class ImageGenerator:
         step_callback=None,
         cancellation_token=None,
         remove_background: bool = False,
+        preview_mode: str | None = None,
+        preview_interval: int | None = None,
+        num_images_per_prompt: int = 1,
+        seed: int | None = None,
+        progress_callback=None,
+        palette=None,
         generation_size: tuple[int, int] | None = None,
-    ) -> Image.Image:
+    ) -> Image.Image | list[Image.Image]:
         output_dir = output_dir or self.defaults.get("output_dir", "output")
         num_inference_steps = num_inference_steps or self.defaults.get("num_inference_steps", 20)
         guidance_scale = guidance_scale or self.defaults.get("guidance_scale", 7.0)
         strength = strength if strength is not None else self.defaults.get("strength", 0.8)
-        os.makedirs(output_dir, exist_ok=True)
         original_size = input_image.size
 
-        def callback(pipe, step_index, timestep, callback_kwargs):
-            if cancellation_token and cancellation_token():
-                pipe._interrupt = True
-            if step_callback:
-                latents = callback_kwargs["latents"]
-                latents = 1 / 0.18215 * latents
-                image = pipe.vae.decode(latents).sample
-                image = (image / 2 + 0.5).clamp(0, 1)
-                image = image.cpu().permute(0, 2, 3, 1).numpy()
-                image = (image[0] * 255).round().astype("uint8")
-                image = Image.fromarray(image)
-                step_callback(image)
-            return callback_kwargs
+        callback = self._step_callback(
+            step_callback, cancellation_token, preview_mode, preview_interval, progress_callback
+        )
 
         target_generation_size = self._coerce_size(generation_size)
         if target_generation_size is None:
@@ -653,7 +943,6 @@ class ImageGenerator:
 
         print("Generating image from image...")
         pipe_kwargs = {
-            "prompt": prompt,
             "image": model_input_image,
             "strength": strength,
             "num_inference_steps": num_inference_steps,
@@ -662,19 +951,27 @@ class ImageGenerator:
         }
         if target_generation_size:
             pipe_kwargs["width"], pipe_kwargs["height"] = target_generation_size
-        if negative_prompt is not None:
-            pipe_kwargs["negative_prompt"] = str(negative_prompt)
-
-        generated_image = self.pipe(**pipe_kwargs).images[0]
-
-        if remove_background:
-            generated_image = self._remove_background(generated_image)
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"generated_{timestamp}.png"
-        generated_image.save(os.path.join(output_dir, filename))
-        final_image = generated_image.resize(original_size, Image.Resampling.NEAREST)
-        return final_image
+        pipe_kwargs.update(self._batch_kwargs(prompt, negative_prompt, num_images_per_prompt, seed))
+
+        generated_images = self.pipe(**pipe_kwargs).images
+        return self._finish_images(
+            generated_images,
+            original_size,
+            output_dir,
+            remove_background,
+            num_images_per_prompt,
+            palette,
+            parameters={
+                "mode": "img2img",
+                "prompt": prompt,
+                "negative_prompt": negative_prompt,
+                "seed": seed,
+                "num_inference_steps": num_inference_steps,
+                "guidance_scale": guidance_scale,
+                "strength": strength,
+                "generation_size": list(target_generation_size),
+            },
+        )
 
     def inpaint_image(
         self,
@@ -690,30 +987,50 @@ class ImageGenerator:
         step_callback=None,
         cancellation_token=None,
         remove_background: bool = False,
+        preview_mode: str | None = None,
+        preview_interval: int | None = None,
+        num_images_per_prompt: int = 1,
+        seed: int | None = None,
+        progress_callback=None,
+        palette=None,
         generation_size: tuple[int, int] | None = None,
-    ) -> Image.Image:
+        crop_to_mask: bool | None = None,
+        context_margin: int | None = None,
+    ) -> Image.Image | list[Image.Image]:
+        """Inpaint the masked pixels of ``input_image``.
+
+        With ``crop_to_mask`` (the ``inpaint_crop_to_mask`` default) only the
+        mask's bounding box plus ``context_margin`` pixels is diffused, at the
+        smallest size the model accepts for it, and only the masked pixels of
+        the result are pasted back; ``generation_size`` is then ignored.
+        """
+
         output_dir = output_dir or self.defaults.get("output_dir", "output")
         num_inference_steps = num_inference_steps or self.defaults.get("num_inference_steps", 20)
         guidance_scale = guidance_scale or self.defaults.get("guidance_scale", 7.0)
         strength = strength if strength is not None else self.defaults.get("strength", 0.8)
-        os.makedirs(output_dir, exist_ok=True)
+        if crop_to_mask is None:
+            crop_to_mask = bool(self.defaults.get("inpaint_crop_to_mask", True))
+        if context_margin is None:
+            context_margin = self.defaults.get("inpaint_context_margin", DEFAULT_CONTEXT_MARGIN)
         original_size = input_image.size
 
-        def callback(pipe, step_index, timestep, callback_kwargs):
-            if cancellation_token and cancellation_token():
-                pipe._interrupt = True
-            if step_callback:
-                latents = callback_kwargs["latents"]
-                latents = 1 / 0.18215 * latents
-                image = pipe.vae.decode(latents).sample
-                image = (image / 2 + 0.5).clamp(0, 1)
-                image = image.cpu().permute(0, 2, 3, 1).numpy()
-                image = (image[0] * 255).round().astype("uint8")
-                image = Image.fromarray(image)
-                step_callback(image)
-            return callback_kwargs
+        callback = self._step_callback(
+            step_callback, cancellation_token, preview_mode, preview_interval, progress_callback
+        )
 
-        target_generation_size = self._coerce_size(generation_size)
+        full_image = input_image
+        region = None
+        if crop_to_mask and mask_image is not None:
+            region = self.mask_crop_cache.crop(
+                self._normalize_mask_image(mask_image, input_image.size), context_margin
+            )
+        if region is not None:
+            input_image = input_image.crop(region.box)
+            mask_image = region.mask
+            target_generation_size = self.calculate_generation_size(self.current_model, region.size)
+        else:
+            target_generation_size = self._coerce_size(generation_size)
         if target_generation_size is None:
             target_generation_size = self.get_generation_size(self.current_model) or (512, 512)
 
@@ -729,7 +1046,6 @@ class ImageGenerator:
 
         print("Generating image from image...")
         pipe_kwargs = {
-            "prompt": prompt,
             "image": model_input_image,
             "mask_image": mask_image,
             "strength": strength,
@@ -739,16 +1055,32 @@ class ImageGenerator:
         }
         if target_generation_size:
             pipe_kwargs["width"], pipe_kwargs["height"] = target_generation_size
-        if negative_prompt is not None:
-            pipe_kwargs["negative_prompt"] = str(negative_prompt)
-
-        generated_image = self.pipe(**pipe_kwargs).images[0]
-
-        if remove_background:
-            generated_image = self._remove_background(generated_image)
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"generated_{timestamp}.png"
-        generated_image.save(os.path.join(output_dir, filename))
-        final_image = generated_image.resize(original_size, Image.Resampling.NEAREST)
-        return final_image
+        pipe_kwargs.update(self._batch_kwargs(prompt, negative_prompt, num_images_per_prompt, seed))
+
+        generated_images = self.pipe(**pipe_kwargs).images
+        if region is not None:
+            # Only the patch is reduced, so pixels outside the mask stay as they were.
+            generated_images = [
+                paste_masked(full_image, self._post_process(generated, region.size, palette), region)
+                for generated in generated_images
+            ]
+        return self._finish_images(
+            generated_images,
+            original_size,
+            output_dir,
+            remove_background,
+            num_images_per_prompt,
+            palette,
+            post_process=region is None,
+            parameters={
+                "mode": "inpaint",
+                "prompt": prompt,
+                "negative_prompt": negative_prompt,
+                "seed": seed,
+                "num_inference_steps": num_inference_steps,
+                "guidance_scale": guidance_scale,
+                "strength": strength,
+                "generation_size": list(target_generation_size),
+                "crop_box": list(region.box) if region is not None else None,
+            },
+        )
@@ -0,0 +1,228 @@
+"""Background persistence of generated images.
+
+Every generation keeps a full-resolution copy of its results in the output
+directory. Encoding those PNGs takes a noticeable share of a generation, so
+``ImageGenerator`` hands them to an ``OutputWriter`` instead of saving them
+before it returns. The writer owns one daemon thread fed by a bounded
+queue; when the queue is full ``submit`` waits, so a slow disk slows
+generation down instead of piling up images in memory.
+
+Next to the images the writer keeps ``index.jsonl``, one JSON object per
+written file with the parameters that produced it, which ``read_index`` and
+``OutputWriter.lookup`` read back. ``max_files``/``max_bytes`` bound the
+generated files kept per directory; the oldest are deleted along with their
+index entries. ``compress_level`` is passed to the PNG encoder: ``1`` writes
+several times faster than Pillow's default ``6`` for somewhat larger files.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import queue
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from PIL import Image
+
+INDEX_FILENAME = "index.jsonl"
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_COMPRESS_LEVEL = 6
+
+# Only files named like generated outputs are counted and pruned.
+_OUTPUT_NAME = re.compile(r"^generated_.*\.png$")
+_STOP = object()
+
+
+@dataclass
+class _Task:
+    image: Image.Image
+    path: str
+    parameters: dict = field(default_factory=dict)
+
+
+def read_index(directory: str) -> list[dict]:
+    """Entries of ``directory``'s index whose image still exists, oldest first."""
+
+    entries = []
+    try:
+        with open(os.path.join(directory, INDEX_FILENAME), "r", encoding="utf-8") as handle:
+            lines = handle.readlines()
+    except OSError:
+        return entries
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(entry, dict) and os.path.exists(os.path.join(directory, str(entry.get("file")))):
+            entries.append(entry)
+    return entries
+
+
+class OutputWriter:
+    """Writes generated images and their index entries on a worker thread."""
+
+    def __init__(
+        self,
+        max_files: int | None = None,
+        max_bytes: int | None = None,
+        compress_level: int = DEFAULT_COMPRESS_LEVEL,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ) -> None:
+        self.max_files = int(max_files) if max_files else None
+        self.max_bytes = int(max_bytes) if max_bytes else None
+        self.compress_level = min(9, max(0, int(compress_level)))
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._thread: threading.Thread | None = None
+        self._thread_lock = threading.Lock()
+        # Generated files per directory, oldest first, with their sizes.
+        self._files: dict[str, "OrderedDict[str, int]"] = {}
+        self.written = 0
+        self.failed = 0
+
+    @classmethod
+    def from_config(cls, defaults: dict) -> "OutputWriter":
+        return cls(
+            max_files=defaults.get("output_max_files"),
+            max_bytes=defaults.get("output_max_bytes"),
+            compress_level=defaults.get("output_compress_level", DEFAULT_COMPRESS_LEVEL),
+            queue_size=defaults.get("output_queue_size", DEFAULT_QUEUE_SIZE),
+        )
+
+    def submit(self, image: Image.Image, path: str, parameters: dict | None = None) -> None:
+        """Queue ``image`` to be written to ``path``; blocks while the queue is full.
+
+        The image must not be modified afterwards. If ``path`` already exists
+        a numbered name is used instead, so earlier outputs are never replaced.
+        """
+
+        self._ensure_thread()
+        self._queue.put(_Task(image, path, dict(parameters or {})))
+
+    def flush(self) -> None:
+        """Wait until every submitted image is written."""
+
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Write the remaining images and stop the thread; ``submit`` restarts it."""
+
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def lookup(self, path: str) -> dict | None:
+        """Index entry of a written image, or ``None`` if it is not indexed."""
+
+        self.flush()
+        directory, name = os.path.split(os.path.abspath(path))
+        for entry in reversed(read_index(directory)):
+            if entry.get("file") == name:
+                return entry
+        return None
+
+    def _ensure_thread(self) -> None:
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="OutputWriter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            task = self._queue.get()
+            try:
+                if task is _STOP:
+                    return
+                self._write(task)
+            except Exception as e:
+                self.failed += 1
+                print(f"Failed to save generated image {getattr(task, 'path', '')}: {e}")
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _unique_path(path: str) -> str:
+        """``path``, or a numbered variant when an earlier output has that name."""
+
+        root, extension = os.path.splitext(path)
+        counter = 2
+        while os.path.exists(path):
+            path = f"{root}-{counter}{extension}"
+            counter += 1
+        return path
+
+    def _write(self, task: _Task) -> None:
+        path = os.path.abspath(task.path)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        path = self._unique_path(path)
+        name = os.path.basename(path)
+        task.image.save(path, format="PNG", compress_level=self.compress_level)
+        size = os.path.getsize(path)
+        entry = {"file": name, **task.parameters, "bytes": size}
+        with open(os.path.join(directory, INDEX_FILENAME), "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(entry, sort_keys=True, default=str) + "\n")
+        self.written += 1
+
+        files = self._known_files(directory)
+        files.pop(name, None)
+        files[name] = size
+        self._prune(directory, files)
+
+    def _known_files(self, directory: str) -> "OrderedDict[str, int]":
+        files = self._files.get(directory)
+        if files is None:
+            # First write to this directory: pick up what earlier sessions left.
+            found = []
+            for entry in os.scandir(directory):
+                if entry.is_file() and _OUTPUT_NAME.match(entry.name):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name, stat.st_size))
+            files = OrderedDict((name, size) for _mtime, name, size in sorted(found))
+            self._files[directory] = files
+        return files
+
+    def _prune(self, directory: str, files: "OrderedDict[str, int]") -> None:
+        removed = set()
+        total = sum(files.values()) if self.max_bytes else 0
+        # The newest file is always kept, even if it alone exceeds the limits.
+        while len(files) > 1 and (
+            (self.max_files and len(files) > self.max_files)
+            or (self.max_bytes and total > self.max_bytes)
+        ):
+            name, size = files.popitem(last=False)
+            total -= size
+            removed.add(name)
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+        if removed:
+            self._rewrite_index(directory, removed)
+
+    @staticmethod
+    def _rewrite_index(directory: str, removed: set[str]) -> None:
+        index_path = os.path.join(directory, INDEX_FILENAME)
+        try:
+            with open(index_path, "r", encoding="utf-8") as handle:
+                lines = handle.readlines()
+        except OSError:
+            return
+        kept = []
+        for line in lines:
+            try:
+                name = json.loads(line).get("file")
+            except (ValueError, AttributeError):
+                continue
+            if name not in removed:
+                kept.append(line)
+        temp_path = index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            handle.writelines(kept)
+        os.replace(temp_path, index_path)
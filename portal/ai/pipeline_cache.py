@@ -0,0 +1,148 @@
+"""Keep loaded diffusion pipelines around between generations.
+
+Pipelines are cached by ``(model, mode)`` in least-recently-used order.
+Pipelines derived from one another with diffusers' ``from_pipe`` share
+their weights, so memory is counted per distinct component and a shared
+UNet or VAE is only counted once.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+
+PIPELINE_MODES = ("txt2img", "img2img", "inpaint")
+
+DEFAULT_MAX_PIPELINES = 6
+DEFAULT_MAX_MEMORY_MB = 8192
+
+
+def pipeline_mode(is_img2img: bool = False, is_inpaint: bool = False) -> str:
+    if is_inpaint:
+        return "inpaint"
+    if is_img2img:
+        return "img2img"
+    return "txt2img"
+
+
+@dataclass(frozen=True)
+class PipelineLoad:
+    """How the last requested pipeline was obtained."""
+
+    model: str
+    mode: str
+    source: str  # "cache", "derived" or "disk"
+    seconds: float
+
+    @property
+    def hit(self) -> bool:
+        return self.source == "cache"
+
+    def describe(self) -> str:
+        if self.source == "cache":
+            how = "cached"
+        elif self.source == "derived":
+            how = "derived from loaded weights"
+        else:
+            how = "loaded from disk"
+        return f"{self.model} {self.mode}: {how} in {self.seconds:.2f} s"
+
+
+def _components(pipe) -> Iterator[Any]:
+    components = getattr(pipe, "components", None)
+    if isinstance(components, dict):
+        yield from components.values()
+
+
+def _component_bytes(component) -> int:
+    total = 0
+    for attribute in ("parameters", "buffers"):
+        tensors = getattr(component, attribute, None)
+        if not callable(tensors):
+            continue
+        for tensor in tensors():
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class PipelineCache:
+    """LRU cache of pipelines keyed by ``(model, mode)`` with a memory cap."""
+
+    def __init__(
+        self,
+        max_pipelines: int = DEFAULT_MAX_PIPELINES,
+        max_bytes: int | None = DEFAULT_MAX_MEMORY_MB << 20,
+        on_evict: Callable[[tuple[str, str], Any], None] | None = None,
+    ) -> None:
+        self.max_pipelines = max(1, int(max_pipelines))
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._pipelines: "OrderedDict[tuple[str, str], Any]" = OrderedDict()
+        self._sizes: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._pipelines)
+
+    def __contains__(self, key) -> bool:
+        return key in self._pipelines
+
+    def keys(self) -> list[tuple[str, str]]:
+        """Cached keys, least recently used first."""
+
+        return list(self._pipelines)
+
+    def get(self, model: str, mode: str):
+        key = (model, mode)
+        pipe = self._pipelines.get(key)
+        if pipe is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._pipelines.move_to_end(key)
+        return pipe
+
+    def sibling(self, model: str):
+        """The most recently used pipeline of ``model`` in any mode."""
+
+        for (cached_model, _), pipe in reversed(self._pipelines.items()):
+            if cached_model == model:
+                return pipe
+        return None
+
+    def put(self, model: str, mode: str, pipe) -> None:
+        key = (model, mode)
+        self._pipelines[key] = pipe
+        self._pipelines.move_to_end(key)
+        for component in _components(pipe):
+            if id(component) not in self._sizes:
+                self._sizes[id(component)] = _component_bytes(component)
+        self._evict()
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the distinct components of every cached pipeline."""
+
+        seen = {id(component) for pipe in self._pipelines.values() for component in _components(pipe)}
+        return sum(self._sizes.get(component_id, 0) for component_id in seen)
+
+    def clear(self) -> None:
+        while self._pipelines:
+            self._pop_oldest()
+
+    def _evict(self) -> None:
+        # The newest pipeline always stays, even when it alone is over the cap.
+        while len(self._pipelines) > 1 and (
+            len(self._pipelines) > self.max_pipelines
+            or (self.max_bytes is not None and self.memory_bytes() > self.max_bytes)
+        ):
+            self._pop_oldest()
+
+    def _pop_oldest(self) -> None:
+        key, pipe = self._pipelines.popitem(last=False)
+        alive = {id(component) for other in self._pipelines.values() for component in _components(other)}
+        for component_id in [cid for cid in self._sizes if cid not in alive]:
+            del self._sizes[component_id]
+        if self.on_evict is not None:
+            self.on_evict(key, pipe)
@@ -0,0 +1,219 @@
+"""Turn generated images into pixel art at the output size.
+
+Diffusion models generate at several times the sprite resolution. Sampling
+that down with ``NEAREST`` keeps one arbitrary pixel per cell, which turns
+shading into noise. ``pixelate`` instead looks at every pixel of a cell:
+
+* ``"mode"`` quantizes the full-resolution image first and keeps the most
+  common colour of each cell, which preserves flat areas and outlines;
+* ``"median"`` takes the per-channel median of each cell and quantizes the
+  small result, which is cheaper and smoother.
+
+Colours are quantized to the given palette or to ``colors`` clusters found
+with scikit-learn's ``MiniBatchKMeans`` (Pillow's median cut when it is not
+installed). ``cleanup`` replaces orphan pixels whose four neighbours agree
+on another colour, and ``alpha_threshold`` makes every pixel fully opaque
+or fully transparent. Everything runs on whole NumPy arrays.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image, ImageColor
+
+DOWNSAMPLE_MODE = "mode"
+DOWNSAMPLE_MEDIAN = "median"
+DOWNSAMPLE_METHODS = (DOWNSAMPLE_MODE, DOWNSAMPLE_MEDIAN)
+
+# Pixels used to fit the colour clusters; plenty for a sprite palette.
+KMEANS_SAMPLE_SIZE = 4096
+# Centre of each 15-bit colour bucket used by the nearest-colour lookup.
+_LUT_COLORS = (
+    np.stack(np.meshgrid(np.arange(32), np.arange(32), np.arange(32), indexing="ij"), axis=-1)
+    .reshape(-1, 3)
+    .astype(np.float32)
+    * 8
+    + 4
+)
+
+
+@dataclass(frozen=True)
+class PixelArtOptions:
+    """Settings of the ``pixel_art`` section of ``portal/ai/config.json``."""
+
+    enabled: bool = True
+    downsample: str = DOWNSAMPLE_MODE
+    colors: int = 32
+    use_palette: bool = False
+    cleanup: bool = True
+    alpha_threshold: int | None = 128
+    seed: int = 0
+
+    @classmethod
+    def from_config(cls, config: dict | None) -> "PixelArtOptions":
+        config = config or {}
+        defaults = cls()
+        downsample = str(config.get("downsample", defaults.downsample)).strip().lower()
+        if downsample not in DOWNSAMPLE_METHODS:
+            downsample = defaults.downsample
+        alpha_threshold = config.get("alpha_threshold", defaults.alpha_threshold)
+        return cls(
+            enabled=bool(config.get("enabled", defaults.enabled)),
+            downsample=downsample,
+            colors=max(0, int(config.get("colors", defaults.colors) or 0)),
+            use_palette=bool(config.get("use_palette", defaults.use_palette)),
+            cleanup=bool(config.get("cleanup", defaults.cleanup)),
+            alpha_threshold=None if alpha_threshold is None else int(alpha_threshold),
+            seed=int(config.get("seed", defaults.seed)),
+        )
+
+
+def palette_to_array(palette) -> np.ndarray | None:
+    """``(n, 3)`` uint8 array of ``"#rrggbb"`` strings or RGB(A) tuples."""
+
+    if not palette:
+        return None
+    colors = []
+    for color in palette:
+        if isinstance(color, str):
+            color = ImageColor.getrgb(color)
+        colors.append(tuple(color)[:3])
+    return np.array(colors, dtype=np.uint8)
+
+
+def _cells(pixels: np.ndarray, size: tuple[int, int]) -> np.ndarray:
+    """Group ``pixels`` into ``(height, width, cell_pixels, channels)`` cells."""
+
+    width, height = size
+    source_height, source_width = pixels.shape[:2]
+    cell_height = max(1, source_height // height)
+    cell_width = max(1, source_width // width)
+    if (source_height, source_width) != (height * cell_height, width * cell_width):
+        # Resample to a whole number of pixels per cell.
+        rows = np.arange(height * cell_height) * source_height // (height * cell_height)
+        cols = np.arange(width * cell_width) * source_width // (width * cell_width)
+        pixels = pixels[rows][:, cols]
+    channels = pixels.shape[2]
+    cells = pixels.reshape(height, cell_height, width, cell_width, channels)
+    return cells.transpose(0, 2, 1, 3, 4).reshape(height, width, cell_height * cell_width, channels)
+
+
+def _nearest(pixels: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Index of the closest centre for every RGB row of ``pixels``.
+
+    Distances are computed once for each 15-bit colour and looked up per
+    pixel, which is far cheaper than comparing every pixel with every centre.
+    """
+
+    codes = (
+        (pixels[..., 0].astype(np.uint16) >> 3) << 10
+        | (pixels[..., 1].astype(np.uint16) >> 3) << 5
+        | pixels[..., 2] >> 3
+    )
+    centers = centers.astype(np.float32)
+    # |p - c|² without the |p|² term, which is the same for every centre.
+    distances = (centers * centers).sum(axis=1) - 2.0 * (_LUT_COLORS @ centers.T)
+    return distances.argmin(axis=1)[codes.ravel()]
+
+
+def _fit_colors(pixels: np.ndarray, count: int, seed: int) -> np.ndarray:
+    pixels = pixels.reshape(-1, 3)
+    rng = np.random.default_rng(seed)
+    if len(pixels) > KMEANS_SAMPLE_SIZE:
+        pixels = pixels[rng.choice(len(pixels), KMEANS_SAMPLE_SIZE, replace=False)]
+    unique = np.unique(pixels, axis=0)
+    if len(unique) <= count:
+        return unique
+    try:
+        from sklearn.cluster import MiniBatchKMeans
+    except ImportError:
+        sample = Image.fromarray(pixels.reshape(1, -1, 3), "RGB")
+        palette = sample.quantize(count, method=Image.Quantize.MEDIANCUT).getpalette()
+        return np.array(palette[: count * 3], dtype=np.uint8).reshape(-1, 3)
+    model = MiniBatchKMeans(n_clusters=count, random_state=seed, n_init=1, batch_size=1024)
+    model.fit(pixels.astype(np.float32))
+    return np.clip(np.rint(model.cluster_centers_), 0, 255).astype(np.uint8)
+
+
+def _cell_mode(labels: np.ndarray, count: int) -> np.ndarray:
+    """Most common label of each ``(..., cell_pixels)`` row; ties take the lowest."""
+
+    flat = labels.reshape(-1, labels.shape[-1])
+    offsets = np.arange(len(flat))[:, None] * count
+    counts = np.bincount((flat + offsets).ravel(), minlength=len(flat) * count)
+    return counts.reshape(len(flat), count).argmax(axis=1).reshape(labels.shape[:-1])
+
+
+def _packed_mode(cells: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Most common exact RGBA colour per cell and how often it occurs."""
+
+    packed = np.ascontiguousarray(cells).view(np.uint32)[..., 0]
+    flat = np.sort(packed.reshape(-1, packed.shape[-1]), axis=1)
+    positions = np.arange(flat.shape[1])
+    starts = np.where(
+        np.concatenate([np.ones((len(flat), 1), bool), flat[:, 1:] != flat[:, :-1]], axis=1),
+        positions,
+        0,
+    )
+    run_lengths = positions - np.maximum.accumulate(starts, axis=1) + 1
+    best = run_lengths.argmax(axis=1)
+    rows = np.arange(len(flat))
+    mode = flat[rows, best].view(np.uint8).reshape(*cells.shape[:2], 4)
+    return mode, run_lengths[rows, best].reshape(cells.shape[:2])
+
+
+def _remove_orphans(pixels: np.ndarray) -> None:
+    """Replace pixels whose four neighbours share one other colour, in place."""
+
+    packed = pixels.view(np.uint32)[..., 0]
+    center = packed[1:-1, 1:-1]
+    up, down = packed[:-2, 1:-1], packed[2:, 1:-1]
+    left, right = packed[1:-1, :-2], packed[1:-1, 2:]
+    orphans = (up == down) & (up == left) & (up == right) & (up != center)
+    center[orphans] = up[orphans]
+
+
+def pixelate(
+    image: Image.Image,
+    size: tuple[int, int],
+    options: PixelArtOptions | None = None,
+    palette=None,
+) -> Image.Image:
+    """Downsample ``image`` to ``size`` as pixel art; see the module docstring."""
+
+    options = options or PixelArtOptions()
+    has_alpha = "A" in image.getbands()
+    cells = _cells(np.asarray(image.convert("RGBA")), size)
+    palette = palette_to_array(palette)
+    quantize = palette is not None or options.colors > 0
+
+    if options.downsample == DOWNSAMPLE_MEDIAN:
+        result = np.full(cells.shape[:2] + (4,), 255, dtype=np.uint8)
+        channels = 4 if has_alpha else 3
+        result[..., :channels] = np.median(cells[..., :channels], axis=2)
+        if quantize:
+            rgb = result[..., :3]
+            centers = palette if palette is not None else _fit_colors(rgb, options.colors, options.seed)
+            result[..., :3] = centers[_nearest(rgb, centers)].reshape(rgb.shape)
+    elif quantize:
+        rgb = cells[..., :3]
+        centers = palette if palette is not None else _fit_colors(rgb, options.colors, options.seed)
+        labels = _nearest(rgb, centers).reshape(cells.shape[:3])
+        result = np.empty(cells.shape[:2] + (4,), dtype=np.uint8)
+        result[..., :3] = centers[_cell_mode(labels, len(centers))]
+        result[..., 3] = np.median(cells[..., 3], axis=2) if has_alpha else 255
+    else:
+        result, occurrences = _packed_mode(cells)
+        # Where no colour repeats the mode is arbitrary; use the median.
+        unique_cells = occurrences == 1
+        result[unique_cells] = np.median(cells[unique_cells], axis=1).astype(np.uint8)
+
+    if options.alpha_threshold is not None:
+        result[..., 3] = np.where(result[..., 3] >= options.alpha_threshold, 255, 0)
+    if options.cleanup and min(result.shape[:2]) >= 3:
+        _remove_orphans(result)
+
+    pixelated = Image.fromarray(result, "RGBA")
+    return pixelated if has_alpha else pixelated.convert("RGB")
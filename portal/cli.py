@@ -0,0 +1,403 @@
+"""Headless renderer and batch converter.
+
+Run ``python -m portal.cli --help`` for usage. Documents are loaded and
+rendered under Qt's offscreen platform without a ``MainWindow``; only core
+modules are imported, so neither the UI nor the AI stack is loaded. File
+lists are spread over a process pool and each finished file is reported as
+it completes, followed by a summary.
+
+Examples::
+
+    python -m portal.cli art/*.aole -o build --format png --scale 4
+    python -m portal.cli art/ -o build --format sprite_sheet --workers 8
+    python -m portal.cli walk.aole --format gif --frames 0-11 --layers Body,Outline
+"""
+
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+from typing import TextIO
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QGuiApplication
+
+from portal.core import animation_export
+from portal.core.aole_archive import AOLEArchive
+from portal.core.document import Document
+
+FORMAT_PNG = "png"
+ANIMATION_FORMATS = ("gif", "apng", "webp", "sprite_sheet")
+OUTPUT_FORMATS = (FORMAT_PNG,) + ANIMATION_FORMATS
+DOCUMENT_SUFFIXES = (".aole", ".tif", ".tiff")
+
+_ANIMATION_SUFFIXES = {
+    "gif": ".gif",
+    "apng": ".png",
+    "webp": ".webp",
+    "sprite_sheet": ".png",
+}
+
+# Keeps the offscreen application alive for the lifetime of the process.
+_gui_application = None
+
+
+@dataclass(frozen=True)
+class ConversionJob:
+    source: str
+    output_dir: str | None = None
+    format: str = FORMAT_PNG
+    frames: str | None = None
+    layers: tuple[str, ...] = ()
+    scale: int = 1
+
+
+@dataclass
+class ConversionResult:
+    source: str
+    outputs: list[str] = field(default_factory=list)
+    elapsed: float = 0.0
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+# ----------------------------------------------------------------------
+# Conversion
+# ----------------------------------------------------------------------
+def ensure_gui_application() -> None:
+    """Create an offscreen ``QGuiApplication`` unless one already exists."""
+
+    global _gui_application
+    if QGuiApplication.instance() is not None:
+        return
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    _gui_application = QGuiApplication([sys.argv[0] if sys.argv else "portal"])
+
+
+def load_document(path: str):
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == ".aole":
+        return Document.load_aole(path)
+    if suffix in (".tif", ".tiff"):
+        return Document.load_tiff(path)
+    raise ValueError(f"Unsupported document type: {suffix or path}")
+
+
+def parse_frames(spec: str | None, document) -> list[int]:
+    """Resolve a frame spec such as ``"0-3,7"``, ``"loop"`` or ``"all"``."""
+
+    if spec is None or spec == "current":
+        return [document.layer_manager.current_frame]
+    if spec == "loop":
+        start, end = document.get_playback_loop_range()
+        return list(range(start, end + 1))
+    if spec == "all":
+        last = max(
+            (key.frame_number for layer in document.layer_manager.layers for key in layer.keys),
+            default=0,
+        )
+        return list(range(0, last + 1))
+
+    frames: set[int] = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, separator, last = part.partition("-")
+        try:
+            start = int(first)
+            end = int(last) if separator else start
+        except ValueError:
+            raise ValueError(f"Invalid frame range: {part}") from None
+        if start < 0 or end < start:
+            raise ValueError(f"Invalid frame range: {part}")
+        frames.update(range(start, end + 1))
+    if not frames:
+        raise ValueError("No frames selected.")
+    return sorted(frames)
+
+
+def select_layers(document, selectors: tuple[str, ...]) -> None:
+    """Show only the layers named (or indexed) by ``selectors``."""
+
+    if not selectors:
+        return
+    layers = document.layer_manager.layers
+    selected = set()
+    for selector in selectors:
+        matches = [index for index, layer in enumerate(layers) if layer.name == selector]
+        if not matches and selector.lstrip("-").isdigit():
+            index = int(selector)
+            if -len(layers) <= index < len(layers):
+                matches = [index % len(layers)]
+        if not matches:
+            raise ValueError(f"No layer named {selector!r}.")
+        selected.update(matches)
+    for index, layer in enumerate(layers):
+        layer.visible = index in selected
+
+
+def scale_document(document, scale: int) -> None:
+    """Enlarge every key by an integer factor with nearest-neighbour sampling."""
+
+    if scale == 1:
+        return
+    width = document.width * scale
+    height = document.height * scale
+    for layer in document.layer_manager.layers:
+        for key in layer.keys:
+            key.image = key.image.scaled(width, height, Qt.IgnoreAspectRatio, Qt.FastTransformation)
+    document.width = document.layer_manager.width = width
+    document.height = document.layer_manager.height = height
+
+
+def convert_document(job: ConversionJob) -> ConversionResult:
+    """Render or export one document; failures are reported, not raised."""
+
+    started = time.perf_counter()
+    result = ConversionResult(job.source)
+    try:
+        ensure_gui_application()
+        document = load_document(job.source)
+        select_layers(document, job.layers)
+        output_dir = job.output_dir or os.path.dirname(os.path.abspath(job.source))
+        os.makedirs(output_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(job.source))[0]
+        if job.format == FORMAT_PNG:
+            result.outputs = _render_stills(document, job, output_dir, stem)
+        else:
+            result.outputs = _export_animation(document, job, output_dir, stem)
+    except Exception as exc:  # noqa: BLE001 - one bad file must not stop a batch
+        result.error = f"{type(exc).__name__}: {exc}"
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def _render_stills(document, job: ConversionJob, output_dir: str, stem: str) -> list[str]:
+    frames = parse_frames(job.frames, document)
+    outputs = []
+    for frame in frames:
+        image = document.render(frame)
+        if job.scale != 1:
+            image = image.scaled(
+                image.width() * job.scale,
+                image.height() * job.scale,
+                Qt.IgnoreAspectRatio,
+                Qt.FastTransformation,
+            )
+        name = f"{stem}.png" if len(frames) == 1 else f"{stem}_{frame:04d}.png"
+        path = os.path.join(output_dir, name)
+        if not image.save(path, "PNG"):
+            raise OSError(f"Unable to write {path}")
+        outputs.append(path)
+    return outputs
+
+
+def _export_animation(document, job: ConversionJob, output_dir: str, stem: str) -> list[str]:
+    frame_range = None
+    if job.frames not in (None, "current"):
+        frames = parse_frames(job.frames, document)
+        frame_range = (frames[0], frames[-1])
+    scale_document(document, job.scale)
+    path = os.path.join(output_dir, stem + _ANIMATION_SUFFIXES[job.format])
+    # Files already run in parallel, so each export encodes on one thread.
+    result = animation_export.export_animation(
+        document, path, format=job.format, frame_range=frame_range, max_workers=1
+    )
+    outputs = [result.path]
+    if result.metadata_path:
+        outputs.append(result.metadata_path)
+    return outputs
+
+
+# ----------------------------------------------------------------------
+# Batch driver
+# ----------------------------------------------------------------------
+def collect_sources(inputs: list[str]) -> list[str]:
+    """Expand directories and ``@list`` files into document paths."""
+
+    sources: list[str] = []
+    for entry in inputs:
+        if entry.startswith("@"):
+            with open(entry[1:], encoding="utf-8") as handle:
+                sources.extend(line.strip() for line in handle if line.strip())
+        elif os.path.isdir(entry):
+            for name in sorted(os.listdir(entry)):
+                if name.lower().endswith(DOCUMENT_SUFFIXES):
+                    sources.append(os.path.join(entry, name))
+        else:
+            sources.append(entry)
+    return list(dict.fromkeys(sources))
+
+
+def run_batch(
+    jobs: list[ConversionJob],
+    *,
+    workers: int = 1,
+    report: TextIO | None = None,
+) -> list[ConversionResult]:
+    """Convert ``jobs``, reporting each result as it finishes."""
+
+    total = len(jobs)
+    results: list[ConversionResult] = []
+
+    def record(result: ConversionResult) -> None:
+        results.append(result)
+        if report is not None:
+            _report_progress(report, len(results), total, result)
+
+    if workers <= 1 or total <= 1:
+        for job in jobs:
+            record(convert_document(job))
+    else:
+        # Spawned workers never inherit the parent's Qt state.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, total), mp_context=context) as pool:
+            futures = [pool.submit(convert_document, job) for job in jobs]
+            for future in as_completed(futures):
+                record(future.result())
+
+    order = {job.source: index for index, job in enumerate(jobs)}
+    results.sort(key=lambda result: order[result.source])
+    return results
+
+
+def _report_progress(report: TextIO, done: int, total: int, result: ConversionResult) -> None:
+    width = len(str(total))
+    if result.ok:
+        detail = f"{len(result.outputs)} file(s)"
+        status = "ok"
+    else:
+        detail = result.error
+        status = "FAILED"
+    print(
+        f"[{done:>{width}}/{total}] {status} {result.source}: {detail} ({result.elapsed:.2f}s)",
+        file=report,
+        flush=True,
+    )
+
+
+def format_summary(results: list[ConversionResult], elapsed: float) -> str:
+    failed = [result for result in results if not result.ok]
+    outputs = sum(len(result.outputs) for result in results)
+    summary = (
+        f"Converted {len(results) - len(failed)} of {len(results)} document(s) "
+        f"into {outputs} file(s) in {elapsed:.2f}s"
+    )
+    if failed:
+        summary += f"; {len(failed)} failed:\n" + "\n".join(
+            f"  {result.source}: {result.error}" for result in failed
+        )
+    return summary
+
+
+def print_info(sources: list[str], stream: TextIO | None = None) -> int:
+    """Print archive summaries read with :meth:`AOLEArchive.peek`."""
+
+    stream = stream or sys.stdout
+    status = 0
+    for source in sources:
+        try:
+            summary = AOLEArchive.peek(source)
+        except (OSError, ValueError, zipfile.BadZipFile) as exc:
+            print(f"{source}: {type(exc).__name__}: {exc}", file=stream)
+            status = 1
+            continue
+        print(
+            f"{source}: {summary.width}x{summary.height}, {summary.layer_count} layer(s), "
+            f"{summary.key_count} key(s), {summary.frame_count} frame(s), "
+            f"{summary.image_count} image(s) {summary.image_bytes} bytes stored / "
+            f"{summary.pixel_bytes} bytes decoded, file {summary.file_size} bytes",
+            file=stream,
+        )
+    return status
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m portal.cli",
+        description="Render and convert Pixel Portal documents without the GUI.",
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="Documents (.aole, .tif), directories of documents, or @file lists.",
+    )
+    parser.add_argument("-o", "--output-dir", help="Output directory (default: next to each input).")
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default=FORMAT_PNG,
+        help="png writes one image per frame; the others export an animation.",
+    )
+    parser.add_argument(
+        "--frames",
+        help='Frames to render: "current", "loop", "all" or a list such as "0-3,7". '
+        "Animations use the first to last selected frame (default: loop range).",
+    )
+    parser.add_argument(
+        "--layers",
+        help="Comma-separated layer names or indexes to render; other layers are hidden.",
+    )
+    parser.add_argument("--scale", type=int, default=1, help="Integer nearest-neighbour scale.")
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes (default: CPU count).",
+    )
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only print the summary.")
+    parser.add_argument(
+        "--info",
+        action="store_true",
+        help="Print each .aole document's embedded summary instead of rendering.",
+    )
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.scale < 1:
+        parser.error("--scale must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    layers = tuple(name.strip() for name in (args.layers or "").split(",") if name.strip())
+    try:
+        sources = collect_sources(args.inputs)
+    except OSError as exc:
+        parser.error(str(exc))
+    if args.info:
+        return print_info(sources)
+    jobs = [
+        ConversionJob(
+            source=source,
+            output_dir=args.output_dir,
+            format=args.format,
+            frames=args.frames,
+            layers=layers,
+            scale=args.scale,
+        )
+        for source in sources
+    ]
+
+    started = time.perf_counter()
+    results = run_batch(jobs, workers=args.workers, report=None if args.quiet else sys.stderr)
+    print(format_summary(results, time.perf_counter() - started), file=sys.stderr)
+    return 0 if all(result.ok for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,20 +5,13 @@ from typing import TYPE_CHECKING
 
 from portal.core.command import Command
 from PySide6.QtGui import QTransform, QImage, QPainter, QPainterPath
-from PySide6.QtCore import Qt, QPoint, QPointF, QBuffer
-from PIL import Image
-from PIL.ImageQt import ImageQt
-import io
+from PySide6.QtCore import Qt, QPoint, QPointF
+
+from portal.core.image_conversion import pil_to_qimage, qimage_to_pil
 
 if TYPE_CHECKING:
     from portal.core.document import Document
 
-# Importing `rembg` at module load time pulls in heavy dependencies and can
-# significantly slow down or even hang test collection.  To keep the import
-# lightweight, defer it until background removal is actually requested.
-rembg_remove = None
-
-
 def _merge_layer_down_with_union(document: 'Document', layer_index: int) -> bool:
     layer_manager = document.layer_manager
     try:
@@ -714,33 +707,45 @@ class ScaleLayerCommand(Command):
                 self.canvas._update_selection_and_emit_size(None)
 
 class RemoveBackgroundCommand(Command):
-    def __init__(self, layer):
+    """Replace key images with their background-removed versions.
+
+    ``results`` maps keys of ``layer`` to their new images, as produced by
+    :class:`BackgroundRemovalService`, so removal over every key undoes in
+    one step. Without ``results`` the active key is processed synchronously.
+    """
+
+    def __init__(self, layer, results: dict | None = None):
         self.layer = layer
-        self.before_image = layer.image.copy()
+        self.results = results
+        if results is None:
+            self.changes = [(layer.active_key, layer.image.copy(), None)]
+        else:
+            self.changes = [(key, key.image, image) for key, image in results.items()]
+        self.before_image = self.changes[0][1] if self.changes else None
 
     def execute(self):
-        global rembg_remove
-        if rembg_remove is None:
+        if self.results is None and self.changes[0][2] is None:
+            key, before, _ = self.changes[0]
             try:
-                from rembg import remove as rembg_remove  # type: ignore
-            except Exception:
+                from portal.core.services.background_removal_service import remove_background
+
+                result = remove_background(qimage_to_pil(before))
+            except ImportError:
                 print(
                     "Background removal unavailable: rembg or its dependencies are not installed."
                 )
                 return
-        buffer = QBuffer()
-        buffer.open(QBuffer.ReadWrite)
-        self.before_image.save(buffer, "PNG")
-        pil_image = Image.open(io.BytesIO(buffer.data()))
-        try:
-            result = rembg_remove(pil_image)
-        except Exception as e:
-            print(f"Background removal failed: {e}")
-            return
-        q_image = ImageQt(result.convert("RGBA"))
-        self.layer.image = QImage(q_image)
-        self.layer.on_image_change.emit()
+            except Exception as e:
+                print(f"Background removal failed: {e}")
+                return
+            self.changes[0] = (key, before, pil_to_qimage(result))
+        self._apply(2)
 
     def undo(self):
-        self.layer.image = self.before_image.copy()
+        self._apply(1)
+
+    def _apply(self, index: int) -> None:
+        for change in self.changes:
+            if change[index] is not None:
+                change[0].image = QImage(change[index])
         self.layer.on_image_change.emit()
@@ -0,0 +1,517 @@
+"""Export a document's playback range as GIF, APNG, WebP or a sprite sheet.
+
+Frames go through two parallel passes over the loop range:
+
+1. An analysis pass composites each distinct frame and records its content
+   hash (and, for GIF, its colors). Frames that resolve to the same keys are
+   never composited twice, and consecutive frames with identical pixels
+   collapse into one longer frame.
+2. An encode pass composites the remaining frames again and hands them to
+   the writer, with only a few frames in flight at once.
+
+GIF and APNG files are written one frame at a time and sprite sheets are
+pasted together as frames arrive. Pillow's WebP encoder collects every
+frame before it encodes, so WebP export holds the whole animation in memory.
+
+Compositing a frame is cheap next to encoding it, so rendering twice costs
+less than holding every frame in memory. GIF output uses one palette built
+from the colors of every frame, so colors do not flicker between frames.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import json
+import io
+import math
+import os
+import struct
+import zlib
+
+import numpy as np
+from PIL import GifImagePlugin, Image
+from PySide6.QtCore import QSize, Qt
+from PySide6.QtGui import QImage, QPainter
+
+from portal.core.aole_archive import image_content_hash
+from portal.core.atomic_file import atomic_write
+from portal.core.image_conversion import qimage_to_pil
+
+FORMAT_GIF = "gif"
+FORMAT_APNG = "apng"
+FORMAT_WEBP = "webp"
+FORMAT_SPRITE_SHEET = "sprite_sheet"
+FORMATS = (FORMAT_GIF, FORMAT_APNG, FORMAT_WEBP, FORMAT_SPRITE_SHEET)
+
+_SUFFIX_FORMATS = {
+    ".gif": FORMAT_GIF,
+    ".apng": FORMAT_APNG,
+    ".png": FORMAT_APNG,
+    ".webp": FORMAT_WEBP,
+}
+
+# GIF has a single transparent palette entry; pixels below this alpha use it.
+GIF_ALPHA_THRESHOLD = 128
+_GIF_MAX_COLORS = 255
+# Upper bound on the weighted color sample fed to the median-cut quantizer.
+_PALETTE_SAMPLE_SIZE = 1 << 20
+
+
+@dataclass(eq=False)
+class _Segment:
+    """A run of consecutive frames that show the same composite."""
+
+    first_frame: int
+    end_frame: int
+    layers: tuple[tuple[QImage, float], ...]
+    keys: tuple[int, ...]
+    digest: str | None = None
+
+    @property
+    def frames(self) -> list[int]:
+        return list(range(self.first_frame, self.end_frame))
+
+
+@dataclass
+class AnimationExportResult:
+    path: str
+    format: str
+    frame_count: int
+    rendered_frames: int
+    durations: list[int] = field(default_factory=list)
+    metadata_path: str | None = None
+
+
+def format_for_path(filename: str) -> str:
+    suffix = os.path.splitext(filename)[1].lower()
+    try:
+        return _SUFFIX_FORMATS[suffix]
+    except KeyError:
+        raise ValueError(f"Unsupported animation format: {suffix or filename}") from None
+
+
+def export_animation(
+    document,
+    filename: str,
+    *,
+    format: str | None = None,
+    frame_range: tuple[int, int] | None = None,
+    fps: float | None = None,
+    loop: int = 0,
+    max_workers: int | None = None,
+    window: int | None = None,
+) -> AnimationExportResult:
+    """Write the frames of ``document`` to ``filename``.
+
+    ``frame_range`` is inclusive and defaults to the document's playback loop
+    range; ``fps`` defaults to its playback rate. ``window`` bounds how many
+    rendered frames may wait for the encoder at once.
+    """
+
+    if format is None:
+        format = format_for_path(filename)
+    if format not in FORMATS:
+        raise ValueError(f"Unknown animation format: {format}")
+    if frame_range is None:
+        frame_range = document.get_playback_loop_range()
+    start, end = (int(value) for value in frame_range)
+    if end < start:
+        raise ValueError("Animation frame range is empty.")
+    if fps is None:
+        fps = document.playback_fps
+    fps = document.normalize_playback_fps(fps)
+    if window is None:
+        window = max(2, 2 * (max_workers or os.cpu_count() or 1))
+
+    size = QSize(max(1, int(document.width)), max(1, int(document.height)))
+    segments = _plan_segments(document, start, end)
+    rendered_frames = len(segments)
+
+    collect_colors = format == FORMAT_GIF
+    palette = _Palette()
+
+    def analyse(segment: _Segment):
+        return _analyse_segment(segment, size, collect_colors)
+
+    analysis = _ordered_map(analyse, segments, max_workers, window)
+    for segment, (digest, colors, counts) in zip(segments, analysis):
+        segment.digest = digest
+        if collect_colors:
+            palette.add(colors, counts)
+    segments = _merge_identical(segments)
+    durations = _durations(segments, start, fps, centiseconds=format == FORMAT_GIF)
+
+    if collect_colors:
+        palette.build()
+
+    def render(segment: _Segment) -> Image.Image:
+        image = _render_rgba(segment, size)
+        if collect_colors:
+            return palette.apply(image)
+        return qimage_to_pil(image)
+
+    frames = _ordered_map(render, segments, max_workers, window)
+
+    metadata_path = None
+    with atomic_write(filename, prefix=".export-") as temp_path:
+        if format == FORMAT_SPRITE_SHEET:
+            metadata = _write_sprite_sheet(frames, segments, durations, size, temp_path, fps)
+            metadata["image"] = os.path.basename(filename)
+            metadata_path = os.path.splitext(filename)[0] + ".json"
+            with open(metadata_path, "w", encoding="utf-8") as handle:
+                json.dump(metadata, handle, indent=2)
+        elif format == FORMAT_APNG:
+            _write_apng(frames, durations, temp_path, loop)
+        elif format == FORMAT_GIF:
+            _write_gif(frames, durations, size, temp_path, loop, palette)
+        else:
+            _write_webp(frames, durations, temp_path, loop)
+
+    return AnimationExportResult(
+        path=filename,
+        format=format,
+        frame_count=len(segments),
+        rendered_frames=rendered_frames,
+        durations=durations,
+        metadata_path=metadata_path,
+    )
+
+
+# ----------------------------------------------------------------------
+# Planning
+# ----------------------------------------------------------------------
+def _plan_segments(document, start: int, end: int) -> list[_Segment]:
+    """Group frames by the keys they show.
+
+    Keys are resolved here, on the calling thread, so lazily loaded keys
+    decode before any worker touches them.
+    """
+
+    layers = [layer for layer in document.layer_manager.layers if layer.visible]
+    segments: list[_Segment] = []
+    for frame in range(start, end + 1):
+        keys = []
+        images = []
+        for layer in layers:
+            image = document._image_for_layer_frame(layer, frame)
+            if image is None:
+                continue
+            keys.append(image.cacheKey())
+            images.append((QImage(image), layer.opacity))
+        keys = tuple(keys)
+        if segments and segments[-1].keys == keys:
+            segments[-1].end_frame = frame + 1
+            continue
+        segments.append(_Segment(frame, frame + 1, tuple(images), keys))
+    return segments
+
+
+def _merge_identical(segments: list[_Segment]) -> list[_Segment]:
+    merged: list[_Segment] = []
+    for segment in segments:
+        if merged and merged[-1].digest == segment.digest:
+            merged[-1].end_frame = segment.end_frame
+            continue
+        merged.append(segment)
+    return merged
+
+
+def _durations(segments: list[_Segment], start: int, fps: float, *, centiseconds: bool) -> list[int]:
+    """Frame durations in milliseconds without accumulating rounding drift.
+
+    GIF stores delays in hundredths of a second, so its boundaries are
+    rounded to 10 ms.
+    """
+
+    step = 10 if centiseconds else 1
+
+    def timestamp(frame: int) -> int:
+        return int(round((frame - start) * 1000.0 / fps / step)) * step
+
+    durations = []
+    for segment in segments:
+        duration = timestamp(segment.end_frame) - timestamp(segment.first_frame)
+        durations.append(max(step, duration))
+    return durations
+
+
+# ----------------------------------------------------------------------
+# Rendering
+# ----------------------------------------------------------------------
+def _ordered_map(
+    func: Callable[[object], object],
+    items: Iterable[object],
+    max_workers: int | None,
+    window: int,
+) -> Iterator[object]:
+    """Lazily yield ``func(item)`` in order with at most ``window`` in flight."""
+
+    if max_workers == 1:
+        for item in items:
+            yield func(item)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _render_rgba(segment: _Segment, size: QSize) -> QImage:
+    image = QImage(size, QImage.Format_ARGB32)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    for layer_image, opacity in segment.layers:
+        painter.setOpacity(opacity)
+        painter.drawImage(0, 0, layer_image)
+    painter.end()
+    return image
+
+
+def _analyse_segment(segment: _Segment, size: QSize, collect_colors: bool):
+    image = _render_rgba(segment, size)
+    digest = image_content_hash(image)
+    if not collect_colors:
+        return digest, None, None
+    pixels = _argb_pixels(image)
+    opaque = pixels[(pixels >> 24) >= GIF_ALPHA_THRESHOLD] & 0x00FFFFFF
+    colors, counts = np.unique(opaque, return_counts=True)
+    return digest, colors, counts
+
+
+def _argb_pixels(image: QImage) -> np.ndarray:
+    width = image.width()
+    height = image.height()
+    stride = image.bytesPerLine() // 4
+    buffer = np.frombuffer(image.constBits(), dtype=np.uint32, count=stride * height)
+    return buffer.reshape(height, stride)[:, :width]
+
+
+class _Palette:
+    """Shared GIF palette built from every frame's opaque colors."""
+
+    def __init__(self) -> None:
+        self._colors: dict[int, int] = {}
+        self.colors = np.zeros(0, dtype=np.uint32)
+        self.indices = np.zeros(0, dtype=np.uint8)
+        self.palette: list[int] = []
+        self.transparent_index = 0
+
+    def add(self, colors: np.ndarray, counts: np.ndarray) -> None:
+        for color, count in zip(colors.tolist(), counts.tolist()):
+            self._colors[color] = self._colors.get(color, 0) + count
+
+    def build(self) -> None:
+        colors = np.array(sorted(self._colors), dtype=np.uint32)
+        counts = np.array([self._colors[color] for color in colors.tolist()], dtype=np.int64)
+        self.colors = colors
+        if colors.size <= _GIF_MAX_COLORS:
+            palette_rgb = colors
+            self.indices = np.arange(colors.size, dtype=np.uint8)
+        else:
+            palette_rgb, self.indices = _quantize_colors(colors, counts)
+        self.transparent_index = int(palette_rgb.size)
+        rgb = _unpack_rgb(palette_rgb).reshape(-1).tolist()
+        self.palette = rgb + [0, 0, 0] * (256 - int(palette_rgb.size))
+
+    def apply(self, image: QImage) -> Image.Image:
+        pixels = _argb_pixels(image)
+        opaque = (pixels >> 24) >= GIF_ALPHA_THRESHOLD
+        indices = np.full(pixels.shape, self.transparent_index, dtype=np.uint8)
+        if self.colors.size:
+            lookup = np.searchsorted(self.colors, pixels[opaque] & 0x00FFFFFF)
+            indices[opaque] = self.indices[lookup]
+        frame = Image.fromarray(indices, mode="P")
+        frame.putpalette(self.palette)
+        frame.info["transparency"] = self.transparent_index
+        return frame
+
+
+def _unpack_rgb(colors: np.ndarray) -> np.ndarray:
+    colors = colors.astype(np.uint32)
+    return np.stack(
+        [(colors >> 16) & 0xFF, (colors >> 8) & 0xFF, colors & 0xFF], axis=-1
+    ).astype(np.uint8)
+
+
+def _quantize_colors(colors: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Reduce ``colors`` to a GIF palette weighted by how often each appears."""
+
+    total = int(counts.sum())
+    weights = np.maximum(1, (counts * _PALETTE_SAMPLE_SIZE) // max(1, total))
+    sample = np.repeat(_unpack_rgb(colors), weights, axis=0)
+    sample_image = Image.fromarray(sample.reshape(1, -1, 3), mode="RGB")
+    palette_image = sample_image.quantize(_GIF_MAX_COLORS, method=Image.Quantize.MEDIANCUT)
+
+    palette_rgb = np.array(palette_image.getpalette(), dtype=np.uint32).reshape(-1, 3)
+    palette_rgb = palette_rgb[:_GIF_MAX_COLORS]
+    packed = (palette_rgb[:, 0] << 16) | (palette_rgb[:, 1] << 8) | palette_rgb[:, 2]
+
+    colors_image = Image.fromarray(_unpack_rgb(colors).reshape(1, -1, 3), mode="RGB")
+    mapped = colors_image.quantize(palette=palette_image, dither=Image.Dither.NONE)
+    return packed, np.asarray(mapped, dtype=np.uint8).reshape(-1)
+
+
+# ----------------------------------------------------------------------
+# Writers
+# ----------------------------------------------------------------------
+def _write_apng(
+    frames: Iterator[Image.Image],
+    durations: list[int],
+    path: str,
+    loop: int,
+) -> None:
+    """Write an APNG one frame at a time.
+
+    Pillow's APNG writer buffers every frame, so each frame is encoded as a
+    standalone PNG and its image data is rewrapped as an animation frame.
+    """
+
+    sequence = 0
+    with open(path, "wb") as handle:
+        handle.write(_PNG_SIGNATURE)
+        for index, (frame, duration) in enumerate(zip(frames, durations)):
+            chunks = _png_chunks(frame)
+            header = next(data for chunk_type, data in chunks if chunk_type == b"IHDR")
+            if index == 0:
+                handle.write(_png_chunk(b"IHDR", header))
+                handle.write(_png_chunk(b"acTL", struct.pack(">II", len(durations), loop)))
+            width, height = struct.unpack(">II", header[:8])
+            delay, denominator = (duration, 1000) if duration <= 0xFFFF else (
+                min(0xFFFF, round(duration / 10)), 100
+            )
+            handle.write(
+                _png_chunk(
+                    b"fcTL",
+                    struct.pack(">IIIIIHHBB", sequence, width, height, 0, 0, delay, denominator, 0, 0),
+                )
+            )
+            sequence += 1
+            for chunk_type, data in chunks:
+                if chunk_type != b"IDAT":
+                    continue
+                if index == 0:
+                    handle.write(_png_chunk(b"IDAT", data))
+                else:
+                    handle.write(_png_chunk(b"fdAT", struct.pack(">I", sequence) + data))
+                    sequence += 1
+        handle.write(_png_chunk(b"IEND", b""))
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _png_chunks(image: Image.Image) -> list[tuple[bytes, bytes]]:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    data = buffer.getvalue()
+    chunks = []
+    offset = len(_PNG_SIGNATURE)
+    while offset < len(data):
+        (length,) = struct.unpack_from(">I", data, offset)
+        chunk_type = data[offset + 4 : offset + 8]
+        chunks.append((chunk_type, data[offset + 8 : offset + 8 + length]))
+        offset += length + 12
+    return chunks
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    checksum = zlib.crc32(chunk_type + data) & 0xFFFFFFFF
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", checksum)
+
+
+def _write_gif(
+    frames: Iterator[Image.Image],
+    durations: list[int],
+    size: QSize,
+    path: str,
+    loop: int,
+    palette: _Palette,
+) -> None:
+    """Write a GIF one frame at a time.
+
+    Pillow's GIF writer keeps every frame until the file is closed, so the
+    header and the shared palette are written here and each frame's
+    descriptor and LZW data are appended as it arrives.
+    """
+
+    with open(path, "wb") as handle:
+        handle.write(b"GIF89a" + struct.pack("<HH", size.width(), size.height()))
+        # Global color table of 256 entries, background index 0.
+        handle.write(bytes((0xF7, 0, 0)) + bytes(palette.palette))
+        handle.write(b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00")
+        for frame, duration in zip(frames, durations):
+            for data in GifImagePlugin.getdata(
+                frame,
+                duration=min(0xFFFF * 10, duration),
+                disposal=2,
+                transparency=palette.transparent_index,
+            ):
+                handle.write(data)
+        handle.write(b";")
+
+
+def _write_webp(
+    frames: Iterator[Image.Image],
+    durations: list[int],
+    path: str,
+    loop: int,
+) -> None:
+    # Pillow collects WebP frames into a list before encoding them.
+    first = next(frames)
+    first.save(
+        path,
+        format="WEBP",
+        save_all=True,
+        append_images=frames,
+        duration=durations,
+        loop=loop,
+        lossless=True,
+    )
+
+
+def _write_sprite_sheet(
+    frames: Iterator[Image.Image],
+    segments: list[_Segment],
+    durations: list[int],
+    size: QSize,
+    path: str,
+    fps: float,
+) -> dict:
+    width = size.width()
+    height = size.height()
+    count = len(segments)
+    columns = max(1, math.ceil(math.sqrt(count)))
+    rows = max(1, math.ceil(count / columns))
+    sheet = Image.new("RGBA", (columns * width, rows * height), (0, 0, 0, 0))
+
+    entries = []
+    for index, (frame, segment, duration) in enumerate(zip(frames, segments, durations)):
+        x = (index % columns) * width
+        y = (index // columns) * height
+        sheet.paste(frame, (x, y))
+        entries.append(
+            {
+                "x": x,
+                "y": y,
+                "w": width,
+                "h": height,
+                "duration": duration,
+                "source_frames": segment.frames,
+            }
+        )
+    sheet.save(path, format="PNG")
+    return {
+        "size": {"w": sheet.width, "h": sheet.height},
+        "frame_size": {"w": width, "h": height},
+        "columns": columns,
+        "rows": rows,
+        "fps": fps,
+        "frames": entries,
+    }
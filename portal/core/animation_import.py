@@ -0,0 +1,157 @@
+"""Import animated images and sprite sheets as the keys of a new layer.
+
+Frames are streamed one at a time from Pillow, so only the frame being
+converted and the previous one (for duplicate detection) are held besides
+the keys themselves. Consecutive identical frames become a single held key.
+All keys are built off-document and handed to the layer in one go, so the
+import costs one structure change instead of one signal per frame.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+import json
+import os
+
+from PIL import Image, ImageSequence
+from PySide6.QtCore import QRect, Qt
+from PySide6.QtGui import QImage, QPainter
+
+from portal.core.image_conversion import pil_to_qimage
+from portal.core.key import Key
+from portal.core.layer import Layer
+
+DEFAULT_FRAME_DURATION = 100
+
+
+@dataclass
+class ImportedFrame:
+    image: QImage
+    duration: int = DEFAULT_FRAME_DURATION
+    # Exact timeline frame when the source records one (sprite sheet JSON).
+    frame_number: int | None = None
+
+
+def read_animation_frames(path: str) -> Iterator[ImportedFrame]:
+    """Yield the frames of an animated GIF, APNG or WebP file."""
+
+    with Image.open(path) as source:
+        for frame in ImageSequence.Iterator(source):
+            duration = frame.info.get("duration") or DEFAULT_FRAME_DURATION
+            yield ImportedFrame(pil_to_qimage(frame), int(round(duration)))
+
+
+def read_sprite_sheet_frames(
+    path: str,
+    *,
+    columns: int | None = None,
+    rows: int | None = None,
+    frame_count: int | None = None,
+    duration: int = DEFAULT_FRAME_DURATION,
+) -> Iterator[ImportedFrame]:
+    """Yield the cells of a sprite sheet in reading order.
+
+    A JSON sidecar written by the animation exporter supplies exact cell
+    positions, durations and frame numbers; otherwise the sheet is sliced
+    into a ``columns`` x ``rows`` grid.
+    """
+
+    metadata = _read_sprite_sheet_metadata(path)
+    with Image.open(path) as source:
+        sheet = pil_to_qimage(source)
+
+    if metadata is not None:
+        for entry in metadata["frames"]:
+            rect = QRect(entry["x"], entry["y"], entry["w"], entry["h"])
+            source_frames = entry.get("source_frames") or [None]
+            yield ImportedFrame(
+                sheet.copy(rect),
+                int(entry.get("duration", duration)),
+                source_frames[0],
+            )
+        return
+
+    if not columns or not rows:
+        raise ValueError("Sprite sheet grid size is required without a JSON sidecar.")
+    cell_width = sheet.width() // columns
+    cell_height = sheet.height() // rows
+    if cell_width <= 0 or cell_height <= 0:
+        raise ValueError("Sprite sheet grid is larger than the image.")
+    count = columns * rows if frame_count is None else min(frame_count, columns * rows)
+    for index in range(count):
+        x = (index % columns) * cell_width
+        y = (index // columns) * cell_height
+        yield ImportedFrame(sheet.copy(x, y, cell_width, cell_height), duration)
+
+
+def has_sprite_sheet_metadata(path: str) -> bool:
+    return _read_sprite_sheet_metadata(path) is not None
+
+
+def _read_sprite_sheet_metadata(path: str) -> dict | None:
+    metadata_path = os.path.splitext(path)[0] + ".json"
+    try:
+        with open(metadata_path, encoding="utf-8") as handle:
+            metadata = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(metadata, dict) or not isinstance(metadata.get("frames"), list):
+        return None
+    return metadata
+
+
+def build_animation_layer(
+    layer_manager,
+    frames: Iterable[ImportedFrame],
+    *,
+    name: str,
+    start_frame: int = 0,
+    fps: float | None = None,
+) -> Layer:
+    """Create a layer whose keys follow ``frames``.
+
+    With ``fps`` each frame starts at its accumulated source time converted
+    to timeline frames; without it every source frame takes one timeline
+    frame. Frames identical to the previous key, or landing on a timeline
+    frame that is already taken, do not create keys.
+    """
+
+    width = layer_manager.width
+    height = layer_manager.height
+    keys: list[Key] = []
+    previous: QImage | None = None
+    elapsed = 0
+    for index, frame in enumerate(frames):
+        if frame.frame_number is not None:
+            frame_number = start_frame + frame.frame_number
+        elif fps:
+            frame_number = start_frame + int(round(elapsed * fps / 1000.0))
+        else:
+            frame_number = start_frame + index
+        elapsed += frame.duration
+
+        if previous is not None and frame.image == previous:
+            continue
+        previous = frame.image
+        if keys and frame_number <= keys[-1].frame_number:
+            continue
+        keys.append(Key(width, height, image=_fit_to_canvas(frame.image, width, height), frame_number=frame_number))
+
+    if not keys:
+        keys.append(Key(width, height, frame_number=start_frame))
+    return Layer(width, height, name, layer_manager=layer_manager, keys=keys)
+
+
+def _fit_to_canvas(image: QImage, width: int, height: int) -> QImage:
+    """Return ``image`` placed on a ``width`` x ``height`` canvas."""
+
+    if image.width() == width and image.height() == height:
+        return image
+    canvas = QImage(width, height, QImage.Format_ARGB32)
+    canvas.fill(Qt.transparent)
+    painter = QPainter(canvas)
+    painter.setCompositionMode(QPainter.CompositionMode_Source)
+    painter.drawImage(0, 0, image)
+    painter.end()
+    return canvas
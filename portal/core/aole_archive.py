@@ -1,15 +1,27 @@
 from __future__ import annotations
 
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import json
 import os
+import re
 from dataclasses import dataclass, field
 from pathlib import PurePosixPath
 import zipfile
 
-from PySide6.QtCore import QBuffer
+from PySide6.QtCore import QBuffer, Qt
 from PySide6.QtGui import QImage
 
+from portal.core.atomic_file import atomic_write
 from portal.core.key import Key
+from portal.core.key_codec import (
+    decode_payload,
+    encode_png,
+    encode_raw,
+    is_raw_payload,
+    payload_suffix,
+)
 from portal.core.layer import Layer
 
 
@@ -17,15 +29,26 @@ class ArchiveFormatError(ValueError):
     """Raised when an AOLE archive cannot be parsed."""
 
 
+@dataclass(eq=False)
+class _PendingImage:
+    """A key image waiting to be stored under its content hash."""
+
+    image: QImage | None = None
+    payload: bytes | None = None
+    digest: str | None = None
+    revision: int | None = None
+    path: str = ""
+
+
 @dataclass
 class _KeyRecord:
     frame: int
-    image_path: str
+    image: _PendingImage
 
     def to_dict(self) -> dict[str, object]:
         return {
             "frame": self.frame,
-            "image": self.image_path,
+            "image": self.image.path,
         }
 
 
@@ -36,7 +59,7 @@ class _LayerRecord:
     visible: bool
     opacity: float
     onion_skin_enabled: bool
-    image_path: str
+    image: _PendingImage
     keys: list[_KeyRecord] = field(default_factory=list)
 
     def to_dict(self) -> dict[str, object]:
@@ -46,30 +69,295 @@ class _LayerRecord:
             "visible": self.visible,
             "opacity": self.opacity,
             "onion_skin_enabled": self.onion_skin_enabled,
-            "image": self.image_path,
+            "image": self.image.path,
         }
         if self.keys:
             data["keys"] = [key.to_dict() for key in self.keys]
         return data
 
 
+class ArchiveCache:
+    """Remembers encoded key images between saves of the same document.
+
+    Entries are keyed by the ``QImage.cacheKey()`` of decoded key pixels,
+    which is what :attr:`Key.revision` reports for a loaded key, so a key
+    whose pixels have not been touched since the last save or load reuses
+    its content hash and PNG payload instead of being hashed and encoded
+    again. Undecoded keys are not looked up: they are written from the
+    payload they were loaded with, whose hash is already known. Their
+    revision comes from ``id()`` of that payload, which may be reused once
+    the payload is freed, so it would not be a safe key across saves.
+    """
+
+    def __init__(self) -> None:
+        self._payloads: dict[int, tuple[str, bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, revision: int) -> tuple[str, bytes] | None:
+        entry = self._payloads.get(revision)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def replace(self, payloads: dict[int, tuple[str, bytes]]) -> None:
+        """Keep only ``payloads``, dropping entries for stale revisions."""
+
+        self._payloads = dict(payloads)
+
+    def clear(self) -> None:
+        self._payloads.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+
+@dataclass
+class ArchiveSummary:
+    """What :meth:`AOLEArchive.peek` learns without decoding any key."""
+
+    filename: str
+    version: int
+    width: int
+    height: int
+    layer_count: int
+    key_count: int
+    frame_count: int
+    # Distinct key images stored, their stored size and their decoded size.
+    image_count: int
+    image_bytes: int
+    pixel_bytes: int
+    file_size: int
+    playback_fps: float
+    layer_names: list[str] = field(default_factory=list)
+    thumbnail: QImage | None = None
+
+
 class AOLEArchive:
     """Serialize and deserialize Pixel Portal documents without animation."""
 
     METADATA_FILE = "document.json"
+    # Pre-rendered preview of the current frame, at most THUMBNAIL_SIZE
+    # pixels on its longest edge.
+    THUMBNAIL_FILE = "thumbnail.png"
+    THUMBNAIL_SIZE = 128
     IMAGE_ROOT = PurePosixPath("layers")
-    VERSION = 3
+    # Version 4 may contain raw zlib key entries alongside PNG ones; older
+    # archives only hold PNGs and remain readable.
+    VERSION = 4
+    KEY_FORMAT_PNG = "png"
+    KEY_FORMAT_RAW = "raw"
+    # zlib level used for raw key entries (1 favours speed, 9 size).
+    RAW_COMPRESSION_LEVEL = 1
+    # Number of threads used to encode/decode key images. ``None`` lets the
+    # thread pool pick a default based on the CPU count.
+    MAX_WORKERS: int | None = None
 
     @classmethod
-    def save(cls, document: "Document", filename: str) -> None:
-        writer = _ArchiveWriter(document, cls.IMAGE_ROOT, cls.METADATA_FILE, cls.VERSION)
+    def save(
+        cls,
+        document: "Document",
+        filename: str,
+        *,
+        max_workers: int | None = None,
+        cache: ArchiveCache | None = None,
+        key_format: str = KEY_FORMAT_PNG,
+        compression_level: int | None = None,
+    ) -> None:
+        """Write ``document`` to ``filename``.
+
+        ``key_format`` selects how newly encoded keys are stored: PNG, or
+        raw pixels cropped to their opaque bounds and zlib-compressed at
+        ``compression_level``. The raw format is much faster to write and
+        also reuses payloads in whichever encoding they already have.
+        """
+
+        if key_format not in (cls.KEY_FORMAT_PNG, cls.KEY_FORMAT_RAW):
+            raise ValueError(f"Unknown key format: {key_format}")
+        if compression_level is None:
+            compression_level = cls.RAW_COMPRESSION_LEVEL
+        writer = _ArchiveWriter(
+            document,
+            cls.IMAGE_ROOT,
+            cls.METADATA_FILE,
+            cls.VERSION,
+            max_workers=cls._resolve_max_workers(max_workers),
+            cache=cache,
+            raw_keys=key_format == cls.KEY_FORMAT_RAW,
+            compression_level=max(0, min(9, int(compression_level))),
+            thumbnail_file=cls.THUMBNAIL_FILE,
+            thumbnail_size=cls.THUMBNAIL_SIZE,
+        )
         writer.write(filename)
 
     @classmethod
-    def load(cls, document_cls: type["Document"], filename: str) -> "Document":
-        reader = _ArchiveReader(document_cls, cls.METADATA_FILE)
+    def load(
+        cls,
+        document_cls: type["Document"],
+        filename: str,
+        *,
+        max_workers: int | None = None,
+        cache: ArchiveCache | None = None,
+        lazy: bool = False,
+    ) -> "Document":
+        """Read ``filename`` into a new document.
+
+        With ``lazy`` enabled only the keys visible at the current frame are
+        decoded; every other key keeps its PNG payload and decodes on first
+        pixel access.
+        """
+
+        reader = _ArchiveReader(
+            document_cls,
+            cls.METADATA_FILE,
+            cls.VERSION,
+            max_workers=cls._resolve_max_workers(max_workers),
+            cache=cache,
+            lazy=lazy,
+        )
         return reader.read(filename)
 
+    @classmethod
+    def peek(cls, filename: str) -> ArchiveSummary:
+        """Read the metadata and thumbnail of ``filename`` without its keys.
+
+        Only the zip directory, ``document.json`` and the thumbnail entry are
+        read, so the cost does not grow with the size of the key images.
+        Archives written before summaries existed fall back to sizes taken
+        from the zip directory and have no thumbnail.
+        """
+
+        with zipfile.ZipFile(filename, "r") as archive:
+            try:
+                metadata = json.loads(archive.read(cls.METADATA_FILE).decode("utf-8"))
+            except KeyError as exc:
+                raise ArchiveFormatError("Missing metadata file") from exc
+            except json.JSONDecodeError as exc:
+                raise ArchiveFormatError("Metadata is not valid JSON") from exc
+            summary = metadata.get("summary")
+            if not isinstance(summary, dict):
+                summary = _summarize_layers(
+                    metadata,
+                    {info.filename: info.file_size for info in archive.infolist()},
+                )
+            try:
+                thumbnail_bytes = archive.read(cls.THUMBNAIL_FILE)
+            except KeyError:
+                thumbnail_bytes = None
+
+        thumbnail = None
+        if thumbnail_bytes:
+            thumbnail = QImage.fromData(thumbnail_bytes, "PNG")
+            if thumbnail.isNull():
+                thumbnail = None
+
+        layers = metadata.get("layers") or []
+        return ArchiveSummary(
+            filename=filename,
+            version=int(metadata.get("version", cls.VERSION)),
+            width=int(metadata.get("width", 0)),
+            height=int(metadata.get("height", 0)),
+            layer_count=int(summary.get("layer_count", len(layers))),
+            key_count=int(summary.get("key_count", 0)),
+            frame_count=int(summary.get("frame_count", 1)),
+            image_count=int(summary.get("image_count", 0)),
+            image_bytes=int(summary.get("image_bytes", 0)),
+            pixel_bytes=int(summary.get("pixel_bytes", 0)),
+            file_size=os.path.getsize(filename),
+            playback_fps=float(metadata.get("playback_fps", 12.0)),
+            layer_names=[str(info.get("name", "")) for info in layers],
+            thumbnail=thumbnail,
+        )
+
+    @classmethod
+    def _resolve_max_workers(cls, max_workers: int | None) -> int | None:
+        if max_workers is None:
+            max_workers = cls.MAX_WORKERS
+        if max_workers is None:
+            return None
+        return max(1, int(max_workers))
+
+
+def _map_concurrently(
+    func: Callable[[object], object],
+    items: Iterable[object],
+    max_workers: int | None,
+) -> list[object]:
+    """Apply ``func`` to ``items`` on a thread pool, preserving order.
+
+    Qt's PNG codec and zlib release the GIL, so encoding and decoding key
+    images scales across threads.
+    """
+
+    items = list(items)
+    if len(items) <= 1 or max_workers == 1:
+        return [func(item) for item in items]
+    # Qt sets up its image format handlers on first use, which is not
+    # thread-safe; the first item runs here before the others fan out.
+    first = func(items[0])
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return [first, *executor.map(func, items[1:])]
+
+
+_CONTENT_HASH_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+def image_content_hash(image: QImage) -> str:
+    """Digest of ``image``'s raw pixels, used to address archive entries.
+
+    Large buffers are hashed without holding the GIL, so this is safe to run
+    on worker threads.
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(
+        f"{image.width()}x{image.height()}:{int(image.format().value)}:"
+        f"{image.bytesPerLine()}".encode("ascii")
+    )
+    digest.update(image.constBits())
+    return digest.hexdigest()
+
+
+def _content_hash_from_path(image_path: str) -> str | None:
+    stem = PurePosixPath(image_path).stem
+    if _CONTENT_HASH_PATTERN.fullmatch(stem):
+        return stem
+    return None
+
+
+def _summarize_layers(
+    metadata: dict[str, object], entry_sizes: dict[str, int]
+) -> dict[str, int]:
+    """Summary stats derived from layer metadata and stored entry sizes."""
+
+    layers = metadata.get("layers") or []
+    key_count = 0
+    last_frame = 0
+    images: set[str] = set()
+    for info in layers:
+        keys = info.get("keys") or []
+        key_count += len(keys) or 1
+        for entry in keys:
+            last_frame = max(last_frame, int(entry.get("frame", 0)))
+            images.add(entry.get("image"))
+        if not keys:
+            images.add(info.get("image"))
+    images.discard(None)
+    width = int(metadata.get("width", 0))
+    height = int(metadata.get("height", 0))
+    return {
+        "layer_count": len(layers),
+        "key_count": key_count,
+        "frame_count": last_frame + 1,
+        "image_count": len(images),
+        "image_bytes": sum(entry_sizes.get(path, 0) for path in images),
+        "pixel_bytes": len(images) * width * height * 4,
+    }
+
 
 class _ArchiveWriter:
     def __init__(
@@ -78,12 +366,25 @@ class _ArchiveWriter:
         image_root: PurePosixPath,
         metadata_file: str,
         version: int,
+        *,
+        max_workers: int | None = None,
+        cache: ArchiveCache | None = None,
+        raw_keys: bool = False,
+        compression_level: int = 1,
+        thumbnail_file: str | None = None,
+        thumbnail_size: int = 128,
     ) -> None:
         self._document = document
         self._image_root = image_root
         self._metadata_file = metadata_file
         self._version = version
-        self._binary_entries: dict[str, bytes] = {}
+        self._max_workers = max_workers
+        self._cache = cache
+        self._raw_keys = raw_keys
+        self._compression_level = compression_level
+        self._thumbnail_file = thumbnail_file
+        self._thumbnail_size = thumbnail_size
+        self._pending: list[_PendingImage] = []
 
     def write(self, filename: str) -> None:
         metadata = self._build_metadata()
@@ -91,15 +392,123 @@ class _ArchiveWriter:
         target_dir = os.path.dirname(filename) or "."
         os.makedirs(target_dir, exist_ok=True)
 
-        with zipfile.ZipFile(filename, "w", compression=zipfile.ZIP_DEFLATED) as archive:
-            for path, payload in sorted(self._binary_entries.items()):
-                archive.writestr(path, payload)
-            archive.writestr(
-                self._metadata_file,
-                json.dumps(metadata, indent=2).encode("utf-8"),
+        entries = self._resolve_entries()
+        thumbnail = self._render_thumbnail()
+
+        # Write next to the target and swap it in so an interrupted save never
+        # leaves a truncated document behind.
+        with atomic_write(filename) as temp_path:
+            with zipfile.ZipFile(
+                temp_path, "w", compression=zipfile.ZIP_DEFLATED
+            ) as archive:
+                # Key payloads are already compressed; deflating them again
+                # costs time and saves next to nothing.
+                for path in sorted(entries):
+                    archive.writestr(
+                        path, entries[path], compress_type=zipfile.ZIP_STORED
+                    )
+                if thumbnail is not None:
+                    archive.writestr(
+                        self._thumbnail_file, thumbnail, compress_type=zipfile.ZIP_STORED
+                    )
+                archive.writestr(
+                    self._metadata_file,
+                    json.dumps(metadata(entries), indent=2).encode("utf-8"),
+                )
+
+        if self._cache is not None:
+            self._cache.replace(
+                {
+                    pending.revision: (pending.digest, entries[pending.path])
+                    for pending in self._pending
+                    if pending.revision is not None
+                }
+            )
+
+    def _resolve_entries(self) -> dict[str, bytes]:
+        """Hash, deduplicate and encode pending images into archive entries."""
+
+        for pending in self._pending:
+            if pending.image is None or self._cache is None:
+                continue
+            pending.revision = int(pending.image.cacheKey())
+            cached = self._cache.lookup(pending.revision)
+            if cached is not None:
+                pending.digest = cached[0]
+                if self._accepts_payload(cached[1]):
+                    pending.payload = cached[1]
+
+        unhashed = [pending for pending in self._pending if pending.digest is None]
+        digests = _map_concurrently(self._hash_pending, unhashed, self._max_workers)
+        for pending, digest in zip(unhashed, digests):
+            pending.digest = digest
+
+        unique: dict[str, _PendingImage] = {}
+        for pending in self._pending:
+            representative = unique.setdefault(pending.digest, pending)
+            if representative.payload is None and pending.payload is not None:
+                unique[pending.digest] = pending
+
+        unencoded = [pending for pending in unique.values() if pending.payload is None]
+        encoded = _map_concurrently(
+            lambda pending: self._encode_image(pending.image),
+            unencoded,
+            self._max_workers,
+        )
+        for pending, payload in zip(unencoded, encoded):
+            pending.payload = payload
+
+        for pending in self._pending:
+            representative = unique[pending.digest]
+            pending.payload = representative.payload
+            pending.path = str(
+                self._image_root
+                / f"{pending.digest}{payload_suffix(representative.payload)}"
             )
 
-    def _build_metadata(self) -> dict[str, object]:
+        return {pending.path: pending.payload for pending in unique.values()}
+
+    def _render_thumbnail(self) -> bytes | None:
+        """PNG of the current frame scaled down to the thumbnail size."""
+
+        if not self._thumbnail_file:
+            return None
+        image = self._document.render()
+        limit = self._thumbnail_size
+        if image.width() > limit or image.height() > limit:
+            # Pixel art stays crisp with nearest-neighbour sampling.
+            image = image.scaled(limit, limit, Qt.KeepAspectRatio, Qt.FastTransformation)
+        buffer = QBuffer()
+        buffer.open(QBuffer.WriteOnly)
+        image.save(buffer, "PNG")
+        return bytes(buffer.data())
+
+    def _accepts_payload(self, payload: bytes) -> bool:
+        # Fast saves take whatever encoding is already at hand; regular saves
+        # re-encode raw payloads into PNG.
+        return self._raw_keys or not is_raw_payload(payload)
+
+    def _encode_image(self, image: QImage) -> bytes:
+        if self._raw_keys:
+            return encode_raw(image, self._compression_level)
+        return encode_png(image)
+
+    @staticmethod
+    def _hash_pending(pending: _PendingImage) -> str:
+        image = pending.image
+        if image is None:
+            # Lazily loaded keys from archives that predate content hashing
+            # have to be decoded once to learn their pixel digest.
+            image = decode_payload(pending.payload)
+        return image_content_hash(image)
+
+    def _build_metadata(self) -> Callable[[dict[str, bytes]], dict[str, object]]:
+        """Collect key images and return a callable rendering the metadata.
+
+        Entry paths depend on content hashes, so the JSON is rendered only
+        after :meth:`_resolve_entries` has run.
+        """
+
         document = self._document
         layer_manager = document.layer_manager
 
@@ -117,17 +526,32 @@ class _ArchiveWriter:
             "playback_loop_end": loop_end,
         }
 
-        for index, layer in enumerate(layer_manager.layers):
-            record = self._serialize_layer(layer, index)
-            metadata["layers"].append(record.to_dict())
+        records = [
+            self._serialize_layer(layer)
+            for layer in layer_manager.layers
+        ]
+
+        def render(entries: dict[str, bytes]) -> dict[str, object]:
+            metadata["layers"] = [record.to_dict() for record in records]
+            metadata["summary"] = _summarize_layers(
+                metadata, {path: len(payload) for path, payload in entries.items()}
+            )
+            return metadata
 
-        return metadata
+        return render
 
-    def _serialize_layer(self, layer: Layer, index: int) -> _LayerRecord:
-        legacy_filename = f"{index}_{layer.uid}.png"
-        legacy_path = self._image_root / legacy_filename
-        legacy_path_str = str(legacy_path)
+    def _pending_for_key(self, key: Key) -> _PendingImage:
+        encoded_image = key.encoded_image
+        if encoded_image is not None and self._accepts_payload(encoded_image):
+            pending = _PendingImage(payload=encoded_image, digest=key.content_hash)
+        else:
+            # Shallow copies keep the pixels alive for the worker threads
+            # while leaving the live key free to detach on its next edit.
+            pending = _PendingImage(image=QImage(key.image))
+        self._pending.append(pending)
+        return pending
 
+    def _serialize_layer(self, layer: Layer) -> _LayerRecord:
         active_key = layer.active_key
 
         sorted_keys = sorted(
@@ -136,21 +560,19 @@ class _ArchiveWriter:
         )
 
         key_records: list[_KeyRecord] = []
+        layer_image: _PendingImage | None = None
+
+        for position, key in enumerate(sorted_keys):
+            pending = self._pending_for_key(key)
+            if key is active_key or (layer_image is None and position == 0):
+                layer_image = pending
+            key_records.append(
+                _KeyRecord(frame=getattr(key, "frame_number", 0), image=pending)
+            )
 
-        if sorted_keys:
-            for position, key in enumerate(sorted_keys):
-                frame_number = getattr(key, "frame_number", 0)
-
-                if key is active_key or (active_key is None and position == 0):
-                    key_path_str = legacy_path_str
-                else:
-                    key_path = self._image_root / f"{index}_{layer.uid}_key{position}.png"
-                    key_path_str = str(key_path)
-
-                self._binary_entries[key_path_str] = self._encode_key_image(key)
-                key_records.append(_KeyRecord(frame=frame_number, image_path=key_path_str))
-        else:
-            self._binary_entries[legacy_path_str] = self._encode_layer_image(layer)
+        if layer_image is None:
+            layer_image = _PendingImage(image=QImage(layer.image))
+            self._pending.append(layer_image)
 
         return _LayerRecord(
             uid=layer.uid,
@@ -158,29 +580,28 @@ class _ArchiveWriter:
             visible=layer.visible,
             opacity=layer.opacity,
             onion_skin_enabled=getattr(layer, "onion_skin_enabled", False),
-            image_path=legacy_path_str,
+            image=layer_image,
             keys=key_records,
         )
 
-    @staticmethod
-    def _encode_layer_image(layer: Layer) -> bytes:
-        buffer = QBuffer()
-        buffer.open(QBuffer.ReadWrite)
-        layer.image.save(buffer, "PNG")
-        return bytes(buffer.data())
-
-    @staticmethod
-    def _encode_key_image(key: Key) -> bytes:
-        buffer = QBuffer()
-        buffer.open(QBuffer.ReadWrite)
-        key.image.save(buffer, "PNG")
-        return bytes(buffer.data())
-
 
 class _ArchiveReader:
-    def __init__(self, document_cls: type["Document"], metadata_file: str) -> None:
+    def __init__(
+        self,
+        document_cls: type["Document"],
+        metadata_file: str,
+        version: int,
+        *,
+        max_workers: int | None = None,
+        cache: ArchiveCache | None = None,
+        lazy: bool = False,
+    ) -> None:
         self._document_cls = document_cls
         self._metadata_file = metadata_file
+        self._version = version
+        self._max_workers = max_workers
+        self._cache = cache
+        self._lazy = lazy
 
     def read(self, filename: str) -> "Document":
         with zipfile.ZipFile(filename, "r") as archive:
@@ -194,68 +615,167 @@ class _ArchiveReader:
             except json.JSONDecodeError as exc:  # pragma: no cover - corrupted archive
                 raise ArchiveFormatError("Metadata is not valid JSON") from exc
 
+            version = metadata.get("version", self._version)
+            if isinstance(version, int) and version > self._version:
+                raise ArchiveFormatError(
+                    f"Archive version {version} is newer than supported {self._version}"
+                )
+
             width = int(metadata.get("width", 0))
             height = int(metadata.get("height", 0))
             if width <= 0 or height <= 0:
                 raise ArchiveFormatError("Document dimensions are invalid")
 
-            document = self._document_cls(width, height)
-            document.layer_manager.layers = []
-
-            for layer_info in metadata.get("layers", []):
-                layer = self._restore_layer(layer_info, archive, document.layer_manager)
-                document.layer_manager.layers.append(layer)
-
-            active_index = int(metadata.get("active_layer_index", -1))
-            if document.layer_manager.layers:
-                active_index = max(0, min(active_index, len(document.layer_manager.layers) - 1))
-            document.layer_manager.active_layer_index = active_index
-            document.layer_manager.layer_structure_changed.emit()
-            document.layer_manager.set_document(document)
-
-            document.set_playback_total_frames(metadata.get("playback_total_frames"))
-            document.set_playback_fps(metadata.get("playback_fps"))
-            document.set_playback_loop_range(
-                metadata.get("playback_loop_start"),
-                metadata.get("playback_loop_end"),
+            layers_metadata = metadata.get("layers", [])
+            payloads = self._read_payloads(archive, self._image_paths(layers_metadata))
+
+        if self._lazy:
+            # Keys decode on first access; only layers without key records
+            # need their image up front.
+            images = self._decode_payloads(
+                {
+                    info["image"]: payloads[info["image"]]
+                    for info in layers_metadata
+                    if not info.get("keys")
+                }
+            )
+        else:
+            images = self._decode_payloads(payloads)
+
+        document = self._document_cls(width, height)
+        document.layer_manager.layers = []
+
+        for layer_info in layers_metadata:
+            layer = self._restore_layer(
+                layer_info, payloads, images, document.layer_manager
             )
+            document.layer_manager.layers.append(layer)
+
+        active_index = int(metadata.get("active_layer_index", -1))
+        if document.layer_manager.layers:
+            active_index = max(0, min(active_index, len(document.layer_manager.layers) - 1))
+        document.layer_manager.active_layer_index = active_index
+        if self._lazy:
+            self._decode_active_keys(document.layer_manager)
+        document.layer_manager.layer_structure_changed.emit()
+        document.layer_manager.set_document(document)
+
+        document.set_playback_total_frames(metadata.get("playback_total_frames"))
+        document.set_playback_fps(metadata.get("playback_fps"))
+        document.set_playback_loop_range(
+            metadata.get("playback_loop_start"),
+            metadata.get("playback_loop_end"),
+        )
 
         return document
 
+    @staticmethod
+    def _image_paths(layers_metadata: list[dict[str, object]]) -> list[str]:
+        paths: list[str] = []
+        for info in layers_metadata:
+            image_path = info.get("image")
+            if not isinstance(image_path, str):
+                raise ArchiveFormatError("Layer image path missing")
+            paths.append(image_path)
+            for entry in info.get("keys") or []:
+                key_image_path = entry.get("image")
+                if isinstance(key_image_path, str):
+                    paths.append(key_image_path)
+        return list(dict.fromkeys(paths))
+
+    @staticmethod
+    def _read_payloads(
+        archive: zipfile.ZipFile, image_paths: list[str]
+    ) -> dict[str, bytes]:
+        # Reading from the zip is sequential; only PNG decoding is parallel.
+        payloads: dict[str, bytes] = {}
+        for image_path in image_paths:
+            try:
+                payloads[image_path] = archive.read(image_path)
+            except KeyError as exc:  # pragma: no cover - corrupted archive
+                raise ArchiveFormatError(f"Missing layer image: {image_path}") from exc
+        return payloads
+
+    def _decode_payloads(self, payloads: dict[str, bytes]) -> dict[str, QImage]:
+        items = list(payloads.items())
+        decoded = _map_concurrently(
+            lambda item: self._decode_image(*item), items, self._max_workers
+        )
+        if self._cache is not None:
+            # Prime the cache so the first save after opening only encodes
+            # keys that were edited in between.
+            primed: dict[int, tuple[str, bytes]] = {}
+            for image, (path, image_bytes) in zip(decoded, items):
+                digest = _content_hash_from_path(path)
+                if digest is not None:
+                    primed[int(image.cacheKey())] = (digest, image_bytes)
+            self._cache.replace(primed)
+        return {path: image for (path, _), image in zip(items, decoded)}
+
+    def _decode_active_keys(self, layer_manager: "LayerManager") -> None:
+        """Decode just the keys visible at the current frame."""
+
+        pending = [
+            layer.keys[layer._index_for_frame(layer_manager.current_frame)]
+            for layer in layer_manager.layers
+        ]
+        pending = [key for key in pending if not key.is_loaded]
+        # Keys restored from the same entry share one payload object; decode
+        # it once and give each key its own shallow copy, which shares the
+        # pixels until one of the keys is painted on.
+        payloads = list({id(key.encoded_image): key.encoded_image for key in pending}.values())
+        decoded = _map_concurrently(Key.decode_encoded_image, payloads, self._max_workers)
+        images = {id(payload): image for payload, image in zip(payloads, decoded)}
+        for key in pending:
+            image = images[id(key.encoded_image)]
+            if image.isNull():
+                raise ArchiveFormatError("Layer image is invalid")
+            key.adopt_decoded_image(QImage(image))
+
     def _restore_layer(
         self,
         info: dict[str, object],
-        archive: zipfile.ZipFile,
+        payloads: dict[str, bytes],
+        images: dict[str, QImage],
         layer_manager: "LayerManager",
     ) -> Layer:
         image_path = info.get("image")
         if not isinstance(image_path, str):
             raise ArchiveFormatError("Layer image path missing")
 
-        image = self._load_image(archive, image_path)
-
         name = info.get("name") or "Layer"
         keys: list[Key] = []
-        keys_metadata = info.get("keys")
+        keys_metadata = info.get("keys") or []
 
         for entry in keys_metadata:
             key_image_path = entry.get("image")
-            key_image = self._load_image(archive, key_image_path)
             frame_number = entry.get("frame")
-            key = Key.from_qimage(key_image, frame_number=frame_number)
+            if key_image_path in images:
+                # A shallow copy per key: keys deduplicated to one entry must
+                # not alias one QImage, or painting one would change the others.
+                key = Key.from_qimage(QImage(images[key_image_path]), frame_number=frame_number)
+            elif key_image_path in payloads:
+                key = Key.from_encoded(
+                    payloads[key_image_path],
+                    frame_number=frame_number,
+                    content_hash=_content_hash_from_path(key_image_path),
+                )
+            else:
+                raise ArchiveFormatError(f"Missing layer image: {key_image_path}")
             keys.append(key)
 
         keys.sort(key=lambda key: key.frame_number)
 
         if keys:
             layer = Layer(
-                image.width(),
-                image.height(),
+                layer_manager.width,
+                layer_manager.height,
                 str(name),
                 layer_manager=layer_manager,
                 keys=keys,
             )
         else:
+            image = QImage(images[image_path])
             layer = Layer(
                 image.width(),
                 image.height(),
@@ -274,14 +794,9 @@ class _ArchiveReader:
 
         return layer
 
-    def _load_image(self, archive: zipfile.ZipFile, image_path: str) -> QImage:
-        try:
-            image_bytes = archive.read(image_path)
-        except KeyError as exc:  # pragma: no cover - corrupted archive
-            raise ArchiveFormatError(f"Missing layer image: {image_path}") from exc
-
-        image = QImage()
-        image.loadFromData(image_bytes, "PNG")
+    @staticmethod
+    def _decode_image(image_path: str, image_bytes: bytes) -> QImage:
+        image = decode_payload(image_bytes)
         if image.isNull():
             raise ArchiveFormatError(f"Layer image is invalid: {image_path}")
         return image
@@ -15,6 +15,7 @@ class App(QObject):
 
     undo_stack_changed = Signal()
     document_changed = Signal()
+    frame_content_changed = Signal(list)
     select_all_triggered = Signal()
     select_none_triggered = Signal()
     invert_selection_triggered = Signal()
@@ -22,6 +23,8 @@ class App(QObject):
     clear_layer_triggered = Signal()
     exit_triggered = Signal()
     ai_output_rect_changed = Signal(QRect)
+    background_removal_progress = Signal(int, int)
+    background_removal_finished = Signal(bool)
 
     def __init__(self, document_service=None, clipboard_service=None):
         super().__init__()
@@ -33,9 +36,18 @@ class App(QObject):
         )
         self.document_controller.undo_stack_changed.connect(self.undo_stack_changed.emit)
         self.document_controller.document_changed.connect(self.document_changed.emit)
+        self.document_controller.frame_content_changed.connect(
+            self.frame_content_changed.emit
+        )
         self.document_controller.ai_output_rect_changed.connect(
             self.ai_output_rect_changed.emit
         )
+        self.document_controller.background_removal_progress.connect(
+            self.background_removal_progress.emit
+        )
+        self.document_controller.background_removal_finished.connect(
+            self.background_removal_finished.emit
+        )
 
         self.scripting_api = ScriptingAPI(self)
 
@@ -120,7 +132,7 @@ class App(QObject):
     @Slot()
     def save_settings(self):
         ai_settings = None
-        if self.main_window:
+        if self.main_window and self.main_window.ai_panel is not None:
             ai_settings = self.main_window.ai_panel.get_settings()
         self.settings_controller.save_settings(ai_settings)
 
@@ -284,6 +296,9 @@ class App(QObject):
     def add_new_layer_with_image(self, image):
         self.document_controller.add_new_layer_with_image(image)
 
+    def add_new_layers_with_images(self, images):
+        self.document_controller.add_new_layers_with_images(images)
+
     @Slot()
     def create_brush(self):
         self.document_controller.create_brush()
@@ -302,9 +317,11 @@ class App(QObject):
         self, scope: BackgroundRemovalScope | None = None
     ):
         if scope is None:
-            self.document_controller.remove_background_from_layer()
-        else:
-            self.document_controller.remove_background_from_layer(scope)
+            return self.document_controller.remove_background_from_layer()
+        return self.document_controller.remove_background_from_layer(scope)
+
+    def cancel_background_removal(self):
+        self.document_controller.cancel_background_removal()
 
     def run_script(self, script_path):
         """Runs a script with optional parameters and undo support."""
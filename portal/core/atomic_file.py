@@ -0,0 +1,53 @@
+"""Replace files atomically so an interrupted write never truncates them."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+import os
+import tempfile
+
+
+def _read_umask() -> int:
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# The umask can only be read by replacing it, which is process-wide, so it
+# is read once at import instead of from the threads that write files.
+_UMASK = _read_umask()
+
+
+def copy_target_permissions(target: str, temp_path: str) -> None:
+    """Give ``temp_path`` the mode ``target`` has, or would get if created."""
+
+    try:
+        mode = os.stat(target).st_mode & 0o777
+    except OSError:
+        mode = 0o666 & ~_UMASK
+    os.chmod(temp_path, mode)
+
+
+@contextmanager
+def atomic_write(filename: str, *, prefix: str = ".") -> Iterator[str]:
+    """Yield a temporary path next to ``filename`` to write to.
+
+    When the block succeeds the file takes the target's permissions and is
+    swapped in with ``os.replace``; when it raises, the file is removed and
+    ``filename`` is left untouched.
+    """
+
+    directory = os.path.dirname(os.path.abspath(filename))
+    handle, temp_path = tempfile.mkstemp(prefix=prefix, suffix=".tmp", dir=directory)
+    os.close(handle)
+    try:
+        yield temp_path
+        copy_target_permissions(filename, temp_path)
+        os.replace(temp_path, filename)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -819,19 +819,31 @@ class CropCommand(Command):
 
 
 class AddLayerCommand(Command):
-    def __init__(self, document: 'Document', image: QImage = None, name: str = None):
+    def __init__(
+        self,
+        document: 'Document',
+        image: QImage = None,
+        name: str = None,
+        layer: Layer | None = None,
+    ):
         from portal.core.document import Document
         self.document = document
         self.image = image
         self.name = name
+        self.layer = layer
         self.added_layer = None
         self.insertion_index = None
         self.old_active_layer = document.layer_manager.active_layer
 
     def execute(self):
         if self.added_layer is None:
-            # First execution: create the layer
-            if self.image:
+            # First execution: create the layer, or add the prepared one
+            if self.layer is not None:
+                manager = self.document.layer_manager
+                manager.layers.append(self.layer)
+                manager.select_layer(len(manager.layers) - 1)
+                manager.layer_structure_changed.emit()
+            elif self.image:
                 self.document.layer_manager.add_layer_with_image(self.image, self.name)
             else:
                 self.document.layer_manager.add_layer(self.name)
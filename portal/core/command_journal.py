@@ -0,0 +1,646 @@
+"""Append-only journal of executed commands for crash recovery.
+
+The journal sits next to the document as a hidden ``.<name>.journal`` file.
+Its first line describes the *base* the records apply to, either the saved
+``.aole`` file or a checkpoint archive written by the journal itself. Every
+later line is one JSON record:
+
+* ``draw``, ``fill`` and ``shape`` store the stroke points and tool
+  parameters, which replay deterministically and are only a few hundred
+  bytes. No pixels are captured for them; only the revisions of their
+  layer's keys are compared to find the key they painted.
+* ``pixels`` stores the dirty rectangle of every key an opaque command (or
+  an undo/redo) changed, plus any changed layer properties.
+
+Commands that change the document structure (layers, keys, size) are not
+journaled. Instead the journal writes a new checkpoint and starts over.
+Recovery loads the base and replays the records in order. A truncated last
+line, left by a crash in the middle of a write, is ignored.
+"""
+
+from __future__ import annotations
+
+import base64
+from collections.abc import Callable
+from dataclasses import dataclass
+import json
+import os
+
+import numpy as np
+from PySide6.QtCore import QByteArray, QDataStream, QIODevice, QPoint, QPointF, QRect
+from PySide6.QtGui import QColor, QImage, QPainter, QPainterPath
+
+from portal.core.aole_archive import AOLEArchive, ArchiveCache
+from portal.core.command import DrawCommand, FillCommand, ShapeCommand
+from portal.core.document import Document
+from portal.core.key_codec import decode_payload, encode_raw
+
+JOURNAL_FORMAT = "pixel-portal-journal"
+JOURNAL_VERSION = 1
+UNTITLED_JOURNAL_NAME = "untitled.journal"
+
+_STROKE_COMMANDS = (DrawCommand, FillCommand, ShapeCommand)
+
+
+class JournalError(ValueError):
+    """Raised when a journal cannot be replayed onto its base document."""
+
+
+@dataclass(eq=False)
+class _KeyState:
+    key: object
+    revision: int
+    image: QImage | None
+    payload: bytes | None
+    loader: Callable[[], QImage] | None = None
+
+    def before_image(self) -> QImage:
+        if self.image is not None:
+            return self.image
+        if self.loader is not None:
+            return self.loader()
+        return decode_payload(self.payload or b"")
+
+
+@dataclass(eq=False)
+class PendingEntry:
+    """State captured by :meth:`CommandJournal.begin` before a command runs."""
+
+    structure: tuple
+    properties: dict[int, tuple]
+    keys: dict[int, _KeyState]
+    # Stroke commands only: revisions of the target layer's keys by ``id``.
+    stroke_revisions: dict[int, int] | None = None
+
+
+def journal_path_for(document_path: str | None, fallback_dir: str) -> str:
+    if not document_path:
+        return os.path.join(fallback_dir, UNTITLED_JOURNAL_NAME)
+    directory, name = os.path.split(os.path.abspath(document_path))
+    return os.path.join(directory, f".{name}.journal")
+
+
+class CommandJournal:
+    """Appends a compact record for each executed command."""
+
+    def __init__(self, fallback_dir: str, *, fsync: bool = True) -> None:
+        self.fallback_dir = fallback_dir
+        self.fsync = fsync
+        self._cache = ArchiveCache()
+        self._document: Document | None = None
+        self._path: str | None = None
+        self._handle = None
+        self._base_ready = False
+
+    @property
+    def path(self) -> str | None:
+        return self._path
+
+    @property
+    def checkpoint_path(self) -> str | None:
+        if self._path is None:
+            return None
+        return self.checkpoint_path_for(self._path)
+
+    @staticmethod
+    def checkpoint_path_for(journal_path: str) -> str:
+        return os.path.splitext(journal_path)[0] + ".checkpoint.aole"
+
+    # ------------------------------------------------------------------
+    # Base management
+    # ------------------------------------------------------------------
+    def reset(self, document: Document | None, *, saved: bool = False) -> None:
+        """Start a new journal for ``document``.
+
+        When ``saved`` is true and the document was just written to (or read
+        from) an ``.aole`` file, that file becomes the base. Otherwise a
+        checkpoint is written lazily before the next journaled command.
+        """
+
+        self.discard()
+        self._document = document
+        if document is None:
+            return
+        self._path = journal_path_for(document.file_path, self.fallback_dir)
+        file_path = document.file_path
+        if saved and file_path and file_path.lower().endswith(".aole") and os.path.isfile(file_path):
+            self._start(file_path, document.file_path)
+        else:
+            self._cache.clear()
+
+    def discard(self) -> None:
+        """Close and delete the current journal and its checkpoint."""
+
+        self.close()
+        if self._path is not None:
+            for path in (self._path, self.checkpoint_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        self._path = None
+        self._base_ready = False
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def checkpoint(self) -> None:
+        """Write the current document as the new base and empty the journal."""
+
+        document = self._document
+        if document is None or self._path is None:
+            return
+        self.close()
+        checkpoint_path = self.checkpoint_path
+        os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+        AOLEArchive.save(
+            document,
+            checkpoint_path,
+            cache=self._cache,
+            key_format=AOLEArchive.KEY_FORMAT_RAW,
+        )
+        self._start(checkpoint_path, document.file_path)
+
+    def _start(self, base_path: str, document_path: str | None) -> None:
+        stat = os.stat(base_path)
+        header = {
+            "format": JOURNAL_FORMAT,
+            "version": JOURNAL_VERSION,
+            "base": os.path.abspath(base_path),
+            "base_size": stat.st_size,
+            "base_mtime_ns": stat.st_mtime_ns,
+            "document_path": document_path,
+        }
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        temp_path = f"{self._path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            handle.write(json.dumps(header) + "\n")
+            handle.flush()
+            if self.fsync:
+                os.fsync(handle.fileno())
+        os.replace(temp_path, self._path)
+        self._handle = open(self._path, "a", encoding="utf-8")
+        self._base_ready = True
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+    def begin(self, document: Document, command=None) -> PendingEntry:
+        """Capture what is needed to describe ``command`` (or an undo/redo).
+
+        Stroke commands are journaled by their parameters, so only their
+        layer's key revisions are recorded; every other command captures
+        the keys of the whole document to diff afterwards.
+        """
+
+        if document is not self._document:
+            self.reset(document)
+        if not self._base_ready:
+            self.checkpoint()
+        if isinstance(command, _STROKE_COMMANDS):
+            return PendingEntry(
+                structure=_structure_signature(document),
+                properties=_layer_properties(document),
+                keys={},
+                stroke_revisions={id(key): key.revision for key in command.layer.keys},
+            )
+        return PendingEntry(
+            structure=_structure_signature(document),
+            properties=_layer_properties(document),
+            keys=_capture_keys(document),
+        )
+
+    def commit(self, pending: PendingEntry, command=None) -> None:
+        """Append the record for ``command``, or for an undo/redo when ``None``."""
+
+        document = self._document
+        if document is None or self._handle is None:
+            return
+        if _structure_signature(document) != pending.structure:
+            self.checkpoint()
+            return
+        if pending.stroke_revisions is not None:
+            self._commit_stroke(document, pending, command)
+            return
+
+        changed = _changed_keys(document, pending)
+        properties = _layer_properties(document)
+        changed_properties = {
+            uid: values
+            for uid, values in properties.items()
+            if pending.properties.get(uid) != values
+        }
+        if not changed and not changed_properties:
+            return
+
+        record = None
+        if not changed_properties:
+            record = _describe_command(document, command, changed)
+        if record is None:
+            record = _describe_pixels(changed, changed_properties)
+        self._append(record)
+
+    def _commit_stroke(self, document: Document, pending: PendingEntry, command) -> None:
+        layer = command.layer
+        changed = [
+            (layer.uid, index, key, None)
+            for index, key in enumerate(layer.keys)
+            if pending.stroke_revisions.get(id(key)) != key.revision
+        ]
+        unchanged_properties = _layer_properties(document) == pending.properties
+        if not changed and unchanged_properties:
+            return
+        record = None
+        if unchanged_properties and document.layer_manager.find_layer_by_uid(layer.uid) is layer:
+            record = _describe_command(document, command, changed)
+        if record is None:
+            # No pixels were captured to describe the change; start over from
+            # a checkpoint instead.
+            self.checkpoint()
+            return
+        self._append(record)
+
+    def _append(self, record: dict) -> None:
+        self._handle.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._handle.flush()
+        if self.fsync:
+            os.fsync(self._handle.fileno())
+
+    # ------------------------------------------------------------------
+    # Recovery
+    # ------------------------------------------------------------------
+    @staticmethod
+    def has_recovery(journal_path: str) -> bool:
+        """Whether ``journal_path`` holds records that still match their base."""
+
+        try:
+            header, records = _read_journal(journal_path)
+        except (OSError, JournalError):
+            return False
+        return bool(records) and _base_matches(header)
+
+    @staticmethod
+    def recover(journal_path: str) -> Document:
+        """Load the journal's base document and replay every record onto it."""
+
+        header, records = _read_journal(journal_path)
+        if not _base_matches(header):
+            raise JournalError("The journal base changed after the journal was written.")
+        document = Document.load_aole(header["base"])
+        document_path = header.get("document_path")
+        document.file_path = document_path if isinstance(document_path, str) else None
+
+        layer_manager = document.layer_manager
+        current_frame = layer_manager.current_frame
+        try:
+            for record in records:
+                _replay(document, record)
+        finally:
+            layer_manager.set_current_frame(current_frame)
+        return document
+
+
+# ----------------------------------------------------------------------
+# State capture
+# ----------------------------------------------------------------------
+def _structure_signature(document: Document) -> tuple:
+    return (
+        document.width,
+        document.height,
+        id(document.layer_manager),
+        tuple(
+            (layer.uid, tuple(id(key) for key in layer.keys), tuple(key.frame_number for key in layer.keys))
+            for layer in document.layer_manager.layers
+        ),
+    )
+
+
+def _layer_properties(document: Document) -> dict[int, tuple]:
+    return {
+        layer.uid: (layer.name, layer.visible, layer.opacity, layer.onion_skin_enabled)
+        for layer in document.layer_manager.layers
+    }
+
+
+def _capture_keys(document: Document) -> dict[int, _KeyState]:
+    states = {}
+    for layer in document.layer_manager.layers:
+        for key in layer.keys:
+            if key.is_loaded:
+                # A shallow copy: painting into the key detaches it, so this
+                # keeps the pre-command pixels without copying them up front.
+                state = _KeyState(key, key.revision, QImage(key.image), None)
+            else:
+                state = _KeyState(key, key.revision, None, key.encoded_image, key.image_loader)
+            states[id(key)] = state
+    return states
+
+
+def _changed_keys(document: Document, pending: PendingEntry) -> list[tuple[int, int, object, QRect]]:
+    changed = []
+    for layer in document.layer_manager.layers:
+        for index, key in enumerate(layer.keys):
+            state = pending.keys.get(id(key))
+            if state is None or state.revision == key.revision:
+                continue
+            rect = _dirty_rect(state.before_image(), key.image)
+            if rect.isValid():
+                changed.append((layer.uid, index, key, rect))
+    return changed
+
+
+def _dirty_rect(before: QImage, after: QImage) -> QRect:
+    if before.size() != after.size():
+        return after.rect()
+    before_pixels = _argb_array(before)
+    after_pixels = _argb_array(after)
+    difference = before_pixels != after_pixels
+    rows = np.flatnonzero(difference.any(axis=1))
+    if not rows.size:
+        return QRect()
+    columns = np.flatnonzero(difference.any(axis=0))
+    return QRect(
+        int(columns[0]),
+        int(rows[0]),
+        int(columns[-1] - columns[0]) + 1,
+        int(rows[-1] - rows[0]) + 1,
+    )
+
+
+def _argb_array(image: QImage) -> np.ndarray:
+    if image.format() != QImage.Format_ARGB32:
+        image = image.convertToFormat(QImage.Format_ARGB32)
+    width = image.width()
+    height = image.height()
+    stride = image.bytesPerLine() // 4
+    buffer = np.frombuffer(image.constBits(), dtype=np.uint32, count=stride * height)
+    return buffer.reshape(height, stride)[:, :width]
+
+
+# ----------------------------------------------------------------------
+# Record encoding
+# ----------------------------------------------------------------------
+def _describe_command(document: Document, command, changed) -> dict | None:
+    """Parametric record for the stroke tools, or ``None`` to store pixels."""
+
+    if not isinstance(command, _STROKE_COMMANDS):
+        return None
+    if len(changed) != 1:
+        return None
+    layer_uid, key_index, key, _ = changed[0]
+    if command.layer.uid != layer_uid:
+        return None
+    layer = command.layer
+    if layer.keys[layer._index_for_frame(key.frame_number)] is not key:
+        return None
+
+    record = {
+        "layer": layer_uid,
+        "key": key_index,
+        "frame": key.frame_number,
+        "selection": _encode_path(command.selection_shape),
+        "mirror_x": command.mirror_x,
+        "mirror_y": command.mirror_y,
+        "mirror_x_position": command.mirror_x_position,
+        "mirror_y_position": command.mirror_y_position,
+    }
+    if isinstance(command, FillCommand):
+        record.update(
+            op="fill",
+            point=_encode_point(command.fill_pos),
+            color=QColor(command.fill_color).rgba(),
+            contiguous=command.contiguous,
+        )
+        return record
+
+    record.update(
+        color=QColor(command.color).rgba(),
+        width=command.width,
+        brush_type=command.brush_type,
+        erase=command.erase,
+        wrap=command.wrap,
+        pattern=_encode_image(command.pattern_image),
+    )
+    if isinstance(command, DrawCommand):
+        record.update(op="draw", points=[_encode_point(point) for point in command.points])
+    else:
+        rect = command.rect
+        record.update(
+            op="shape",
+            shape=command.shape_type,
+            rect=[rect.x(), rect.y(), rect.width(), rect.height()],
+        )
+    return record
+
+
+def _describe_pixels(changed, properties: dict[int, tuple]) -> dict:
+    return {
+        "op": "pixels",
+        "layers": [
+            {
+                "uid": uid,
+                "name": name,
+                "visible": visible,
+                "opacity": opacity,
+                "onion_skin_enabled": onion,
+            }
+            for uid, (name, visible, opacity, onion) in properties.items()
+        ],
+        "keys": [
+            {
+                "layer": layer_uid,
+                "key": key_index,
+                "rect": [rect.x(), rect.y(), rect.width(), rect.height()],
+                "data": _encode_image(key.image.copy(rect)),
+            }
+            for layer_uid, key_index, key, rect in changed
+        ],
+    }
+
+
+def _encode_point(point) -> list:
+    return [point.x(), point.y()]
+
+
+def _decode_point(values) -> QPoint | QPointF:
+    x, y = values
+    if isinstance(x, int) and isinstance(y, int):
+        return QPoint(x, y)
+    return QPointF(x, y)
+
+
+def _encode_image(image: QImage | None) -> str | None:
+    if image is None or image.isNull():
+        return None
+    return base64.b64encode(encode_raw(image)).decode("ascii")
+
+
+def _decode_image(data: str | None) -> QImage | None:
+    if not data:
+        return None
+    image = decode_payload(base64.b64decode(data))
+    if image.isNull():
+        raise JournalError("Corrupt image payload in journal.")
+    return image
+
+
+def _encode_path(path: QPainterPath | None) -> str | None:
+    if path is None:
+        return None
+    data = QByteArray()
+    stream = QDataStream(data, QIODevice.WriteOnly)
+    stream << path
+    return base64.b64encode(bytes(data)).decode("ascii")
+
+
+def _decode_path(data: str | None) -> QPainterPath | None:
+    if not data:
+        return None
+    path = QPainterPath()
+    buffer = QByteArray(base64.b64decode(data))
+    stream = QDataStream(buffer, QIODevice.ReadOnly)
+    stream >> path
+    return path
+
+
+# ----------------------------------------------------------------------
+# Replay
+# ----------------------------------------------------------------------
+def _read_journal(journal_path: str) -> tuple[dict, list[dict]]:
+    with open(journal_path, encoding="utf-8") as handle:
+        lines = handle.read().split("\n")
+    try:
+        header = json.loads(lines[0])
+    except ValueError as exc:
+        raise JournalError("Missing journal header.") from exc
+    if not isinstance(header, dict) or header.get("format") != JOURNAL_FORMAT:
+        raise JournalError("Not a command journal.")
+    if header.get("version", 0) > JOURNAL_VERSION:
+        raise JournalError("Journal was written by a newer version.")
+
+    records = []
+    for line in lines[1:]:
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # Only the final record can be torn; nothing after it was written.
+            break
+        records.append(record)
+    return header, records
+
+
+def _base_matches(header: dict) -> bool:
+    base = header.get("base")
+    if not isinstance(base, str):
+        return False
+    try:
+        stat = os.stat(base)
+    except OSError:
+        return False
+    return stat.st_size == header.get("base_size") and stat.st_mtime_ns == header.get(
+        "base_mtime_ns"
+    )
+
+
+def _find_layer(document: Document, uid):
+    for layer in document.layer_manager.layers:
+        if layer.uid == uid:
+            return layer
+    raise JournalError(f"Journal references unknown layer {uid!r}.")
+
+
+def _find_key(layer, index: int):
+    try:
+        return layer.keys[index]
+    except (IndexError, TypeError) as exc:
+        raise JournalError(f"Journal references unknown key {index!r}.") from exc
+
+
+def _replay(document: Document, record: dict) -> None:
+    op = record.get("op")
+    if op == "pixels":
+        _replay_pixels(document, record)
+        return
+    if op not in ("draw", "fill", "shape"):
+        raise JournalError(f"Unknown journal record {op!r}.")
+
+    layer = _find_layer(document, record["layer"])
+    key = _find_key(layer, record["key"])
+    document.layer_manager.set_current_frame(record["frame"])
+    if layer.active_key is not key:
+        raise JournalError("Journal key no longer matches its frame.")
+
+    selection = _decode_path(record.get("selection"))
+    mirror = {
+        "mirror_x": record["mirror_x"],
+        "mirror_y": record["mirror_y"],
+        "mirror_x_position": record["mirror_x_position"],
+        "mirror_y_position": record["mirror_y_position"],
+    }
+    if op == "fill":
+        command = FillCommand(
+            document,
+            layer,
+            _decode_point(record["point"]),
+            QColor.fromRgba(record["color"]),
+            selection,
+            contiguous=record["contiguous"],
+            **mirror,
+        )
+    elif op == "draw":
+        command = DrawCommand(
+            layer,
+            [_decode_point(point) for point in record["points"]],
+            QColor.fromRgba(record["color"]),
+            record["width"],
+            record["brush_type"],
+            document,
+            selection,
+            erase=record["erase"],
+            wrap=record["wrap"],
+            pattern_image=_decode_image(record.get("pattern")),
+            **mirror,
+        )
+    else:
+        x, y, width, height = record["rect"]
+        command = ShapeCommand(
+            layer,
+            QRect(x, y, width, height),
+            record["shape"],
+            QColor.fromRgba(record["color"]),
+            record["width"],
+            document,
+            selection,
+            erase=record["erase"],
+            wrap=record["wrap"],
+            brush_type=record["brush_type"],
+            pattern_image=_decode_image(record.get("pattern")),
+            **mirror,
+        )
+    command.execute()
+
+
+def _replay_pixels(document: Document, record: dict) -> None:
+    for info in record.get("layers", ()):
+        layer = _find_layer(document, info["uid"])
+        layer.name = info["name"]
+        layer.visible = info["visible"]
+        layer.opacity = info["opacity"]
+        layer.onion_skin_enabled = info["onion_skin_enabled"]
+
+    for info in record.get("keys", ()):
+        layer = _find_layer(document, info["layer"])
+        key = _find_key(layer, info["key"])
+        patch = _decode_image(info["data"])
+        x, y, _, _ = info["rect"]
+        painter = QPainter(key.image)
+        try:
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+            painter.drawImage(x, y, patch)
+        finally:
+            painter.end()
+        key.image_changed.emit()
@@ -1,14 +1,14 @@
 from __future__ import annotations
 
 from collections.abc import Callable
-import io
-import json
 
-from PySide6.QtCore import QBuffer, QRect, QSize, Qt
+from PySide6.QtCore import QRect, QSize, Qt
 from PySide6.QtGui import QImage, QPainter
-from PIL import Image, ImageSequence, ImageQt
+from PIL import Image
 
-from portal.core.aole_archive import AOLEArchive
+from portal.core.aole_archive import AOLEArchive, ArchiveCache
+from portal.core import tiff_io
+from portal.core.image_conversion import qimage_to_pil
 from portal.core.layer import Layer
 from portal.core.layer_manager import LayerManager
 
@@ -22,13 +22,22 @@ DEFAULT_PLAYBACK_LOOP_END = 12
 class Document:
     """Lightweight document model backed by a single layer stack."""
 
-    def __init__(self, width: int, height: int) -> None:
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        *,
+        layer_manager: LayerManager | None = None,
+    ) -> None:
         self.width = width
         self.height = height
-        self.layer_manager = LayerManager(width, height)
+        if layer_manager is None:
+            layer_manager = LayerManager(width, height)
+        self.layer_manager = layer_manager
         self.layer_manager.set_document(self)
         self._layer_manager_listeners: list[Callable[[LayerManager], None]] = []
         self.file_path: str | None = None
+        self._archive_cache = ArchiveCache()
         self.ai_output_rect = QRect(
             0,
             0,
@@ -98,6 +107,26 @@ class Document:
         duplicate._notify_layer_manager_changed()
         return duplicate
 
+    def snapshot(self) -> "Document":
+        """Return a cheap copy sharing pixel buffers with this document.
+
+        Keys are cloned without deep copies, so Qt's implicit sharing makes
+        this nearly free; later edits to either document detach their own
+        buffers. Intended for handing a frozen view to background writers.
+        """
+
+        duplicate = Document(
+            self.width,
+            self.height,
+            layer_manager=self.layer_manager.clone(deep_copy=False),
+        )
+        duplicate.file_path = self.file_path
+        duplicate.ai_output_rect = QRect(self.ai_output_rect)
+        duplicate.set_playback_total_frames(self.playback_total_frames)
+        duplicate.set_playback_fps(self.playback_fps)
+        duplicate.set_playback_loop_range(*self.get_playback_loop_range())
+        return duplicate
+
     # ------------------------------------------------------------------
     # Playback metadata stubs (retained for UI compatibility)
     # ------------------------------------------------------------------
@@ -276,77 +305,33 @@ class Document:
     # Document IO
     # ------------------------------------------------------------------
     def save_tiff(self, filename: str) -> None:
-        images = []
-        for layer in self.layer_manager.layers:
-            pil_image = ImageQt.fromqimage(layer.image)
-            pil_image.info["layer_name"] = layer.name
-            pil_image.info["layer_visible"] = str(layer.visible)
-            pil_image.info["layer_opacity"] = str(layer.opacity)
-            pil_image.info["layer_onion_skin"] = str(layer.onion_skin_enabled)
-            images.append(pil_image)
-
-        if images:
-            layer_properties = [
-                layer.get_properties() for layer in self.layer_manager.layers
-            ]
-            images[0].save(
-                filename,
-                save_all=True,
-                append_images=images[1:],
-                format="TIFF",
-                compression="tiff_lzw",
-                description=json.dumps(layer_properties),
-            )
+        """Save one TIFF page per layer, streaming the pages one at a time."""
 
+        tiff_io.save_tiff(self, filename)
         self.file_path = filename
 
-    @staticmethod
-    def load_tiff(filename: str) -> "Document":
-        with Image.open(filename) as img:
-            width, height = img.size
-            doc = Document(width, height)
-            doc.layer_manager.layers = []
+    @classmethod
+    def load_tiff(cls, filename: str) -> "Document":
+        """Load a layered TIFF; each page decodes when its layer is first used."""
 
-            try:
-                layer_properties = json.loads(img.tag_v2[270])
-            except (KeyError, json.JSONDecodeError):
-                layer_properties = None
-
-            for i, page in enumerate(ImageSequence.Iterator(img)):
-                qimage = ImageQt.toqimage(page.convert("RGBA"))
-
-                if layer_properties and i < len(layer_properties):
-                    props = layer_properties[i]
-                    layer = Layer.from_qimage(
-                        qimage, props.get("name", f"Layer {i + 1}")
-                    )
-                    layer.visible = props.get("visible", True)
-                    layer.opacity = props.get("opacity", 1.0)
-                    layer.onion_skin_enabled = props.get(
-                        "onion_skin_enabled", False
-                    )
-                else:
-                    layer = Layer.from_qimage(qimage, f"Layer {i + 1}")
-
-                doc.layer_manager.layers.append(layer)
-
-            if doc.layer_manager.layers:
-                doc.layer_manager.active_layer_index = len(
-                    doc.layer_manager.layers
-                ) - 1
-            doc.layer_manager.layer_structure_changed.emit()
-            doc.layer_manager.set_document(doc)
-
-        doc.file_path = filename
-        return doc
-
-    def save_aole(self, filename: str) -> None:
-        AOLEArchive.save(self, filename)
+        return tiff_io.load_tiff(cls, filename)
+
+    def save_aole(self, filename: str, *, fast: bool = False) -> None:
+        """Save as an AOLE archive; ``fast`` stores new keys as raw zlib data."""
+
+        AOLEArchive.save(
+            self,
+            filename,
+            cache=self._archive_cache,
+            key_format=AOLEArchive.KEY_FORMAT_RAW if fast else AOLEArchive.KEY_FORMAT_PNG,
+        )
         self.file_path = filename
 
     @classmethod
     def load_aole(cls, filename: str) -> "Document":
-        document = AOLEArchive.load(cls, filename)
+        cache = ArchiveCache()
+        document = AOLEArchive.load(cls, filename, cache=cache, lazy=True)
+        document._archive_cache = cache
         document.file_path = filename
         return document
 
@@ -396,17 +381,10 @@ class Document:
     # ------------------------------------------------------------------
     @staticmethod
     def qimage_to_pil(qimage: QImage) -> Image.Image:
-        return ImageQt.fromqimage(qimage)
+        return qimage_to_pil(qimage)
 
     def get_current_image_for_ai(self) -> Image.Image | None:
-        q_image = self.render()
-        buffer = QBuffer()
-        buffer.open(QBuffer.ReadWrite)
-        q_image.save(buffer, "PNG")
-        try:
-            return Image.open(io.BytesIO(buffer.data()))
-        except Exception:
-            return None
+        return qimage_to_pil(self.render())
 
     def add_new_layer_with_image(self, image) -> None:
         self.layer_manager.add_layer_with_image(image, name="AI Generated Layer")
@@ -420,10 +398,5 @@ class Document:
                 Qt.FastTransformation,
             )
 
-        buffer = QBuffer()
-        buffer.open(QBuffer.ReadWrite)
-        q_image.save(buffer, "PNG")
-        pil_image = Image.open(io.BytesIO(buffer.data()))
-
-        self.layer_manager.add_layer_with_image(pil_image, name="Pasted Layer")
+        self.layer_manager.add_layer_with_image(q_image, name="Pasted Layer")
 
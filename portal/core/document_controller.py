@@ -7,9 +7,9 @@ from PySide6.QtCore import QObject, Signal, Slot, QRect, Qt
 from PySide6.QtGui import QColor, QImage, QPainter
 from PySide6.QtWidgets import QMessageBox
 
-from PIL.ImageQt import ImageQt
 
 from portal.core.document import Document
+from portal.core.image_conversion import pil_to_qimage
 from portal.core.undo import UndoManager
 from portal.core.drawing_context import DrawingContext
 from portal.core.command import (
@@ -30,6 +30,7 @@ from portal.core.layer import Layer
 from portal.core.key import Key
 from portal.core.services.document_service import DocumentService
 from portal.core.services.clipboard_service import ClipboardService
+from portal.core.services.background_removal_service import BackgroundRemovalService
 from portal.core.settings_controller import SettingsController
 
 
@@ -52,8 +53,12 @@ class DocumentController(QObject):
 
     undo_stack_changed = Signal()
     document_changed = Signal()
+    frame_content_changed = Signal(list)
     ai_output_rect_changed = Signal(QRect)
     keyframes_delta = Signal(tuple, tuple, tuple)
+    background_removal_progress = Signal(int, int)
+    background_removal_finished = Signal(bool)
+    dirty_changed = Signal(bool)
 
     def __init__(self, settings: SettingsController, document_service: DocumentService | None = None, clipboard_service: ClipboardService | None = None):
         super().__init__()
@@ -72,6 +77,7 @@ class DocumentController(QObject):
         self.is_recording = False
         self.recorded_commands = []
         self._is_dirty = False
+        self.command_journal = None
 
         self._main_window = None
         self._base_window_title = "Pixel Portal"
@@ -85,6 +91,13 @@ class DocumentController(QObject):
         self._last_ai_output_rect = QRect()
         self.document_changed.connect(self._on_document_mutated)
 
+        self.background_removal = BackgroundRemovalService(parent=self)
+        self._background_removal_layer = None
+        self.background_removal.progress.connect(self.background_removal_progress.emit)
+        self.background_removal.finished.connect(self._on_background_removed)
+        self.background_removal.cancelled.connect(self._on_background_removal_stopped)
+        self.background_removal.failed.connect(self._on_background_removal_failed)
+
         initial_fps = self._playback_fps
         self.attach_document(Document(64, 64))
         self.set_playback_fps(initial_fps)
@@ -134,8 +147,13 @@ class DocumentController(QObject):
         normalized = bool(value)
         previous = self._is_dirty
         self._is_dirty = normalized
+        if not normalized and self.command_journal is not None:
+            # Only save/open/new mark the document clean, so whatever is on
+            # disk now matches the document.
+            self.command_journal.reset(self.document, saved=True)
         if normalized != previous:
             self._refresh_window_title()
+            self.dirty_changed.emit(normalized)
 
     def is_auto_key_enabled(self) -> bool:
         return bool(self.auto_key_enabled)
@@ -146,6 +164,25 @@ class DocumentController(QObject):
             return
         self.auto_key_enabled = normalized
 
+    def set_command_journal(self, journal) -> None:
+        """Journal every executed command, undo and redo to ``journal``."""
+
+        if self.command_journal is not None:
+            self.command_journal.close()
+        self.command_journal = journal
+        if journal is not None:
+            journal.reset(self.document, saved=not self.is_dirty)
+
+    def _begin_journal_entry(self, command=None):
+        journal = self.command_journal
+        if journal is None or self.document is None or self.is_recording:
+            return None
+        return journal.begin(self.document, command)
+
+    def _commit_journal_entry(self, pending, command=None) -> None:
+        if pending is not None:
+            self.command_journal.commit(pending, command)
+
     def _snapshot_keyframes(self, layer) -> tuple[int, ...]:
         return layer.keys
 
@@ -310,8 +347,10 @@ class DocumentController(QObject):
         layer_manager_before = getattr(self.document, 'layer_manager', None)
         active_layer_before = getattr(layer_manager_before, 'active_layer', None)
         before_frames = self._snapshot_keyframes(active_layer_before)
+        pending_journal_entry = self._begin_journal_entry(command)
 
         command.execute()
+        self._commit_journal_entry(pending_journal_entry, command)
         if self.is_recording:
             self.recorded_commands.append(command)
         else:
@@ -350,6 +389,9 @@ class DocumentController(QObject):
     def on_layer_structure_changed(self):
         self.document_changed.emit()
 
+    def on_frame_content_changed(self, layers):
+        self.frame_content_changed.emit(layers)
+
     @Slot(int, int, object)
     def resize_document(self, width, height, interpolation):
         if self.document:
@@ -364,13 +406,17 @@ class DocumentController(QObject):
 
     @Slot()
     def undo(self):
+        pending_journal_entry = self._begin_journal_entry()
         self.undo_manager.undo()
+        self._commit_journal_entry(pending_journal_entry)
         self.undo_stack_changed.emit()
         self.document_changed.emit()
 
     @Slot()
     def redo(self):
+        pending_journal_entry = self._begin_journal_entry()
         self.undo_manager.redo()
+        self._commit_journal_entry(pending_journal_entry)
         self.undo_stack_changed.emit()
         self.document_changed.emit()
 
@@ -489,6 +535,32 @@ class DocumentController(QObject):
         if document is None:
             return
 
+        command = AddLayerCommand(
+            document, self._compose_ai_layer_image(image), "AI Generated Layer"
+        )
+        self.execute_command(command)
+
+    def add_new_layers_with_images(self, images, name="AI Candidate"):
+        """Add each image as its own layer in a single undoable step."""
+
+        document = self.document
+        images = list(images or [])
+        if document is None or not images:
+            return
+        if len(images) == 1:
+            self.add_new_layer_with_image(images[0])
+            return
+
+        commands = [
+            AddLayerCommand(document, self._compose_ai_layer_image(image), f"{name} {index}")
+            for index, image in enumerate(images, start=1)
+        ]
+        self.execute_command(CompositeCommand(commands, name=f"Add {len(commands)} {name}s"))
+
+    def _compose_ai_layer_image(self, image) -> QImage:
+        """Place ``image`` in the AI output rectangle of a document-sized image."""
+
+        document = self.document
         target_rect = document.get_ai_output_rect() or QRect(
             0, 0, max(1, int(document.width)), max(1, int(document.height))
         )
@@ -496,7 +568,7 @@ class DocumentController(QObject):
         if isinstance(image, QImage):
             q_image = image
         else:
-            q_image = QImage(ImageQt(image.convert("RGBA")))
+            q_image = pil_to_qimage(image)
 
         if (
             q_image.width() != target_rect.width()
@@ -519,9 +591,7 @@ class DocumentController(QObject):
         painter = QPainter(composed)
         painter.drawImage(target_rect.topLeft(), q_image)
         painter.end()
-
-        command = AddLayerCommand(document, composed, "AI Generated Layer")
-        self.execute_command(command)
+        return composed
 
     @Slot(object)
     def handle_command(self, command):
@@ -533,7 +603,10 @@ class DocumentController(QObject):
     def attach_document(self, document: Document) -> None:
         """Swap to a new document and bind to its layer manager lifecycle."""
 
+        self.background_removal.cancel()
         self.document = document
+        if self.command_journal is not None:
+            self.command_journal.reset(document)
         stored_fps = getattr(document, "playback_fps", DEFAULT_PLAYBACK_FPS)
         normalized_fps = Document.normalize_playback_fps(stored_fps)
         self._playback_fps = normalized_fps
@@ -590,6 +663,7 @@ class DocumentController(QObject):
         layer_manager.layer_visibility_changed.connect(self.on_layer_visibility_changed)
         layer_manager.layer_onion_skin_changed.connect(self.on_layer_onion_skin_changed)
         layer_manager.layer_structure_changed.connect(self.on_layer_structure_changed)
+        layer_manager.frame_content_changed.connect(self.on_frame_content_changed)
         layer_manager.command_generated.connect(self.handle_command)
 
     def _disconnect_layer_manager(self):
@@ -599,6 +673,7 @@ class DocumentController(QObject):
             (self._layer_manager.layer_visibility_changed, self.on_layer_visibility_changed),
             (self._layer_manager.layer_onion_skin_changed, self.on_layer_onion_skin_changed),
             (self._layer_manager.layer_structure_changed, self.on_layer_structure_changed),
+            (self._layer_manager.frame_content_changed, self.on_frame_content_changed),
             (self._layer_manager.command_generated, self.handle_command),
         ):
             try:
@@ -622,15 +697,50 @@ class DocumentController(QObject):
 
     def remove_background_from_layer(
         self, scope: BackgroundRemovalScope = BackgroundRemovalScope.ALL_KEYS
-    ):
+    ) -> bool:
+        """Start removing the background of the active layer's keys.
+
+        The work runs on the background removal service's worker pool; the
+        results are applied as one undoable command when every key is done.
+        Returns ``False`` if there is no layer or a removal is already running.
+        """
+
         document = self.document
         if document is None:
-            return
+            return False
 
         layer_manager = getattr(document, "layer_manager", None)
         layer = getattr(layer_manager, "active_layer", None)
-        command = RemoveBackgroundCommand(layer)
-        self.execute_command(command)
+        if layer is None or self.background_removal.is_running:
+            return False
+        if scope == BackgroundRemovalScope.THIS_KEY:
+            keys = [layer.active_key]
+        else:
+            keys = list(layer.keys)
+        self._background_removal_layer = layer
+        return self.background_removal.start(keys)
+
+    def cancel_background_removal(self) -> None:
+        self.background_removal.cancel()
+
+    def _on_background_removed(self, results: dict) -> None:
+        layer = self._background_removal_layer
+        self._background_removal_layer = None
+        # Skip keys that were deleted while the removal was running.
+        results = {key: image for key, image in results.items() if key in layer.keys}
+        if not results:
+            self.background_removal_finished.emit(False)
+            return
+        self.execute_command(RemoveBackgroundCommand(layer, results))
+        self.background_removal_finished.emit(True)
+
+    def _on_background_removal_stopped(self) -> None:
+        self._background_removal_layer = None
+        self.background_removal_finished.emit(False)
+
+    def _on_background_removal_failed(self, message: str) -> None:
+        print(f"Background removal failed: {message}")
+        self._on_background_removal_stopped()
 
     def select_frame(self, index: int) -> None:
         layer_manager = getattr(self.document, "layer_manager", None)
@@ -0,0 +1,140 @@
+"""Move pixels between ``QImage``, Pillow images and NumPy arrays.
+
+Every conversion works on the raw pixel buffers: a ``QImage`` is exposed to
+NumPy as a view of its own memory, and Pillow reads or writes Qt's ARGB32
+byte order directly. No conversion goes through an image encoder.
+
+Qt's ``Format_ARGB32`` stores each pixel as a native-endian ``0xAARRGGBB``
+word, which is ``B, G, R, A`` in memory on little-endian machines. Images in
+other formats, including premultiplied ones, are first converted to straight
+ARGB32 so callers always see unpremultiplied RGBA values.
+"""
+
+from __future__ import annotations
+
+import sys
+
+import numpy as np
+from PIL import Image
+from PySide6.QtGui import QImage
+
+# Byte order of a Format_ARGB32 pixel in memory, for Pillow's raw codec and
+# as channel indices into a (height, width, 4) view.
+ARGB32_RAWMODE = "BGRA" if sys.byteorder == "little" else "ARGB"
+_RGBA_CHANNELS = (2, 1, 0, 3) if sys.byteorder == "little" else (1, 2, 3, 0)
+# Pillow images are swizzled into QImages in bands of about this many bytes,
+# so converting a large image never holds a second full-size byte string.
+_BAND_BYTES = 4 << 20
+
+
+def ensure_argb32(image: QImage) -> QImage:
+    """Return ``image`` itself when it is straight ARGB32, else a converted copy."""
+
+    if image.format() == QImage.Format_ARGB32:
+        return image
+    return image.convertToFormat(QImage.Format_ARGB32)
+
+
+def qimage_view(image: QImage, *, writable: bool = False) -> np.ndarray:
+    """Return a ``(height, width, 4)`` uint8 view of an ARGB32 image's pixels.
+
+    Channels are in memory order (see ``ARGB32_RAWMODE``). The view shares
+    the image's buffer, so ``image`` must outlive it; a writable view detaches
+    the image from any implicitly shared copies first.
+    """
+
+    if image.format() != QImage.Format_ARGB32:
+        raise ValueError("qimage_view() requires a Format_ARGB32 image.")
+    width = image.width()
+    height = image.height()
+    stride = image.bytesPerLine()
+    bits = image.bits() if writable else image.constBits()
+    buffer = np.frombuffer(bits, dtype=np.uint8, count=stride * height)
+    return buffer.reshape(height, stride)[:, : width * 4].reshape(height, width, 4)
+
+
+def qimage_to_numpy(image: QImage) -> np.ndarray:
+    """Return an owned ``(height, width, 4)`` RGBA array of ``image``."""
+
+    image = ensure_argb32(image)
+    return np.ascontiguousarray(qimage_view(image)[..., _RGBA_CHANNELS])
+
+
+def numpy_to_qimage(array: np.ndarray) -> QImage:
+    """Create an ARGB32 ``QImage`` from a ``(height, width, 3 or 4)`` RGB(A) array."""
+
+    array = np.asarray(array)
+    if array.ndim != 3 or array.shape[2] not in (3, 4):
+        raise ValueError("Expected an array shaped (height, width, 3) or (height, width, 4).")
+    if array.dtype != np.uint8:
+        array = np.clip(array, 0, 255).astype(np.uint8)
+    height, width, channels = array.shape
+    image = QImage(width, height, QImage.Format_ARGB32)
+    view = qimage_view(image, writable=True)
+    for source, target in enumerate(_RGBA_CHANNELS[:channels]):
+        view[..., target] = array[..., source]
+    if channels == 3:
+        view[..., _RGBA_CHANNELS[3]] = 255
+    return image
+
+
+def qimage_to_pil(image: QImage) -> Image.Image:
+    """Return an RGBA Pillow image with the pixels of ``image``.
+
+    Pillow swizzles straight out of the ``QImage`` buffer into its own
+    storage, so the result does not depend on ``image`` afterwards.
+    """
+
+    image = ensure_argb32(image)
+    return Image.frombuffer(
+        "RGBA",
+        (image.width(), image.height()),
+        image.constBits(),
+        "raw",
+        ARGB32_RAWMODE,
+        image.bytesPerLine(),
+        1,
+    )
+
+
+def pil_to_qimage(image: Image.Image) -> QImage:
+    """Return an ARGB32 ``QImage`` that owns a copy of ``image``'s pixels."""
+
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+    width, height = image.size
+    qimage = QImage(width, height, QImage.Format_ARGB32)
+    if not width or not height:
+        return qimage
+    image.load()
+    row = width * 4
+    band_rows = max(1, _BAND_BYTES // row)
+    view = np.frombuffer(qimage.bits(), dtype=np.uint8, count=qimage.bytesPerLine() * height)
+    view = view.reshape(height, qimage.bytesPerLine())[:, :row]
+    for top in range(0, height, band_rows):
+        bottom = min(height, top + band_rows)
+        band = image if band_rows >= height else image.crop((0, top, width, bottom))
+        data = band.tobytes("raw", ARGB32_RAWMODE)
+        view[top:bottom] = np.frombuffer(data, dtype=np.uint8).reshape(bottom - top, row)
+    return qimage
+
+
+def pil_to_numpy(image: Image.Image) -> np.ndarray:
+    """Return an RGBA array for ``image``."""
+
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+    return np.asarray(image)
+
+
+def numpy_to_pil(array: np.ndarray) -> Image.Image:
+    """Return a Pillow image sharing ``array``'s L, RGB or RGBA buffer."""
+
+    array = np.ascontiguousarray(array, dtype=np.uint8)
+    if array.ndim == 2:
+        mode = "L"
+    elif array.ndim == 3 and array.shape[2] in (3, 4):
+        mode = "RGB" if array.shape[2] == 3 else "RGBA"
+    else:
+        raise ValueError("Expected an array shaped (height, width[, 3 or 4]).")
+    return Image.frombuffer(mode, (array.shape[1], array.shape[0]), array, "raw", mode, 0, 1)
@@ -1,14 +1,22 @@
 from __future__ import annotations
 
+from collections.abc import Callable
+
 from PySide6.QtCore import QObject, QRect, QSize, Qt, Signal
 from PySide6.QtGui import QColor, QImage, QPainter
 
+from portal.core.key_codec import decode_payload
+
 
 class Key(QObject):
     """Represents the drawable state for a :class:`Layer`."""
 
     image_changed = Signal()
 
+    # Bumped whenever any key changes frame so layers can invalidate cached
+    # frame lookups without tracking every key individually.
+    _frame_number_revision = 0
+
     def __init__(
         self,
         width: int,
@@ -16,12 +24,24 @@ class Key(QObject):
         *,
         image: QImage | None = None,
         frame_number: int = 0,
+        encoded_image: bytes | None = None,
+        content_hash: str | None = None,
+        image_loader: Callable[[], QImage] | None = None,
     ) -> None:
         super().__init__()
-        if image is None:
+        if image is None and encoded_image is None and image_loader is None:
             image = QImage(QSize(width, height), QImage.Format_ARGB32)
             image.fill(QColor(0, 0, 0, 0))
+        # ``_image`` stays ``None`` until a lazily loaded key is first accessed;
+        # ``_encoded_image`` holds the archive payload it was loaded from and is
+        # only trusted while the decoded image still has ``_encoded_revision``.
         self._image = image
+        self._encoded_image = encoded_image
+        self._encoded_revision: int | None = None
+        self._content_hash = content_hash if encoded_image is not None else None
+        # Alternatively a callable producing the pixels on first access, for
+        # sources such as TIFF pages that are not archive payloads.
+        self._image_loader = image_loader if image is None else None
         self._non_transparent_bounds: QRect | None = None
         self._non_transparent_bounds_dirty = False
         
@@ -33,27 +53,127 @@ class Key(QObject):
 
     @frame_number.setter
     def frame_number(self, value: int) -> None:
+        if value != self._frame_number:
+            Key._frame_number_revision += 1
         self._frame_number = value
 
     @property
     def image(self) -> QImage:
+        if self._image is None:
+            if self._image_loader is not None:
+                self._image = self._image_loader()
+                self._image_loader = None
+            else:
+                self.adopt_decoded_image(self.decode_encoded_image(self._encoded_image))
         return self._image
 
     @image.setter
     def image(self, value: QImage) -> None:
         self._image = value
+        self._image_loader = None
+        self._drop_encoded_image()
         self.mark_non_transparent_bounds_dirty()
 
+    def read_image(self) -> QImage:
+        """Return the key's pixels without keeping them decoded.
+
+        Unlike :attr:`image`, an undecoded key stays undecoded: its pixels are
+        produced for the caller only, who should let go of them when done.
+        """
+
+        if self._image is not None:
+            return self._image
+        if self._image_loader is not None:
+            return self._image_loader()
+        return self.decode_encoded_image(self._encoded_image)
+
+    @property
+    def is_loaded(self) -> bool:
+        """Return ``True`` when the key's pixels are decoded in memory."""
+
+        return self._image is not None
+
+    @property
+    def image_loader(self) -> Callable[[], QImage] | None:
+        """Callable that will produce the pixels of an undecoded key, if any."""
+
+        return self._image_loader if self._image is None else None
+
+    @property
+    def encoded_image(self) -> bytes | None:
+        """Archive payload matching the current pixels, if one is known."""
+
+        if self._encoded_image is None:
+            return None
+        if self._image is None or self._image.cacheKey() == self._encoded_revision:
+            return self._encoded_image
+        return None
+
+    @property
+    def content_hash(self) -> str | None:
+        """Pixel digest recorded alongside :attr:`encoded_image`, if known."""
+
+        if self.encoded_image is None:
+            return None
+        return self._content_hash
+
+    def _drop_encoded_image(self) -> None:
+        self._encoded_image = None
+        self._encoded_revision = None
+        self._content_hash = None
+
+    @staticmethod
+    def decode_encoded_image(payload: bytes) -> QImage:
+        """Decode an archive payload; safe to call from worker threads."""
+
+        return decode_payload(payload)
+
+    def adopt_decoded_image(self, image: QImage) -> None:
+        """Install ``image`` decoded from this key's encoded payload."""
+
+        self._image = image
+        self._encoded_revision = int(image.cacheKey())
+
+    def evict_image(self) -> bool:
+        """Drop decoded pixels when they still match the encoded payload.
+
+        Returns ``True`` if the key was released back to its compressed form.
+        The next access to :attr:`image` decodes it again.
+        """
+
+        if self._image is None or self.encoded_image is None:
+            return False
+        self._image = None
+        self._encoded_revision = None
+        return True
+
+    @property
+    def revision(self) -> int:
+        """Token that changes whenever the key's pixels may have changed.
+
+        Backed by :meth:`QImage.cacheKey`, which Qt bumps on every detach or
+        write access, so keys sharing an unmodified buffer report the same
+        revision.
+        """
+
+        if self._image is None:
+            # Undecoded keys are unchanged by definition; identify them by
+            # their payload so asking for a revision never forces a decode.
+            if self._image_loader is not None:
+                return -id(self._image_loader)
+            return -id(self._encoded_image)
+        return int(self._image.cacheKey())
+
     def clear(self, selection=None) -> None:
         """Fills the key with transparent pixels."""
 
         if selection and not selection.isEmpty():
-            painter = QPainter(self._image)
+            painter = QPainter(self.image)
             painter.setCompositionMode(QPainter.CompositionMode_Clear)
             painter.fillPath(selection, QColor(0, 0, 0, 0))
             painter.end()
         else:
-            self._image.fill(QColor(0, 0, 0, 0))
+            self.image.fill(QColor(0, 0, 0, 0))
 
         self.image_changed.emit()
         self._set_non_transparent_bounds(None)
@@ -61,6 +181,25 @@ class Key(QObject):
     def clone(self, *, deep_copy: bool = False) -> "Key":
         """Return a copy of this key."""
 
+        if self._image is None and self._image_loader is not None:
+            cloned_key = Key.from_loader(
+                self._image_loader,
+                frame_number=self.frame_number,
+            )
+            cloned_key._copy_non_transparent_bounds_from(self)
+            return cloned_key
+        if self._image is None:
+            # The payload is immutable, so lazily loaded keys clone cheaply
+            # and stay undecoded.
+            cloned_key = Key.from_encoded(
+                self._encoded_image,
+                frame_number=self.frame_number,
+                content_hash=self._content_hash,
+            )
+            cloned_key._copy_non_transparent_bounds_from(self)
+            return cloned_key
+
+        encoded_image = self.encoded_image
         image = self._image.copy() if deep_copy else QImage(self._image)
         cloned_key = Key(
             image.width(),
@@ -68,6 +207,11 @@ class Key(QObject):
             image=image,
             frame_number=self.frame_number,
         )
+        if encoded_image is not None:
+            # Same pixels, so the payload still describes the copy.
+            cloned_key._encoded_image = encoded_image
+            cloned_key._encoded_revision = int(image.cacheKey())
+            cloned_key._content_hash = self._content_hash
         cloned_key._copy_non_transparent_bounds_from(self)
         return cloned_key
 
@@ -82,6 +226,7 @@ class Key(QObject):
             self._image = other.image.copy()
         else:
             self._image = QImage(other.image)
+        self._drop_encoded_image()
         self._copy_non_transparent_bounds_from(other)
         if emit_change:
             self.image_changed.emit()
@@ -98,12 +243,51 @@ class Key(QObject):
         key._non_transparent_bounds_dirty = True
         return key
 
+    @classmethod
+    def from_encoded(
+        cls,
+        payload: bytes,
+        *,
+        frame_number: int | None = None,
+        content_hash: str | None = None,
+    ) -> "Key":
+        """Create a key that decodes ``payload`` on first pixel access."""
+
+        key = cls(
+            0,
+            0,
+            frame_number=frame_number,
+            encoded_image=payload,
+            content_hash=content_hash,
+        )
+        key._non_transparent_bounds = None
+        key._non_transparent_bounds_dirty = True
+        return key
+
+    @classmethod
+    def from_loader(
+        cls,
+        loader: Callable[[], QImage],
+        *,
+        frame_number: int | None = None,
+    ) -> "Key":
+        """Create a key whose pixels come from ``loader`` on first access.
+
+        ``loader`` may be called more than once when the key is cloned before
+        it is decoded, and must return an image the key can own.
+        """
+
+        key = cls(0, 0, frame_number=frame_number, image_loader=loader)
+        key._non_transparent_bounds = None
+        key._non_transparent_bounds_dirty = True
+        return key
+
     def flip_horizontal(self) -> None:
-        self._image = self._image.flipped(Qt.Horizontal)
+        self.image = self.image.flipped(Qt.Horizontal)
         self.image_changed.emit()
 
     def flip_vertical(self) -> None:
-        self._image = self._image.flipped(Qt.Vertical)
+        self.image = self.image.flipped(Qt.Vertical)
         self.image_changed.emit()
 
     def mark_non_transparent_bounds_dirty(self) -> None:
@@ -140,7 +324,7 @@ class Key(QObject):
         self._non_transparent_bounds_dirty = False
 
     def _calculate_non_transparent_bounds(self) -> QRect | None:
-        image = getattr(self, "_image", None)
+        image = self.image
         if image is None or image.isNull():
             return None
 
@@ -0,0 +1,111 @@
+"""Encoders for key images stored inside AOLE archives.
+
+Two payload encodings exist:
+
+* PNG, the compact default.
+* Raw RGBA8888 pixels cropped to the key's non-transparent bounds and
+  compressed with zlib. It is much cheaper to produce, which is what frequent
+  saves such as autosave care about.
+
+Payloads are self-describing, so readers never need the encoding name from the
+archive metadata.
+"""
+
+from __future__ import annotations
+
+import struct
+import zlib
+
+import numpy as np
+from PySide6.QtCore import QBuffer
+from PySide6.QtGui import QImage
+
+PNG_SUFFIX = ".png"
+RAW_SUFFIX = ".raw"
+
+_RAW_MAGIC = b"AOLR"
+_RAW_VERSION = 1
+# magic, version, full width/height, crop x/y/width/height
+_RAW_HEADER = struct.Struct("<4sB6I")
+
+
+def encode_png(image: QImage) -> bytes:
+    buffer = QBuffer()
+    buffer.open(QBuffer.ReadWrite)
+    image.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+def encode_raw(image: QImage, level: int = 1) -> bytes:
+    """Encode ``image`` as zlib-compressed pixels cropped to its opaque area."""
+
+    rgba = image.convertToFormat(QImage.Format_RGBA8888)
+    width = rgba.width()
+    height = rgba.height()
+    pixels = _rgba_array(rgba)
+
+    alpha = pixels[:, :, 3]
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if rows.size:
+        columns = np.flatnonzero(alpha.any(axis=0))
+        top, bottom = int(rows[0]), int(rows[-1]) + 1
+        left, right = int(columns[0]), int(columns[-1]) + 1
+    else:
+        top = bottom = left = right = 0
+
+    cropped = np.ascontiguousarray(pixels[top:bottom, left:right])
+    header = _RAW_HEADER.pack(
+        _RAW_MAGIC,
+        _RAW_VERSION,
+        width,
+        height,
+        left,
+        top,
+        right - left,
+        bottom - top,
+    )
+    return header + zlib.compress(cropped.tobytes(), level)
+
+
+def is_raw_payload(payload: bytes) -> bool:
+    return payload[: len(_RAW_MAGIC)] == _RAW_MAGIC
+
+
+def payload_suffix(payload: bytes) -> str:
+    return RAW_SUFFIX if is_raw_payload(payload) else PNG_SUFFIX
+
+
+def decode_payload(payload: bytes) -> QImage:
+    """Decode either payload encoding; returns a null image on failure."""
+
+    if not is_raw_payload(payload):
+        image = QImage()
+        image.loadFromData(payload, "PNG")
+        return image
+
+    try:
+        _, version, width, height, left, top, crop_width, crop_height = (
+            _RAW_HEADER.unpack_from(payload)
+        )
+        if version != _RAW_VERSION:
+            return QImage()
+        pixels = np.zeros((height, width, 4), dtype=np.uint8)
+        if crop_width and crop_height:
+            data = zlib.decompress(payload[_RAW_HEADER.size :])
+            pixels[top : top + crop_height, left : left + crop_width] = (
+                np.frombuffer(data, dtype=np.uint8).reshape(crop_height, crop_width, 4)
+            )
+    except (struct.error, zlib.error, ValueError):
+        return QImage()
+
+    image = QImage(pixels.data, width, height, width * 4, QImage.Format_RGBA8888)
+    # ``convertToFormat`` detaches from the NumPy buffer before it goes away.
+    return image.convertToFormat(QImage.Format_ARGB32)
+
+
+def _rgba_array(image: QImage) -> np.ndarray:
+    width = image.width()
+    height = image.height()
+    stride = image.bytesPerLine()
+    buffer = np.frombuffer(image.constBits(), dtype=np.uint8)
+    return buffer.reshape(height, stride)[:, : width * 4].reshape(height, width, 4)
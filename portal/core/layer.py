@@ -1,10 +1,75 @@
 from __future__ import annotations
 
+from bisect import bisect_right
+
 from PySide6.QtGui import QImage
 from PySide6.QtCore import QObject, QRect, Signal
 
 from .key import Key
 
+
+class _KeyList(list):
+    """List of keys that tells its owning layer whenever it is mutated."""
+
+    def __init__(self, owner: "Layer", iterable=()) -> None:
+        super().__init__(iterable)
+        self._owner = owner
+
+    def _changed(self) -> None:
+        self._owner._invalidate_key_lookup()
+
+    def append(self, key) -> None:
+        super().append(key)
+        self._changed()
+
+    def extend(self, keys) -> None:
+        super().extend(keys)
+        self._changed()
+
+    def insert(self, index, key) -> None:
+        super().insert(index, key)
+        self._changed()
+
+    def remove(self, key) -> None:
+        super().remove(key)
+        self._changed()
+
+    def pop(self, index=-1):
+        key = super().pop(index)
+        self._changed()
+        return key
+
+    def clear(self) -> None:
+        super().clear()
+        self._changed()
+
+    def sort(self, *args, **kwargs) -> None:
+        super().sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._changed()
+
+    def __setitem__(self, index, value) -> None:
+        super().__setitem__(index, value)
+        self._changed()
+
+    def __delitem__(self, index) -> None:
+        super().__delitem__(index)
+        self._changed()
+
+    def __iadd__(self, keys):
+        result = super().__iadd__(keys)
+        self._changed()
+        return result
+
+    def __imul__(self, count):
+        result = super().__imul__(count)
+        self._changed()
+        return result
+
+
 class Layer(QObject):
     """
     Represents a single layer in the document.
@@ -36,16 +101,23 @@ class Layer(QObject):
         self.opacity = 1.0  # 0.0 (transparent) to 1.0 (opaque)
         self._onion_skin_enabled = False
         self._active_key_index = 0
+        self._keys_version = 0
+        self._sorted_key_frames: list[int] = []
+        self._sorted_key_indices: list[int] = []
+        self._sorted_keys_version: tuple[int, int] | None = None
+        # (current_frame, keys_version, frame_number_revision) -> resolved index
+        self._active_key_cache: tuple[int, int, int] | None = None
+        self._resolved_active_index = 0
         self._layer_manager = layer_manager
         if keys is not None:
             provided_keys = list(keys)
         else:
             provided_keys = [Key(width, height, frame_number=0)]
 
-        self.keys: list[Key] = []
+        self._keys = _KeyList(self)
         for key_instance in provided_keys:
             self._register_key(key_instance)
-            self.keys.append(key_instance)
+            self._keys.append(key_instance)
 
         self.uid = self._next_uid()
 
@@ -61,10 +133,36 @@ class Layer(QObject):
         self._layer_manager = manager
         self.on_current_frame_changed(manager.current_frame)
 
+    @property
+    def keys(self) -> list[Key]:
+        return self._keys
+
+    @keys.setter
+    def keys(self, value: list[Key]) -> None:
+        self._keys = _KeyList(self, value)
+        self._invalidate_key_lookup()
+
+    @property
+    def keys_version(self) -> int:
+        """Counter bumped whenever the key list is mutated."""
+
+        return self._keys_version
+
+    def _invalidate_key_lookup(self) -> None:
+        self._keys_version += 1
+
     @property
     def active_key(self) -> Key:
-        self._active_key_index = self._index_for_frame(self._layer_manager.current_frame)
-        return self.keys[self._active_key_index]
+        cache_key = (
+            self._layer_manager.current_frame,
+            self._keys_version,
+            Key._frame_number_revision,
+        )
+        if self._active_key_cache != cache_key:
+            self._resolved_active_index = self._index_for_frame(cache_key[0])
+            self._active_key_cache = cache_key
+        self._active_key_index = self._resolved_active_index
+        return self._keys[self._resolved_active_index]
 
     @property
     def active_key_index(self) -> int:
@@ -73,11 +171,21 @@ class Layer(QObject):
     def set_active_key_index(self, index: int) -> None:
         self._active_key_index = index
 
-    def on_current_frame_changed(self, frame: int) -> None:
+    def on_current_frame_changed(self, frame: int, *, emit_change: bool = True) -> bool:
+        """Resolve the key for ``frame`` and report whether it changed.
+
+        When ``emit_change`` is ``False`` the caller is responsible for
+        announcing the change, which lets the layer manager batch a frame
+        step across every layer into a single notification.
+        """
+
         resolved_index = self._index_for_frame(frame)
-        if resolved_index != self._active_key_index:
-            self._active_key_index = resolved_index
+        if resolved_index == self._active_key_index:
+            return False
+        self._active_key_index = resolved_index
+        if emit_change:
             self.on_image_change.emit()
+        return True
 
     @property
     def name(self):
@@ -200,18 +308,39 @@ class Layer(QObject):
     def non_transparent_bounds(self) -> QRect | None:
         return self.active_key.non_transparent_bounds
 
+    def _ensure_sorted_key_frames(self) -> None:
+        version = (self._keys_version, Key._frame_number_revision)
+        if self._sorted_keys_version == version:
+            return
+
+        frames: list[int] = []
+        indices: list[int] = []
+        ordered = sorted(
+            range(len(self._keys)),
+            key=lambda idx: (self._keys[idx].frame_number, idx),
+        )
+        for index in ordered:
+            key_frame = self._keys[index].frame_number
+            # Duplicate frames resolve to the earliest list position.
+            if frames and frames[-1] == key_frame:
+                continue
+            frames.append(key_frame)
+            indices.append(index)
+
+        self._sorted_key_frames = frames
+        self._sorted_key_indices = indices
+        self._sorted_keys_version = version
+
     def _index_for_frame(self, frame: int) -> int:
         """Return the index of the key best matching ``frame``."""
 
-        best_index: int | None = None
-        best_frame: int | None = None
-        for index, key in enumerate(self.keys):
-            key_frame = key.frame_number
-            if key_frame <= frame and (best_frame is None or key_frame > best_frame):
-                best_index = index
-                best_frame = key_frame
-        if best_index is not None:
-            return best_index
+        self._ensure_sorted_key_frames()
+        frames = self._sorted_key_frames
+        if not frames:
+            raise ValueError("Layer has no keys")
+        position = bisect_right(frames, frame)
+        if position:
+            return self._sorted_key_indices[position - 1]
         # No key was found with ``frame_number`` <= frame_value, so fall back to the
         # earliest available key to keep the layer usable.
-        return min(range(len(self.keys)), key=lambda idx: self.keys[idx].frame_number)
+        return self._sorted_key_indices[0]
@@ -2,11 +2,15 @@ from __future__ import annotations
 
 from portal.core.layer import Layer
 from portal.core.key import Key
+from portal.core.image_conversion import pil_to_qimage
 from PySide6.QtCore import QObject, Signal
 from PySide6.QtGui import QPainter, QColor, QImage
-from PIL.ImageQt import ImageQt
 from portal.commands.layer_commands import SetLayerVisibleCommand, SetLayerOnionSkinCommand
 
+# Decoded key pixels kept in memory before frame changes start releasing
+# unmodified keys back to their archive payloads.
+DEFAULT_DECODED_BYTES_BUDGET = 512 * 1024 * 1024
+
 
 class LayerManager(QObject):
     """
@@ -15,6 +19,7 @@ class LayerManager(QObject):
     layer_visibility_changed = Signal(int)
     layer_structure_changed = Signal()
     layer_onion_skin_changed = Signal(int)
+    frame_content_changed = Signal(list)
     command_generated = Signal(object)
 
     def __init__(self, width: int, height: int, create_background: bool = True):
@@ -25,6 +30,8 @@ class LayerManager(QObject):
         self.active_layer_index = -1
         self._document = None
         self._current_frame = 0
+        # ``None`` disables eviction on frame changes.
+        self.decoded_bytes_budget: int | None = DEFAULT_DECODED_BYTES_BUDGET
 
         if create_background:
             self.add_layer("Background")
@@ -81,8 +88,7 @@ class LayerManager(QObject):
 
     def add_layer_with_image(self, image, name="Image Layer"):
         if not isinstance(image, QImage):
-            q_image = ImageQt(image.convert("RGBA"))
-            q_image = QImage(q_image)
+            q_image = pil_to_qimage(image)
         else:
             q_image = image
 
@@ -221,8 +227,43 @@ class LayerManager(QObject):
         new_manager.active_layer_index = self.active_layer_index
         new_manager._document = self._document
         new_manager._current_frame = self._current_frame
+        new_manager.decoded_bytes_budget = self.decoded_bytes_budget
         return new_manager
 
+    def decoded_bytes(self) -> int:
+        """Bytes held by the decoded pixels of every key."""
+
+        return sum(
+            key.image.sizeInBytes() for layer in self.layers for key in layer.keys if key.is_loaded
+        )
+
+    def evict_inactive_keys(self, budget: int = 0) -> int:
+        """Release decoded pixels of unmodified keys not shown at this frame.
+
+        Keys loaded lazily from an archive fall back to their compressed
+        payload and decode again on next access. Keys farthest from the
+        current frame go first, until at most ``budget`` bytes stay decoded.
+        Returns the number of keys released.
+        """
+
+        decoded = self.decoded_bytes()
+        candidates = [
+            key
+            for layer in self.layers
+            for key in layer.keys
+            if key is not layer.active_key and key.is_loaded
+        ]
+        candidates.sort(key=lambda key: abs(key.frame_number - self._current_frame), reverse=True)
+        released = 0
+        for key in candidates:
+            if decoded <= budget:
+                break
+            size = key.image.sizeInBytes()
+            if key.evict_image():
+                decoded -= size
+                released += 1
+        return released
+
     @property
     def current_frame(self) -> int:
         return self._current_frame
@@ -231,5 +272,13 @@ class LayerManager(QObject):
         if frame == self._current_frame:
             return
         self._current_frame = frame
-        for layer in self.layers:
-            layer.on_current_frame_changed(self._current_frame)
+        changed_layers = [
+            layer
+            for layer in self.layers
+            if layer.on_current_frame_changed(frame, emit_change=False)
+        ]
+        if changed_layers:
+            self.frame_content_changed.emit(changed_layers)
+        budget = self.decoded_bytes_budget
+        if budget is not None and self.decoded_bytes() > budget:
+            self.evict_inactive_keys(budget)
@@ -1,4 +1,6 @@
 from .document_service import DocumentService
 from .clipboard_service import ClipboardService
+from .autosave_service import AutosaveService
+from .background_removal_service import BackgroundRemovalService
 
-__all__ = ["DocumentService", "ClipboardService"]
+__all__ = ["DocumentService", "ClipboardService", "AutosaveService", "BackgroundRemovalService"]
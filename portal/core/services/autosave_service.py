@@ -0,0 +1,375 @@
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+import json
+import os
+import time
+import uuid
+
+from PySide6.QtCore import QLockFile, QObject, QStandardPaths, QTimer, Signal
+from PySide6.QtWidgets import QMessageBox
+
+from portal.core.aole_archive import AOLEArchive, ArchiveCache
+from portal.core.document import Document
+
+
+class AutosaveService(QObject):
+    """Periodically writes a recovery copy of the open document.
+
+    Each run takes a :meth:`Document.snapshot` on the UI thread, which only
+    bumps reference counts on the key images, and serializes it on a worker
+    thread using the fast raw key format. Runs are skipped while the
+    document is clean or unchanged since the previous autosave, and the
+    recovery copy is deleted once the document is saved, so a later crash
+    never offers work older than the file on disk.
+
+    Every instance writes its own ``recovery-<id>`` files and holds a lock
+    next to them while it runs, so several open editors never overwrite or
+    delete each other's copy. On startup, copies whose lock is no longer
+    held were left by a session that crashed and are offered for recovery.
+    """
+
+    autosave_finished = Signal(str)
+    autosave_failed = Signal(str)
+    # Internal: delivers worker completion back to the UI thread.
+    _write_completed = Signal(object)
+
+    DEFAULT_INTERVAL_SECONDS = 60
+    RECOVERY_PREFIX = "recovery-"
+
+    def __init__(
+        self,
+        app=None,
+        *,
+        recovery_dir: str | None = None,
+        interval_seconds: float | None = None,
+        parent: QObject | None = None,
+    ) -> None:
+        super().__init__(parent)
+        self.app = app
+        if recovery_dir is None:
+            recovery_dir = self.default_recovery_dir()
+        self.recovery_dir = recovery_dir
+        self._recovery_name = f"{self.RECOVERY_PREFIX}{uuid.uuid4().hex}"
+        self._lock = self._acquire_lock(self._recovery_name)
+        if interval_seconds is None:
+            interval_seconds = self._configured_interval()
+        self._interval_ms = max(1000, int(float(interval_seconds) * 1000))
+
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._cache = ArchiveCache()
+        self._in_flight: Future | None = None
+        self._in_flight_snapshot: Document | None = None
+        self._last_signature: tuple | None = None
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(self._interval_ms)
+        self._timer.timeout.connect(self.autosave_now)
+        self._write_completed.connect(self._on_write_completed)
+        dirty_changed = getattr(app, "dirty_changed", None)
+        if dirty_changed is not None:
+            dirty_changed.connect(self._on_dirty_changed)
+
+    # ------------------------------------------------------------------
+    # Paths
+    # ------------------------------------------------------------------
+    @staticmethod
+    def default_recovery_dir() -> str:
+        base = QStandardPaths.writableLocation(QStandardPaths.AppLocalDataLocation)
+        if not base:
+            base = os.path.join(os.path.expanduser("~"), ".pixel_portal")
+        return os.path.join(base, "recovery")
+
+    @property
+    def recovery_path(self) -> str:
+        return self._recovery_file(self._recovery_name, ".aole")
+
+    @property
+    def recovery_info_path(self) -> str:
+        return self._recovery_file(self._recovery_name, ".json")
+
+    def _recovery_file(self, name: str, suffix: str) -> str:
+        return os.path.join(self.recovery_dir, name + suffix)
+
+    def _acquire_lock(self, name: str) -> QLockFile | None:
+        """Lock ``name``'s recovery files; ``None`` if another process holds them."""
+
+        try:
+            os.makedirs(self.recovery_dir, exist_ok=True)
+        except OSError:
+            return None
+        lock = QLockFile(self._recovery_file(name, ".lock"))
+        # Only a lock whose process has exited is stale, however old it is.
+        lock.setStaleLockTime(0)
+        return lock if lock.tryLock(0) else None
+
+    def recovery_candidates(self) -> list[str]:
+        """Recovery copies left by sessions that are no longer running, newest first."""
+
+        try:
+            names = os.listdir(self.recovery_dir)
+        except OSError:
+            return []
+        stems = {
+            os.path.splitext(name)[0]
+            for name in names
+            if name.startswith(self.RECOVERY_PREFIX) and name.endswith((".aole", ".lock"))
+        }
+        stems.discard(self._recovery_name)
+        candidates = []
+        for stem in stems:
+            lock = self._acquire_lock(stem)
+            if lock is None:
+                continue
+            # Unlocking removes the lock file the crashed session left behind.
+            lock.unlock()
+            path = self._recovery_file(stem, ".aole")
+            try:
+                candidates.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        return [path for _mtime, path in sorted(candidates, reverse=True)]
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        self._timer.start()
+
+    def stop(self) -> None:
+        self._timer.stop()
+
+    @property
+    def is_active(self) -> bool:
+        return self._timer.isActive()
+
+    def shutdown(self, *, discard_recovery: bool = True) -> None:
+        """Stop autosaving, wait for a pending write, and optionally clean up."""
+
+        self.stop()
+        self.wait_for_idle()
+        self._executor.shutdown(wait=True)
+        if discard_recovery:
+            self.discard_recovery()
+        if self._lock is not None:
+            self._lock.unlock()
+            self._lock = None
+
+    def wait_for_idle(self, timeout: float | None = None) -> None:
+        future = self._in_flight
+        if future is None:
+            return
+        try:
+            future.result(timeout=timeout)
+        except Exception:
+            pass
+        # Deliver the queued completion now so callers observe a settled state.
+        self._on_write_completed(future)
+
+    # ------------------------------------------------------------------
+    # Autosave
+    # ------------------------------------------------------------------
+    def autosave_now(self) -> bool:
+        """Queue an autosave; returns ``False`` when the run was skipped."""
+
+        if self._in_flight is not None:
+            return False
+
+        app = self.app
+        document = getattr(app, "document", None)
+        if document is None:
+            return False
+        if not getattr(app, "is_dirty", True):
+            self._discard_stale_recovery()
+            return False
+
+        signature = self.document_signature(document)
+        if signature == self._last_signature:
+            return False
+
+        snapshot = document.snapshot()
+        self._last_signature = signature
+        self._in_flight_snapshot = snapshot
+        future = self._executor.submit(
+            self._write_snapshot,
+            snapshot,
+            self.recovery_path,
+            self.recovery_info_path,
+            document.file_path,
+            self._cache,
+        )
+        self._in_flight = future
+        future.add_done_callback(self._write_completed.emit)
+        return True
+
+    @staticmethod
+    def document_signature(document: Document) -> tuple:
+        """Cheap fingerprint of everything an autosave would write."""
+
+        layer_manager = document.layer_manager
+        layers = tuple(
+            (
+                layer.uid,
+                layer.name,
+                layer.visible,
+                layer.opacity,
+                layer.onion_skin_enabled,
+                tuple((key.frame_number, key.revision) for key in layer.keys),
+            )
+            for layer in layer_manager.layers
+        )
+        return (
+            document.width,
+            document.height,
+            layer_manager.active_layer_index,
+            document.playback_total_frames,
+            document.playback_fps,
+            document.get_playback_loop_range(),
+            layers,
+        )
+
+    @staticmethod
+    def _write_snapshot(
+        snapshot: Document,
+        recovery_path: str,
+        info_path: str,
+        original_path: str | None,
+        cache: ArchiveCache,
+    ) -> str:
+        AOLEArchive.save(
+            snapshot,
+            recovery_path,
+            cache=cache,
+            key_format=AOLEArchive.KEY_FORMAT_RAW,
+        )
+        info = {"file_path": original_path, "saved_at": time.time()}
+        with open(info_path, "w", encoding="utf-8") as handle:
+            json.dump(info, handle)
+        return recovery_path
+
+    def _on_write_completed(self, future: Future) -> None:
+        if future is not self._in_flight:
+            return
+        self._in_flight = None
+        # Release the snapshot here so its QObjects are destroyed on the
+        # thread that owns them.
+        self._in_flight_snapshot = None
+        error = future.exception()
+        if error is not None:
+            self._last_signature = None
+            self.autosave_failed.emit(str(error))
+            return
+        if not getattr(self.app, "is_dirty", True):
+            # The document was saved while this copy was being written.
+            self._discard_stale_recovery()
+            return
+        self.autosave_finished.emit(future.result())
+
+    def _on_dirty_changed(self, dirty: bool) -> None:
+        if not dirty and self._in_flight is None:
+            self._discard_stale_recovery()
+
+    def _discard_stale_recovery(self) -> None:
+        self._last_signature = None
+        if self.has_recovery():
+            self.discard_recovery()
+
+    # ------------------------------------------------------------------
+    # Recovery
+    # ------------------------------------------------------------------
+    def has_recovery(self) -> bool:
+        return os.path.isfile(self.recovery_path)
+
+    def load_recovery(self, path: str | None = None) -> Document | None:
+        """Load this instance's recovery copy, or the candidate at ``path``."""
+
+        if path is None:
+            path = self.recovery_path
+        if not os.path.isfile(path):
+            return None
+        try:
+            document = Document.load_aole(path)
+        except (OSError, ValueError):
+            return None
+        try:
+            with open(os.path.splitext(path)[0] + ".json", encoding="utf-8") as handle:
+                info = json.load(handle)
+        except (OSError, ValueError):
+            info = {}
+        file_path = info.get("file_path") if isinstance(info, dict) else None
+        document.file_path = file_path if isinstance(file_path, str) else None
+        return document
+
+    def discard_recovery(self, path: str | None = None) -> None:
+        """Delete this instance's recovery copy, or the candidate at ``path``."""
+
+        stem = os.path.splitext(path or self.recovery_path)[0]
+        for suffix in (".aole", ".json"):
+            try:
+                os.remove(stem + suffix)
+            except OSError:
+                pass
+
+    def _claim_recovery(self, path: str) -> None:
+        """Take over a recovered copy so it survives until the next autosave."""
+
+        stem = os.path.splitext(path)[0]
+        for source, target in (
+            (stem + ".aole", self.recovery_path),
+            (stem + ".json", self.recovery_info_path),
+        ):
+            try:
+                os.replace(source, target)
+            except OSError:
+                pass
+
+    def offer_recovery(self) -> bool:
+        """Ask whether to restore a recovery file left by a crashed session.
+
+        Candidates are offered newest first until one is restored; declined
+        copies are deleted.
+        """
+
+        app = self.app
+        if app is None:
+            return False
+
+        for path in self.recovery_candidates():
+            message_box = QMessageBox(getattr(app, "main_window", None))
+            message_box.setIcon(QMessageBox.Question)
+            message_box.setText("Pixel Portal did not shut down cleanly.")
+            message_box.setInformativeText("Do you want to recover your unsaved work?")
+            message_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+            message_box.setDefaultButton(QMessageBox.Yes)
+            if message_box.exec() != QMessageBox.Yes:
+                self.discard_recovery(path)
+                continue
+
+            document = self.load_recovery(path)
+            if document is None:
+                self.discard_recovery(path)
+                continue
+            self._claim_recovery(path)
+            break
+        else:
+            return False
+
+        app.attach_document(document)
+        app.undo_manager.clear()
+        app.is_dirty = True
+        app.undo_stack_changed.emit()
+        app.document_changed.emit()
+        return True
+
+    def _configured_interval(self) -> float:
+        config = getattr(self.app, "config", None)
+        if config is None:
+            return self.DEFAULT_INTERVAL_SECONDS
+        try:
+            return config.getfloat(
+                "General",
+                "autosave_interval",
+                fallback=self.DEFAULT_INTERVAL_SECONDS,
+            )
+        except ValueError:
+            return self.DEFAULT_INTERVAL_SECONDS
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import os
+import threading
+from typing import Callable, Iterable
+
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtGui import QImage
+
+from portal.core.aole_archive import image_content_hash
+from portal.core.image_conversion import ensure_argb32, pil_to_qimage, qimage_to_pil
+
+# rembg pulls in onnxruntime and downloads its model on first use, so the
+# module is imported and the session created only when removal is requested.
+# Creating a session loads the model from disk; one session is kept for the
+# lifetime of the process and shared by every worker thread, since
+# onnxruntime sessions can be run concurrently.
+_session = None
+_session_lock = threading.Lock()
+
+
+def _rembg_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            from rembg import new_session  # type: ignore
+
+            _session = new_session()
+        return _session
+
+
+def remove_background(image):
+    """Remove the background of a PIL image with the shared rembg session."""
+
+    from rembg import remove  # type: ignore
+
+    return remove(image, session=_rembg_session())
+
+
+def _remove_from_qimage(image: QImage) -> QImage:
+    return pil_to_qimage(remove_background(qimage_to_pil(image)))
+
+
+def _default_worker_count() -> int:
+    # rembg already spreads one inference over several cores.
+    return max(1, min(4, (os.cpu_count() or 2) // 2))
+
+
+class BackgroundRemovalService(QObject):
+    """Removes the background of many key images on a worker pool.
+
+    Keys sharing a revision are queued once. The worker hashes each image
+    and removes its background only when no result with the same pixels is
+    cached or already being computed, so running removal again on unchanged
+    keys is free. Progress is reported per queued image; a run can be
+    cancelled, in which case nothing is delivered. ``finished`` receives a
+    ``{key: QImage}`` mapping for every key whose revision is still the one
+    the run started from; keys edited in the meantime are left out, so the
+    edit survives.
+    """
+
+    progress = Signal(int, int)
+    finished = Signal(object)
+    cancelled = Signal()
+    failed = Signal(str)
+    # Internal: delivers worker completion back to the UI thread.
+    _item_completed = Signal(object)
+
+    RESULT_CACHE_SIZE = 64
+
+    def __init__(
+        self,
+        remover: Callable[[QImage], QImage] | None = None,
+        *,
+        max_workers: int | None = None,
+        parent: QObject | None = None,
+    ) -> None:
+        super().__init__(parent)
+        self._remover = remover or _remove_from_qimage
+        self._max_workers = max_workers or _default_worker_count()
+        self._executor: ThreadPoolExecutor | None = None
+        # Results by pixel hash, shared with the workers under ``_results_lock``.
+        self._results: OrderedDict[str, QImage] = OrderedDict()
+        self._in_flight: dict[str, Future] = {}
+        self._results_lock = threading.Lock()
+        self._futures: dict[Future, int] = {}
+        self._run_results: dict[int, QImage] = {}
+        self._keys: dict = {}
+        self._done = 0
+        self._total = 0
+        self._item_completed.connect(self._on_item_completed)
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._futures)
+
+    def start(self, keys: Iterable) -> bool:
+        """Queue background removal for ``keys``; ``False`` while busy."""
+
+        if self.is_running:
+            return False
+
+        self._keys = {}
+        self._run_results = {}
+        pending: dict[int, QImage] = {}
+        for key in keys:
+            revision = key.revision
+            self._keys[key] = revision
+            if revision not in pending:
+                # A shallow copy: painting on the key detaches from it.
+                pending[revision] = QImage(key.image)
+
+        self._done = 0
+        self._total = len(pending)
+        if not pending:
+            self._deliver()
+            return True
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        self.progress.emit(0, self._total)
+        for revision, image in pending.items():
+            self._futures[self._executor.submit(self._process, image)] = revision
+        # Callbacks are attached once every future is tracked: a future that
+        # has already finished runs its callback immediately, and must not
+        # find the run looking complete.
+        for future in list(self._futures):
+            future.add_done_callback(self._item_completed.emit)
+        return True
+
+    def cancel(self) -> None:
+        """Drop the current run; images still in flight are discarded."""
+
+        if not self.is_running:
+            return
+        self._abandon()
+        self.cancelled.emit()
+
+    def shutdown(self) -> None:
+        self._abandon()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def clear_cache(self) -> None:
+        with self._results_lock:
+            self._results.clear()
+
+    def _process(self, image: QImage) -> QImage:
+        """Worker task: the result for ``image``, reusing one with equal pixels."""
+
+        image = ensure_argb32(image)
+        digest = image_content_hash(image)
+        with self._results_lock:
+            result = self._results.get(digest)
+            if result is not None:
+                self._results.move_to_end(digest)
+                return result
+            pending = self._in_flight.get(digest)
+            if pending is None:
+                self._in_flight[digest] = owned = Future()
+        if pending is not None:
+            return pending.result()
+
+        try:
+            result = self._remover(image)
+        except BaseException as error:
+            with self._results_lock:
+                del self._in_flight[digest]
+            owned.set_exception(error)
+            raise
+        with self._results_lock:
+            self._results[digest] = result
+            del self._in_flight[digest]
+        owned.set_result(result)
+        return result
+
+    def _abandon(self) -> None:
+        futures, self._futures = self._futures, {}
+        for future in futures:
+            future.cancel()
+        self._keys = {}
+        self._run_results = {}
+
+    def _on_item_completed(self, future: Future) -> None:
+        revision = self._futures.pop(future, None)
+        if revision is None or future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self._abandon()
+            self.failed.emit(str(error))
+            return
+
+        self._run_results[revision] = future.result()
+        self._done += 1
+        self.progress.emit(self._done, self._total)
+        if not self._futures:
+            self._deliver()
+
+    def _deliver(self) -> None:
+        results = {
+            key: self._run_results[revision]
+            for key, revision in self._keys.items()
+            if key.revision == revision
+        }
+        with self._results_lock:
+            while len(self._results) > self.RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+        self._keys = {}
+        self._run_results = {}
+        self.finished.emit(results)
@@ -5,8 +5,11 @@ from pathlib import Path
 from typing import Callable
 
 from PySide6.QtGui import QImage, QImageReader, QPainter
-from PySide6.QtWidgets import QFileDialog, QMessageBox
+from PySide6.QtWidgets import QFileDialog, QInputDialog, QMessageBox
 
+from portal.core import animation_export, animation_import
+from portal.core.command import AddLayerCommand
+from portal.core.command_journal import CommandJournal, journal_path_for
 from portal.core.document import Document
 
 
@@ -35,6 +38,18 @@ class DocumentService:
         ".bmp",
     })
 
+    _ANIMATION_EXPORT_FILTERS: dict[str, tuple[str, str]] = {
+        "GIF (*.gif)": (animation_export.FORMAT_GIF, ".gif"),
+        "Animated PNG (*.png *.apng)": (animation_export.FORMAT_APNG, ".png"),
+        "WebP (*.webp)": (animation_export.FORMAT_WEBP, ".webp"),
+        "Sprite Sheet (*.png)": (animation_export.FORMAT_SPRITE_SHEET, ".png"),
+    }
+
+    _ANIMATION_IMPORT_FILTERS: tuple[str, ...] = (
+        "Animations (*.gif *.png *.apng *.webp)",
+        "Sprite Sheet (*.png)",
+    )
+
     _ARCHIVE_SAVE_HANDLERS: dict[str, Callable[[Document, str], None]] = {
         ".aole": Document.save_aole,
         ".tif": Document.save_tiff,
@@ -73,15 +88,47 @@ class DocumentService:
             )
             return
 
+        recovered = None
+        journal = getattr(app, "command_journal", None)
+        if journal is not None:
+            recovered = self.offer_journal_recovery(
+                journal_path_for(file_path, journal.fallback_dir)
+            )
+        if recovered is not None:
+            document = recovered
+
         self._update_last_directory(file_path)
         app.attach_document(document)
         app.undo_manager.clear()
-        app.is_dirty = False
+        app.is_dirty = recovered is not None
         app.undo_stack_changed.emit()
         app.document_changed.emit()
         if app.main_window:
             app.main_window.canvas.set_initial_zoom()
 
+    def offer_journal_recovery(self, journal_path: str) -> Document | None:
+        """Offer to replay a command journal left behind by a crash."""
+
+        if not CommandJournal.has_recovery(journal_path):
+            return None
+        message_box = QMessageBox(self._dialog_parent())
+        message_box.setIcon(QMessageBox.Question)
+        message_box.setText("This document has unsaved changes from a previous session.")
+        message_box.setInformativeText("Do you want to restore them?")
+        message_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+        message_box.setDefaultButton(QMessageBox.Yes)
+        if message_box.exec() != QMessageBox.Yes:
+            return None
+        try:
+            return CommandJournal.recover(journal_path)
+        except (OSError, ValueError, KeyError):
+            self._show_message(
+                QMessageBox.Warning,
+                "Unable to restore the unsaved changes.",
+                "The recovery journal is incomplete or no longer matches the document.",
+            )
+            return None
+
     def open_as_key(self) -> None:
         app = self.app
         if app is None:
@@ -171,18 +218,101 @@ class DocumentService:
         self._finalize_save(document, normalized_path)
 
     def export_animation(self) -> None:  # pragma: no cover - UI convenience
-        self._show_message(
-            QMessageBox.Information,
-            "Animation export is unavailable.",
-            "Animation features are currently disabled while the system is rebuilt.",
+        app = self.app
+        if app is None:
+            return
+        document = getattr(app, "document", None)
+        if document is None:
+            return
+
+        filters = self._ANIMATION_EXPORT_FILTERS
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self._dialog_parent(),
+            "Export Animation",
+            getattr(app, "last_directory", ""),
+            self._build_filter_string(tuple(filters)),
         )
+        if not file_path:
+            return
+
+        # Without a recognised filter the format follows the file suffix.
+        export_format, default_suffix = filters.get(selected_filter, (None, ".gif"))
+        if not Path(file_path).suffix:
+            file_path = f"{file_path}{default_suffix}"
+
+        try:
+            animation_export.export_animation(document, file_path, format=export_format)
+        except (OSError, ValueError) as exc:
+            self._show_message(
+                QMessageBox.Critical,
+                "Failed to export animation.",
+                str(exc),
+            )
+            return
+        self._update_last_directory(file_path)
 
     def import_animation(self) -> None:  # pragma: no cover - UI convenience
-        self._show_message(
-            QMessageBox.Information,
-            "Animation import is unavailable.",
-            "Animation features are currently disabled while the system is rebuilt.",
+        app = self.app
+        if app is None:
+            return
+        document = getattr(app, "document", None)
+        if document is None:
+            return
+
+        file_path, selected_filter = QFileDialog.getOpenFileName(
+            self._dialog_parent(),
+            "Import Animation",
+            getattr(app, "last_directory", ""),
+            self._build_filter_string(self._ANIMATION_IMPORT_FILTERS),
         )
+        if not file_path:
+            return
+
+        try:
+            if selected_filter == self._ANIMATION_IMPORT_FILTERS[1]:
+                frames = self._sprite_sheet_frames(file_path)
+                if frames is None:
+                    return
+            else:
+                frames = animation_import.read_animation_frames(file_path)
+            layer_manager = document.layer_manager
+            start_frame = layer_manager.current_frame
+            layer = animation_import.build_animation_layer(
+                layer_manager,
+                frames,
+                name=Path(file_path).stem or "Animation",
+                start_frame=start_frame,
+                fps=getattr(app, "playback_fps", None),
+            )
+        except (OSError, ValueError) as exc:
+            self._show_message(
+                QMessageBox.Warning,
+                "Unable to import animation.",
+                str(exc),
+            )
+            return
+
+        self._update_last_directory(file_path)
+        app.execute_command(AddLayerCommand(document, layer=layer))
+        loop_start, loop_end = app.playback_loop_range
+        last_frame = max(key.frame_number for key in layer.keys)
+        if last_frame > loop_end:
+            app.set_playback_loop_range(loop_start, last_frame)
+
+    def _sprite_sheet_frames(self, file_path: str):
+        if animation_import.has_sprite_sheet_metadata(file_path):
+            return animation_import.read_sprite_sheet_frames(file_path)
+        columns, accepted = QInputDialog.getInt(
+            self._dialog_parent(), "Sprite Sheet", "Columns:", 4, 1, 1024
+        )
+        if not accepted:
+            return None
+        rows, accepted = QInputDialog.getInt(
+            self._dialog_parent(), "Sprite Sheet", "Rows:", 1, 1, 1024
+        )
+        if not accepted:
+            return None
+        return animation_import.read_sprite_sheet_frames(file_path, columns=columns, rows=rows)
 
     # ------------------------------------------------------------------
     # Helpers
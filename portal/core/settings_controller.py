@@ -30,7 +30,10 @@ class SettingsController(QObject):
         "negative_prompt": (
             "blurry, low quality, distorted, deformed, extra limbs, watermark, text"
         ),
+        "preview_mode": "latent",
+        "preview_interval": 1,
     }
+    AI_PREVIEW_MODES = ("latent", "decode", "off")
 
     DEFAULT_ANIMATION_SETTINGS = {
         "fps": DEFAULT_PLAYBACK_FPS,
@@ -120,6 +123,14 @@ class SettingsController(QObject):
             'negative_prompt',
             fallback=self.DEFAULT_AI_SETTINGS["negative_prompt"],
         )
+        self.ai_preview_mode = self._coerce_preview_mode(
+            self.config.get('AI', 'preview_mode', fallback=None)
+        )
+        try:
+            preview_interval = self.config.getint('AI', 'preview_interval')
+        except (configparser.NoOptionError, ValueError):
+            preview_interval = self.DEFAULT_AI_SETTINGS["preview_interval"]
+        self.ai_preview_interval = max(1, int(preview_interval))
         self._sync_ai_settings_to_config()
 
     def save_settings(self, ai_settings=None):
@@ -216,6 +227,14 @@ class SettingsController(QObject):
         if not self.config.has_section('AI'):
             self.config.add_section('AI')
         self.config.set('AI', 'negative_prompt', self.ai_negative_prompt or '')
+        self.config.set('AI', 'preview_mode', self.ai_preview_mode)
+        self.config.set('AI', 'preview_interval', str(int(self.ai_preview_interval)))
+
+    def _coerce_preview_mode(self, mode):
+        mode = str(mode or '').strip().lower()
+        if mode in self.AI_PREVIEW_MODES:
+            return mode
+        return self.DEFAULT_AI_SETTINGS["preview_mode"]
 
     def get_grid_settings(self):
         return {
@@ -241,6 +260,8 @@ class SettingsController(QObject):
     def get_ai_settings(self):
         return {
             'negative_prompt': self.ai_negative_prompt,
+            'preview_mode': self.ai_preview_mode,
+            'preview_interval': int(self.ai_preview_interval),
         }
 
     def get_animation_settings(self):
@@ -343,7 +364,15 @@ class SettingsController(QObject):
             self.ruler_segments = max(1, segments_value)
         self._sync_ruler_settings_to_config()
 
-    def update_ai_settings(self, *, negative_prompt=None):
+    def update_ai_settings(self, *, negative_prompt=None, preview_mode=None, preview_interval=None):
         if negative_prompt is not None:
             self.ai_negative_prompt = str(negative_prompt)
+        if preview_mode is not None:
+            self.ai_preview_mode = self._coerce_preview_mode(preview_mode)
+        if preview_interval is not None:
+            try:
+                interval_value = int(preview_interval)
+            except (TypeError, ValueError):
+                interval_value = self.ai_preview_interval
+            self.ai_preview_interval = max(1, interval_value)
         self._sync_ai_settings_to_config()
@@ -0,0 +1,160 @@
+"""Layered TIFF reading and writing.
+
+Each layer is one TIFF page and the layer properties are stored as JSON in
+the first page's ``ImageDescription`` tag.
+
+Loading only reads the page directory. Every layer gets a key that decodes
+its page on first pixel access, straight into the key's ``QImage``, so at
+most one decoded page exists outside the keys at any time. Saving streams
+the layers the same way: one page is converted and written before the next
+is touched, instead of building every page up front, and pages of keys that
+were never decoded are read for the save only and dropped again.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import weakref
+
+from PIL import Image, TiffImagePlugin
+from PySide6.QtGui import QImage
+
+from portal.core.atomic_file import atomic_write
+from portal.core.image_conversion import pil_to_qimage, qimage_to_pil
+from portal.core.key import Key
+from portal.core.layer import Layer
+
+_DESCRIPTION_TAG = 270
+
+# Readers that may still decode pages, so a save over their file can first
+# take what they still owe.
+_open_readers: "weakref.WeakSet[TiffPageReader]" = weakref.WeakSet()
+
+
+class TiffPageReader:
+    """Decodes pages of one TIFF file on demand.
+
+    The file stays open for as long as any key still needs a page, so the
+    pages keep coming from the file that was loaded even if it is replaced
+    on disk afterwards.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = os.path.abspath(filename)
+        self._handle = open(filename, "rb")
+        self._finalizer = weakref.finalize(self, self._handle.close)
+        self._lock = threading.Lock()
+        self._pages: "weakref.WeakValueDictionary[int, _TiffPage]" = weakref.WeakValueDictionary()
+        _open_readers.add(self)
+
+    def page(self, index: int) -> "_TiffPage":
+        page = self._pages.get(index)
+        if page is None:
+            page = _TiffPage(self, index)
+            self._pages[index] = page
+        return page
+
+    def read_page(self, index: int) -> QImage:
+        # Pillow's TIFF plugin seeks a shared file handle, so decodes are
+        # serialized; each decode opens its own image so the decoded page is
+        # released as soon as it has been copied into the QImage.
+        with self._lock:
+            if self._handle.closed:
+                raise ValueError(f"{self.filename} is no longer available")
+            self._handle.seek(0)
+            with Image.open(self._handle) as source:
+                source.seek(index)
+                return pil_to_qimage(source)
+
+    def detach(self) -> None:
+        """Decode every page still waited on, then close the file."""
+
+        for page in list(self._pages.values()):
+            page.detach()
+        with self._lock:
+            self._finalizer()
+        _open_readers.discard(self)
+
+
+class _TiffPage:
+    """Loader for one page; shared by a key and any undecoded clones of it."""
+
+    def __init__(self, reader: TiffPageReader, index: int) -> None:
+        self._reader = reader
+        self._index = index
+        self._image: QImage | None = None
+
+    def __call__(self) -> QImage:
+        if self._image is not None:
+            return QImage(self._image)
+        return self._reader.read_page(self._index)
+
+    def detach(self) -> None:
+        if self._image is None:
+            self._image = self._reader.read_page(self._index)
+
+
+def release_readers(filename: str) -> None:
+    """Detach readers of ``filename`` before the file is overwritten."""
+
+    target = os.path.abspath(filename)
+    for reader in list(_open_readers):
+        if reader.filename == target:
+            reader.detach()
+
+
+def load_tiff(document_cls, filename: str):
+    """Read ``filename`` into a new document whose layers decode lazily."""
+
+    reader = TiffPageReader(filename)
+    with Image.open(filename) as image:
+        width, height = image.size
+        page_count = getattr(image, "n_frames", 1)
+        try:
+            layer_properties = json.loads(image.tag_v2[_DESCRIPTION_TAG])
+        except (KeyError, TypeError, json.JSONDecodeError):
+            layer_properties = None
+    if not isinstance(layer_properties, list):
+        layer_properties = []
+
+    document = document_cls(width, height)
+    layer_manager = document.layer_manager
+    layer_manager.layers = []
+    for index in range(page_count):
+        props = layer_properties[index] if index < len(layer_properties) else {}
+        key = Key.from_loader(reader.page(index), frame_number=0)
+        layer = Layer(width, height, props.get("name", f"Layer {index + 1}"), keys=[key])
+        layer.visible = props.get("visible", True)
+        layer.opacity = props.get("opacity", 1.0)
+        layer.onion_skin_enabled = props.get("onion_skin_enabled", False)
+        layer_manager.layers.append(layer)
+
+    if layer_manager.layers:
+        layer_manager.active_layer_index = len(layer_manager.layers) - 1
+    layer_manager.layer_structure_changed.emit()
+    layer_manager.set_document(document)
+    document.file_path = filename
+    return document
+
+
+def save_tiff(document, filename: str) -> None:
+    """Write each layer of ``document`` as one LZW-compressed TIFF page."""
+
+    layers = list(document.layer_manager.layers)
+    if not layers:
+        return
+    description = json.dumps([layer.get_properties() for layer in layers])
+
+    with atomic_write(filename) as temp_path:
+        with open(temp_path, "w+b") as stream, TiffImagePlugin.AppendingTiffWriter(stream) as writer:
+            for index, layer in enumerate(layers):
+                page = qimage_to_pil(layer.active_key.read_image())
+                options = {"compression": "tiff_lzw"}
+                if index == 0:
+                    options["description"] = description
+                page.save(writer, format="TIFF", **options)
+                writer.newFrame()
+                del page
+        release_readers(filename)
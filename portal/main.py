@@ -4,6 +4,8 @@ from portal.ui.ui import MainWindow
 from portal.core.app import App
 from portal.core.services.document_service import DocumentService
 from portal.core.services.clipboard_service import ClipboardService
+from portal.core.services.autosave_service import AutosaveService
+from portal.core.command_journal import CommandJournal, journal_path_for
 
 if __name__ == "__main__":
     q_app = QApplication(sys.argv)
@@ -14,4 +16,23 @@ if __name__ == "__main__":
     app.main_window = window
     window.show()
     app.undo_stack_changed.emit()
+    autosave_service = AutosaveService(app.document_controller)
+    recovered = autosave_service.offer_recovery()
+    autosave_service.start()
+    q_app.aboutToQuit.connect(autosave_service.shutdown)
+    q_app.aboutToQuit.connect(app.document_controller.background_removal.shutdown)
+
+    controller = app.document_controller
+    if controller.config.getboolean("General", "command_journal", fallback=False):
+        journal = CommandJournal(AutosaveService.default_recovery_dir())
+        if not recovered:
+            document = document_service.offer_journal_recovery(
+                journal_path_for(None, journal.fallback_dir)
+            )
+            if document is not None:
+                controller.attach_document(document)
+                controller.is_dirty = True
+                controller.document_changed.emit()
+        controller.set_command_journal(journal)
+        q_app.aboutToQuit.connect(journal.discard)
     sys.exit(q_app.exec())
@@ -1,4 +1,4 @@
-from typing import Optional
+import os
 
 from PySide6.QtWidgets import (
     QDialog,
@@ -16,118 +16,177 @@ from PySide6.QtWidgets import (
     QSlider,
     QSizePolicy,
     QCheckBox,
+    QListWidget,
+    QListWidgetItem,
+    QSpinBox,
 )
-from PySide6.QtCore import Qt, QThread, Signal
+from PySide6.QtCore import QCoreApplication, Qt, QThread, Signal
 from PySide6.QtGui import QPixmap
+import numpy as np
 from PIL import Image
-from PIL.ImageQt import ImageQt
+from portal.core.image_conversion import pil_to_qimage
 from portal.ai.enums import GenerationMode
-from portal.ai.image_generator import (
-    ImageGenerator,
-    is_cuda_available,
-    is_diffusers_available,
-    is_torch_available,
+from portal.ai.generation_queue import (
+    DEFAULT_RESULT_CACHE_ENTRIES,
+    GenerationJob,
+    JobQueue,
+    ResultCache,
+    run_job,
 )
+from portal.ai.image_generator import ImageGenerator
 
-class GenerationThread(QThread):
-    generation_complete = Signal(object)
-    generation_failed = Signal(str)
-    generation_step = Signal(object)
-
-    def __init__(
-        self,
-        generator: ImageGenerator,
-        mode: GenerationMode,
-        image,
-        prompt,
-        negative_prompt,
-        original_size,
-        generation_size,
-        num_inference_steps,
-        guidance_scale,
-        strength,
-        remove_background=False,
-        mask_image=None,
-    ):
-        super().__init__()
+class GenerationWorker(QThread):
+    """Runs queued generation jobs one after another on a single thread.
+
+    The thread stays alive between jobs so the loaded pipeline is reused,
+    and results are served from the ``ResultCache`` when possible.
+    """
+
+    job_started = Signal(object)
+    job_progress = Signal(int, int, int)  # job id, completed steps, total steps
+    job_preview = Signal(int, object)
+    job_finished = Signal(int, object, bool)  # job id, result, served from cache
+    job_failed = Signal(int, str)
+    job_cancelled = Signal(int)
+    pipeline_loaded = Signal(object)
+    queue_changed = Signal()
+
+    def __init__(self, generator: ImageGenerator, result_cache: ResultCache | None = None, parent=None):
+        super().__init__(parent)
         self.generator = generator
-        self.mode = mode
-        self.image = image
-        self.mask_image = mask_image
-        self.prompt = prompt
-        self.negative_prompt = negative_prompt
-        self.original_size = original_size
-        self.generation_size = generation_size
-        self.num_inference_steps = num_inference_steps
-        self.guidance_scale = guidance_scale
-        self.strength = strength
-        self.remove_background = remove_background
-        self.is_cancelled = False
-
-    def cancel(self):
-        self.is_cancelled = True
+        self.result_cache = result_cache
+        self.queue = JobQueue()
+
+    def submit(self, job: GenerationJob) -> int:
+        job_id = self.queue.put(job)
+        self.queue_changed.emit()
+        if not self.isRunning():
+            self.start()
+        return job_id
+
+    def cancel(self, job_id: int) -> bool:
+        cancelled = self.queue.cancel(job_id)
+        if cancelled:
+            self.queue_changed.emit()
+        return cancelled
+
+    def cancel_running(self) -> bool:
+        running = self.queue.running
+        return running is not None and self.cancel(running.job_id)
+
+    def move(self, job_id: int, index: int) -> bool:
+        moved = self.queue.move(job_id, index)
+        if moved:
+            self.queue_changed.emit()
+        return moved
+
+    def set_priority(self, job_id: int, priority: int) -> bool:
+        changed = self.queue.set_priority(job_id, priority)
+        if changed:
+            self.queue_changed.emit()
+        return changed
+
+    def is_busy(self) -> bool:
+        return self.queue.running is not None or bool(self.queue.pending())
+
+    def stop(self) -> None:
+        """Cancel all jobs and wait for the thread; later submits start afresh."""
+
+        self.queue.close()
+        if self.isRunning():
+            self.wait()
+        self.queue = JobQueue()
 
     def run(self):
+        while True:
+            job = self.queue.take()
+            if job is None:
+                break
+            self.job_started.emit(job)
+            try:
+                self._run_job(job)
+            finally:
+                self.queue.task_done(job)
+                self.queue_changed.emit()
+
+    def _run_job(self, job: GenerationJob) -> None:
+        key = None
+        if self.result_cache is not None and job.cacheable:
+            model_cfg = self.generator.model_configs.get(job.model_name) or {}
+            key = job.cache_key(model_cfg.get("path"), self.generator.result_settings())
+            cached = self.result_cache.get(key)
+            if cached:
+                self.job_finished.emit(job.job_id, cached if job.num_images > 1 else cached[0], True)
+                return
+
         try:
-            step_callback = lambda image: self.generation_step.emit(image)
-
-            cancellation_token = lambda: self.is_cancelled
-            if self.mode == GenerationMode.IMAGE_TO_IMAGE:
-                if self.mask_image:
-                    generated_image = self.generator.inpaint_image(
-                        self.image,
-                        self.mask_image,
-                        self.prompt,
-                        negative_prompt=self.negative_prompt,
-                        strength=self.strength,
-                        num_inference_steps=self.num_inference_steps,
-                        guidance_scale=self.guidance_scale,
-                        step_callback=step_callback,
-                        cancellation_token=cancellation_token,
-                        remove_background=self.remove_background,
-                        generation_size=self.generation_size,
-                    )
-                else:
-                    generated_image = self.generator.image_to_image(
-                        self.image,
-                        self.prompt,
-                        negative_prompt=self.negative_prompt,
-                        strength=self.strength,
-                        num_inference_steps=self.num_inference_steps,
-                        guidance_scale=self.guidance_scale,
-                        step_callback=step_callback,
-                        cancellation_token=cancellation_token,
-                        remove_background=self.remove_background,
-                        generation_size=self.generation_size,
-                    )
-            else:
-                generated_image = self.generator.prompt_to_image(
-                    self.prompt,
-                    negative_prompt=self.negative_prompt,
-                    original_size=self.original_size,
-                    generation_size=self.generation_size,
-                    num_inference_steps=self.num_inference_steps,
-                    guidance_scale=self.guidance_scale,
-                    step_callback=step_callback,
-                    cancellation_token=cancellation_token,
-                    remove_background=self.remove_background,
-                )
-            self.generation_complete.emit(generated_image)
+            self.generator.load_pipeline(
+                job.model_name, is_img2img=job.is_img2img, is_inpaint=job.is_inpaint
+            )
+            self.pipeline_loaded.emit(self.generator.last_load)
+            total = job.expected_steps
+            result = run_job(
+                self.generator,
+                job,
+                step_callback=lambda image: self.job_preview.emit(job.job_id, image),
+                progress_callback=lambda step: self.job_progress.emit(job.job_id, min(step, total), total),
+                cancellation_token=lambda: job.cancelled,
+            )
         except Exception as e:
-            self.generation_failed.emit(str(e))
+            if job.cancelled:
+                self.job_cancelled.emit(job.job_id)
+            else:
+                self.job_failed.emit(job.job_id, str(e))
+            return
+
+        if job.cancelled:
+            # An interrupted pipeline still returns its partly denoised images.
+            self.job_cancelled.emit(job.job_id)
+            return
+        if key is not None:
+            try:
+                self.result_cache.put(key, result if isinstance(result, list) else [result])
+            except OSError as e:
+                print(f"Could not cache generation result: {e}")
+        self.job_finished.emit(job.job_id, result, False)
+
 
 class AIPanel(QWidget):
+    VARIATION_COUNT = 4
+
     image_generated = Signal(object)
+    images_generated = Signal(list)
 
-    def __init__(self, app, preview_panel, parent=None):
+    def __init__(self, app, preview_panel, parent=None, image_generator: ImageGenerator | None = None):
         super().__init__(parent)
         self.app = app
         self.preview_panel = preview_panel
-        self.image_generator = ImageGenerator()
+        self.image_generator = image_generator or ImageGenerator()
         self.setWindowTitle("AI Image Generation")
         self.setMinimumWidth(128)
         self.generated_image = None
-        self.thread: Optional[GenerationThread] = None
+
+        defaults = self.image_generator.defaults
+        cache_dir = defaults.get("result_cache_dir") or os.path.join(
+            defaults.get("output_dir", "output"), "cache"
+        )
+        self.worker = GenerationWorker(
+            self.image_generator,
+            ResultCache(cache_dir, defaults.get("result_cache_max_entries", DEFAULT_RESULT_CACHE_ENTRIES)),
+            self,
+        )
+        self.worker.job_started.connect(self.on_job_started)
+        self.worker.job_progress.connect(self.on_job_progress)
+        self.worker.job_preview.connect(lambda _job_id, image: self.on_generation_step(image))
+        self.worker.job_finished.connect(self.on_job_finished)
+        self.worker.job_failed.connect(lambda _job_id, message: self.on_generation_failed(message))
+        self.worker.job_cancelled.connect(lambda _job_id: self._update_progress_visibility())
+        self.worker.pipeline_loaded.connect(lambda _load: self.update_pipeline_status())
+        self.worker.queue_changed.connect(self.refresh_queue)
+        application = QCoreApplication.instance()
+        if application is not None:
+            application.aboutToQuit.connect(self.worker.stop)
+            application.aboutToQuit.connect(self.image_generator.shutdown)
 
         self.layout = QVBoxLayout(self)
 
@@ -146,6 +205,12 @@ class AIPanel(QWidget):
         model_layout.addWidget(self.model_combo)
         self.layout.addLayout(model_layout)
 
+        self.pipeline_status_label = QLabel()
+        self.pipeline_status_label.setObjectName("ai-pipeline-status-label")
+        self.pipeline_status_label.setWordWrap(True)
+        self.pipeline_status_label.setVisible(False)
+        self.layout.addWidget(self.pipeline_status_label)
+
         # --- Document Dimensions ---
         self.native_render_label = QLabel()
         self.native_render_label.setObjectName("ai-dimensions-label")
@@ -174,6 +239,15 @@ class AIPanel(QWidget):
             )
         self.layout.addWidget(self.remove_bg_checkbox)
 
+        self.crop_inpaint_checkbox = QCheckBox("Inpaint Selection Only")
+        self.crop_inpaint_checkbox.setToolTip(
+            "Diffuse only the masked area plus a margin and keep every other pixel"
+        )
+        self.crop_inpaint_checkbox.setChecked(
+            bool(self.image_generator.defaults.get("inpaint_crop_to_mask", True))
+        )
+        self.layout.addWidget(self.crop_inpaint_checkbox)
+
         # --- Sliders ---
         sliders_layout = QVBoxLayout()
 
@@ -206,6 +280,16 @@ class AIPanel(QWidget):
 
         self.layout.addLayout(sliders_layout)
 
+        # Seed: "Random" draws a seed per job, shown in the queue
+        seed_layout = QHBoxLayout()
+        seed_layout.addWidget(QLabel("Seed:"))
+        self.seed_spinbox = QSpinBox()
+        self.seed_spinbox.setRange(-1, 2**31 - 1)
+        self.seed_spinbox.setSpecialValueText("Random")
+        self.seed_spinbox.setValue(-1)
+        seed_layout.addWidget(self.seed_spinbox)
+        self.layout.addLayout(seed_layout)
+
         # Initialize sliders with defaults
         defaults = self.image_generator.defaults
         steps_default = defaults.get("num_inference_steps", 20)
@@ -237,6 +321,24 @@ class AIPanel(QWidget):
 
         self.variations_button.setEnabled(False)
 
+        # --- Queue ---
+        self.queue_list = QListWidget()
+        self.queue_list.setMaximumHeight(self.fontMetrics().lineSpacing() * 5)
+        self.queue_list.setVisible(False)
+        self.layout.addWidget(self.queue_list)
+
+        queue_buttons_layout = QHBoxLayout()
+        self.run_next_button = QPushButton("Run Next")
+        self.run_next_button.clicked.connect(self.run_selected_job_next)
+        self.remove_job_button = QPushButton("Remove")
+        self.remove_job_button.clicked.connect(self.cancel_selected_job)
+        queue_buttons_layout.addWidget(self.run_next_button)
+        queue_buttons_layout.addWidget(self.remove_job_button)
+        self.queue_buttons = QWidget()
+        self.queue_buttons.setLayout(queue_buttons_layout)
+        self.queue_buttons.setVisible(False)
+        self.layout.addWidget(self.queue_buttons)
+
         progress_layout = QHBoxLayout()
         self.progress_bar = QProgressBar()
         self.progress_bar.setRange(0, 0)  # Indeterminate
@@ -256,7 +358,8 @@ class AIPanel(QWidget):
         self.variations_button.clicked.connect(self.generate_variations)
         self.cancel_button.clicked.connect(self.cancel_generation)
 
-        self._dependencies_ready(show_dialog=True, disable=True)
+        # The CUDA probe imports torch, so it waits until a generation starts.
+        self._dependencies_ready(show_dialog=True, disable=True, check_cuda=False)
 
 
     @staticmethod
@@ -285,21 +388,12 @@ class AIPanel(QWidget):
             return None
         return width, height
 
-    def _dependencies_ready(self, *, show_dialog: bool = False, disable: bool = False) -> bool:
-        message = None
-        title = "AI Dependencies Missing"
-
-        if not is_torch_available():
-            message = "PyTorch is not installed. Install torch to enable AI features."
-        elif not is_diffusers_available():
-            message = (
-                "diffusers is not installed or missing required pipelines. Install diffusers to enable AI features."
-            )
-        elif not is_cuda_available():
-            title = "CUDA Not Available"
-            message = "CUDA is not available. AI features will be disabled."
-
-        if message:
+    def _dependencies_ready(
+        self, *, show_dialog: bool = False, disable: bool = False, check_cuda: bool = True
+    ) -> bool:
+        problem = self.image_generator.backend.unavailable_reason(check_cuda=check_cuda)
+        if problem:
+            title, message = problem
             if show_dialog:
                 QMessageBox.warning(self, title, message)
             if disable:
@@ -356,7 +450,7 @@ class AIPanel(QWidget):
         )
 
 
-    def start_generation(self, mode: GenerationMode):
+    def start_generation(self, mode: GenerationMode, num_images: int = 1):
         if not self._dependencies_ready(show_dialog=True, disable=True):
             return
 
@@ -370,10 +464,13 @@ class AIPanel(QWidget):
             prompt = f"{prompt}, {additions}"
 
         negative_prompt = ""
+        preview_mode = preview_interval = None
         controller = getattr(self.app, "settings_controller", None)
         if controller is not None and hasattr(controller, "get_ai_settings"):
             ai_settings = controller.get_ai_settings()
             negative_prompt = str(ai_settings.get("negative_prompt", "") or "")
+            preview_mode = ai_settings.get("preview_mode")
+            preview_interval = ai_settings.get("preview_interval")
 
         if not self.app.config.has_section('AI'):
             self.app.config.add_section('AI')
@@ -430,11 +527,11 @@ class AIPanel(QWidget):
 
             if input_image is not None and "A" in input_image.getbands():
                 alpha_channel = input_image.getchannel("A")
-                transparency_mask = alpha_channel.point(
-                    lambda value: 255 if value < 255 else 0
-                )
-                if transparency_mask.getbbox() is None:
-                    transparency_mask = None
+                # Any pixel that is not fully opaque gets inpainted.
+                translucent = np.asarray(alpha_channel) < 255
+                transparency_mask = None
+                if translucent.any():
+                    transparency_mask = Image.fromarray(translucent.astype(np.uint8) * 255, "L")
 
             should_use_selection = (
                 transparency_mask is None
@@ -458,21 +555,6 @@ class AIPanel(QWidget):
             if mask_image and mask_image.getbbox() is None:
                 mask_image = None
 
-        is_inpaint = mask_image is not None
-
-
-        self.progress_bar.setVisible(True)
-        self.cancel_button.setVisible(True)
-        self.set_buttons_enabled(False)
-
-        is_img2img = (mode == GenerationMode.IMAGE_TO_IMAGE)
-
-        try:
-            self.image_generator.load_pipeline(model_name, is_img2img=is_img2img, is_inpaint=is_inpaint)
-        except Exception as e:
-            self.on_generation_failed(f"Failed to load AI model: {e}")
-            return
-
         num_inference_steps = self.steps_slider.value()
         guidance_scale = self.guidance_slider.value() / 10.0
         strength = self.strength_slider.value() / 100.0
@@ -481,24 +563,98 @@ class AIPanel(QWidget):
 
         remove_background = self.remove_bg_checkbox.isChecked()
 
-        self.thread = GenerationThread(
-            self.image_generator,
-            mode,
-            input_image,
-            prompt,
-            negative_prompt,
-            original_size,
-            generation_size,
-            num_inference_steps,
-            guidance_scale,
-            strength,
-            remove_background=remove_background,
+        seed = self.seed_spinbox.value()
+
+        job = GenerationJob(
+            mode=mode,
+            prompt=prompt,
+            model_name=model_name,
+            negative_prompt=negative_prompt,
+            seed=None if seed < 0 else seed,
+            original_size=original_size,
+            generation_size=generation_size,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            strength=strength,
+            image=input_image,
             mask_image=mask_image,
+            remove_background=remove_background,
+            num_images=num_images,
+            preview_mode=preview_mode,
+            preview_interval=preview_interval,
+            crop_to_mask=self.crop_inpaint_checkbox.isChecked(),
+            palette=self._active_palette(),
         )
-        self.thread.generation_complete.connect(self.on_generation_complete)
-        self.thread.generation_failed.connect(self.on_generation_failed)
-        self.thread.generation_step.connect(self.on_generation_step)
-        self.thread.start()
+        self.worker.submit(job)
+        return job.job_id
+
+    def _active_palette(self) -> tuple[str, ...] | None:
+        """The main window palette, when generations are quantized to it."""
+
+        if not self.image_generator.pixel_art.use_palette:
+            return None
+        get_palette = getattr(self.app.main_window, "get_palette", None)
+        colors = tuple(color for color in get_palette() if color) if callable(get_palette) else ()
+        return colors or None
+
+    def refresh_queue(self):
+        pending = self.worker.queue.pending()
+        self.queue_list.clear()
+        for job in pending:
+            item = QListWidgetItem(job.describe())
+            item.setData(Qt.UserRole, job.job_id)
+            self.queue_list.addItem(item)
+        self.queue_list.setVisible(bool(pending))
+        self.queue_buttons.setVisible(bool(pending))
+        self._update_progress_visibility()
+
+    def _selected_job_id(self):
+        item = self.queue_list.currentItem()
+        return None if item is None else item.data(Qt.UserRole)
+
+    def run_selected_job_next(self):
+        job_id = self._selected_job_id()
+        if job_id is not None:
+            self.worker.move(job_id, 0)
+
+    def cancel_selected_job(self):
+        job_id = self._selected_job_id()
+        if job_id is not None:
+            self.worker.cancel(job_id)
+
+    def _update_progress_visibility(self):
+        busy = self.worker.is_busy()
+        self.progress_bar.setVisible(busy)
+        self.cancel_button.setVisible(busy)
+
+    def on_job_started(self, job):
+        self.progress_bar.setRange(0, job.expected_steps)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat(f"#{job.job_id} %v/%m")
+        self.progress_bar.setVisible(True)
+        self.cancel_button.setVisible(True)
+
+    def on_job_progress(self, job_id, step, total):
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(step)
+
+    def on_job_finished(self, job_id, result, cached):
+        if cached:
+            print(f"Generation #{job_id} served from the result cache.")
+        self.on_generation_complete(result)
+
+    def update_pipeline_status(self):
+        load = self.image_generator.last_load
+        if load is None:
+            self.pipeline_status_label.setVisible(False)
+            return
+        cache = self.image_generator.pipeline_cache
+        self.pipeline_status_label.setText(
+            f"{load.describe()}\n"
+            f"Cache: {cache.hits} hit(s), {cache.misses} miss(es), "
+            f"{len(cache)} pipeline(s), {cache.memory_bytes() / (1 << 20):.0f} MB"
+        )
+        self.pipeline_status_label.setVisible(True)
 
     def toggle_output_editing(self, enabled: bool):
         main_window = getattr(self.app, "main_window", None)
@@ -532,32 +688,30 @@ class AIPanel(QWidget):
         if isinstance(result, Image.Image):
             self.generated_image = result
             self.image_generated.emit(self.generated_image)
+        elif isinstance(result, list) and result:
+            # One batch becomes one undo step of candidate layers.
+            self.generated_image = result[0]
+            self.images_generated.emit(result)
 
-        self.thread = None
-        self.progress_bar.setVisible(False)
-        self.cancel_button.setVisible(False)
+        self._update_progress_visibility()
         self.set_buttons_enabled(True)
         self.variations_button.setEnabled(True)
         self.preview_panel.update_preview()
 
 
     def cancel_generation(self):
-        if self.thread and self.thread.isRunning():
-            self.thread.cancel()
+        self.worker.cancel_running()
 
     def on_generation_failed(self, error_message):
-        self.progress_bar.setVisible(False)
-        self.cancel_button.setVisible(False)
+        # Cancelled jobs are reported through ``job_cancelled`` instead.
+        self._update_progress_visibility()
         self.set_buttons_enabled(True)
-        thread = self.thread
-        should_alert = thread is None or not getattr(thread, "is_cancelled", False)
-        self.thread = None
-        if should_alert and error_message:
+        if error_message:
             QMessageBox.critical(self, "Error", f"Image generation failed:\n{error_message}")
 
     def generate_variations(self):
         if self.generated_image:
-            self.start_generation(GenerationMode.IMAGE_TO_IMAGE)
+            self.start_generation(GenerationMode.IMAGE_TO_IMAGE, num_images=self.VARIATION_COUNT)
         else:
             QMessageBox.warning(self, "Warning", "No image to generate variations from.")
 
@@ -573,13 +727,13 @@ class AIPanel(QWidget):
 
     def closeEvent(self, event):
         """Clean up GPU memory when the panel is closed."""
+        self.worker.stop()
         self._cleanup_gpu_memory()
         super().closeEvent(event)
 
     @staticmethod
     def pil_to_pixmap(pil_image):
-        image_qt = ImageQt(pil_image)
-        return QPixmap.fromImage(image_qt)
+        return QPixmap.fromImage(pil_to_qimage(pil_image))
 
     def get_settings(self):
         negative_prompt = ""
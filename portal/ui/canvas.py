@@ -25,7 +25,8 @@ from portal.commands.selection_commands import (
     clone_selection_path,
     selection_paths_equal,
 )
-from PIL import Image, ImageQt
+from PIL import Image
+from portal.core.image_conversion import qimage_to_pil
 
 
 class Canvas(QWidget):
@@ -374,7 +375,7 @@ class Canvas(QWidget):
         painter.drawPath(self.selection_shape)
         painter.end()
 
-        return ImageQt.fromqimage(mask)
+        return qimage_to_pil(mask)
 
     def enterEvent(self, event):
         self.setFocus()
@@ -112,6 +112,14 @@ class LayerManagerWidget(QWidget):
             self.layer_list.blockSignals(False)
             self._updating_layers = False
 
+    def update_thumbnails(self, layers):
+        """Refresh the thumbnails of ``layers`` after a frame change."""
+        changed = {id(layer) for layer in layers}
+        for row in range(self.layer_list.count()):
+            widget = self.layer_list.itemWidget(self.layer_list.item(row))
+            if isinstance(widget, LayerItemWidget) and id(widget.layer) in changed:
+                widget.update_thumbnail()
+
     def on_selection_changed(self):
         """Handles changing the active layer."""
         if self._updating_layers:
@@ -4,6 +4,8 @@ from PySide6.QtWidgets import (
     QDialog,
     QDialogButtonBox,
     QLabel,
+    QProgressBar,
+    QPushButton,
     QRadioButton,
     QVBoxLayout,
 )
@@ -40,6 +42,14 @@ class RemoveBackgroundDialog(QDialog):
         layout.addWidget(self.all_keys_radio)
         layout.addWidget(self.this_key_radio)
 
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+        self.stop_button = QPushButton("Stop", self)
+        self.stop_button.setVisible(False)
+        self.stop_button.clicked.connect(self.stop)
+        layout.addWidget(self.stop_button)
+
         self.button_box = QDialogButtonBox(
             QDialogButtonBox.Ok | QDialogButtonBox.Cancel | QDialogButtonBox.Apply,
             parent=self,
@@ -51,6 +61,10 @@ class RemoveBackgroundDialog(QDialog):
             apply_button.clicked.connect(self.apply)
         layout.addWidget(self.button_box)
 
+        if app is not None and hasattr(app, "background_removal_progress"):
+            app.background_removal_progress.connect(self._on_progress)
+            app.background_removal_finished.connect(self._on_finished)
+
     def current_scope(self) -> BackgroundRemovalScope:
         if self.this_key_radio.isChecked():
             return BackgroundRemovalScope.THIS_KEY
@@ -61,6 +75,20 @@ class RemoveBackgroundDialog(QDialog):
         if self.app is not None:
             self.app.remove_background_from_layer(scope)
 
+    def stop(self):
+        if self.app is not None:
+            self.app.cancel_background_removal()
+
+    def _on_progress(self, done: int, total: int):
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+        self.progress_bar.setVisible(True)
+        self.stop_button.setVisible(True)
+
+    def _on_finished(self, applied: bool):
+        self.progress_bar.setVisible(False)
+        self.stop_button.setVisible(False)
+
     def _apply_and_close(self):
         self.apply()
         self.accept()
@@ -27,6 +27,12 @@ class SettingsDialog(QDialog):
 
     settings_applied = Signal()
 
+    AI_PREVIEW_MODE_LABELS = (
+        ("latent", "Fast approximation"),
+        ("decode", "Full decode"),
+        ("off", "Off"),
+    )
+
     GRID_COLOR_FALLBACKS = {
         "major": "#64000000",
         "minor": "#64808080",
@@ -276,6 +282,23 @@ class SettingsDialog(QDialog):
         )
         ai_layout.addWidget(self.negative_prompt_edit)
 
+        preview_layout = QGridLayout()
+        preview_layout.setColumnStretch(1, 1)
+        preview_layout.addWidget(QLabel("Step preview", ai_tab), 0, 0)
+        self.preview_mode_combo = QComboBox(ai_tab)
+        for mode, label in self.AI_PREVIEW_MODE_LABELS:
+            self.preview_mode_combo.addItem(label, mode)
+        self.preview_mode_combo.setToolTip(
+            "A full decode shows the exact image but roughly doubles generation time on CPU."
+        )
+        preview_layout.addWidget(self.preview_mode_combo, 0, 1)
+        preview_layout.addWidget(QLabel("Preview every", ai_tab), 1, 0)
+        self.preview_interval_spinbox = QSpinBox(ai_tab)
+        self.preview_interval_spinbox.setRange(1, 100)
+        self.preview_interval_spinbox.setSuffix(" step(s)")
+        preview_layout.addWidget(self.preview_interval_spinbox, 1, 1)
+        ai_layout.addLayout(preview_layout)
+
         self.ai_reset_button = QPushButton("Reset to Defaults", ai_tab)
         self.ai_reset_button.clicked.connect(self._reset_ai_tab)
         ai_layout.addWidget(
@@ -360,9 +383,19 @@ class SettingsDialog(QDialog):
         self.ruler_segments_spinbox.setValue(max(1, segments_value))
 
         ai_settings = self.settings_controller.get_ai_settings()
+        self._apply_ai_settings(ai_settings)
+
+    def _apply_ai_settings(self, ai_settings):
         self.negative_prompt_edit.setPlainText(
             str(ai_settings.get("negative_prompt", "") or "")
         )
+        index = self.preview_mode_combo.findData(ai_settings.get("preview_mode", "latent"))
+        self.preview_mode_combo.setCurrentIndex(max(0, index))
+        try:
+            interval = int(ai_settings.get("preview_interval", 1))
+        except (TypeError, ValueError):
+            interval = 1
+        self.preview_interval_spinbox.setValue(max(1, interval))
 
     def get_background_image_mode(self):
         data = self.background_mode_combo.currentData()
@@ -415,7 +448,9 @@ class SettingsDialog(QDialog):
             **self.get_animation_settings()
         )
         self.settings_controller.update_ai_settings(
-            negative_prompt=self.negative_prompt_edit.toPlainText()
+            negative_prompt=self.negative_prompt_edit.toPlainText(),
+            preview_mode=self.preview_mode_combo.currentData(),
+            preview_interval=self.preview_interval_spinbox.value(),
         )
 
     def _reset_grid_tab(self):
@@ -483,9 +518,7 @@ class SettingsDialog(QDialog):
 
     def _reset_ai_tab(self):
         defaults = self.settings_controller.get_default_ai_settings()
-        self.negative_prompt_edit.setPlainText(
-            str(defaults.get("negative_prompt", "") or "")
-        )
+        self._apply_ai_settings(defaults)
 
     def _choose_major_grid_color(self):
         self._choose_grid_color("major")
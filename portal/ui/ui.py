@@ -20,10 +20,6 @@ from PySide6.QtGui import (
 from PySide6.QtCore import Qt, Slot, QSignalBlocker, QSize
 from portal.ui.canvas import Canvas
 from portal.ui.layer_manager_widget import LayerManagerWidget
-try:
-    from portal.ui.ai_panel import AIPanel
-except Exception:  # Optional dependency may be missing or heavy to load
-    AIPanel = None
 from portal.ui.new_file_dialog import NewFileDialog
 from portal.ui.resize_dialog import ResizeDialog
 from portal.ui.background import Background
@@ -273,22 +269,21 @@ class MainWindow(QMainWindow):
         self.layer_manager_widget = LayerManagerWidget(self.app, self.canvas)
         self.layer_manager_widget.layer_changed.connect(self.canvas.update)
         self.layer_manager_widget.layer_changed.connect(self.sync_timeline_from_document)
+        self.app.frame_content_changed.connect(self.layer_manager_widget.update_thumbnails)
         self.layer_manager_dock = QDockWidget("Layers", self)
         self.layer_manager_dock.setWidget(self.layer_manager_widget)
         self.addDockWidget(Qt.RightDockWidgetArea, self.layer_manager_dock)
 
-        # AI Panel (optional)
+        # AI Panel (optional). The panel itself is built the first time its
+        # dock is shown, so startup never imports the AI stack.
         self.ai_panel = None
-        self.ai_panel_dock = None
-        if AIPanel is not None:
-            self.ai_panel = AIPanel(self.app, self.preview_panel)
-            self.ai_panel.image_generated.connect(self.app.add_new_layer_with_image)
-            self.ai_panel_dock = QDockWidget("AI", self)
-            self.ai_panel_dock.setWidget(self.ai_panel)
-            self.addDockWidget(Qt.RightDockWidgetArea, self.ai_panel_dock)
+        self.ai_panel_dock = QDockWidget("AI", self)
+        self.ai_panel_dock.setWidget(QWidget())
+        self.ai_panel_dock.visibilityChanged.connect(self._on_ai_dock_visibility_changed)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.ai_panel_dock)
 
-            self.tabifyDockWidget(self.layer_manager_dock, self.ai_panel_dock)
-            self.layer_manager_dock.raise_()
+        self.tabifyDockWidget(self.layer_manager_dock, self.ai_panel_dock)
+        self.layer_manager_dock.raise_()
 
         self.setCorner(Qt.BottomLeftCorner, Qt.BottomDockWidgetArea)
         self.setCorner(Qt.BottomRightCorner, Qt.RightDockWidgetArea)
@@ -735,13 +730,35 @@ class MainWindow(QMainWindow):
                 break
         return list(unique_colors)
 
+    def ensure_ai_panel(self):
+        """Build the AI panel on first use; ``None`` if it cannot be loaded."""
+
+        if self.ai_panel is None and self.ai_panel_dock is not None:
+            try:
+                from portal.ui.ai_panel import AIPanel
+            except Exception as e:  # Optional dependency may be missing or broken
+                print(f"AI panel unavailable: {e}")
+                return None
+            self.ai_panel = AIPanel(self.app, self.preview_panel)
+            self.ai_panel.image_generated.connect(self.app.add_new_layer_with_image)
+            self.ai_panel.images_generated.connect(self.app.add_new_layers_with_images)
+            self.ai_panel_dock.setWidget(self.ai_panel)
+        return self.ai_panel
+
+    @Slot(bool)
+    def _on_ai_dock_visibility_changed(self, visible):
+        if visible:
+            self.ensure_ai_panel()
+
     def toggle_ai_panel(self):
         if not self.ai_panel_dock:
             return
-        if self.ai_panel_dock.isVisible():
+        # A dock tabbed behind another one is "visible" but not on screen.
+        if self.ai_panel_dock.isVisible() and not self.ai_panel_dock.visibleRegion().isEmpty():
             self.ai_panel_dock.hide()
         else:
             self.ai_panel_dock.show()
+            self.ai_panel_dock.raise_()
 
     def open_new_file_dialog(self):
         dialog = NewFileDialog(self.app, self)
@@ -872,10 +889,11 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         if self.app.check_for_unsaved_changes():
-            ai_settings = self.ai_panel.get_settings()
-            if not self.app.config.has_section('AI'):
-                self.app.config.add_section('AI')
-            self.app.config.set('AI', 'last_prompt', ai_settings['prompt'])
+            if self.ai_panel is not None:
+                ai_settings = self.ai_panel.get_settings()
+                if not self.app.config.has_section('AI'):
+                    self.app.config.add_section('AI')
+                self.app.config.set('AI', 'last_prompt', ai_settings['prompt'])
             self.app.save_settings()
             event.accept()
         else:
@@ -0,0 +1,139 @@
+import gc
+import json
+import weakref
+
+import numpy as np
+import pytest
+from PIL import Image, ImageSequence
+from PySide6.QtCore import QSize
+from PySide6.QtGui import QColor
+
+from portal.core import animation_export
+from portal.core.animation_export import export_animation
+from portal.core.document import Document
+from portal.core.key import Key
+
+
+def _held_animation() -> Document:
+    """Frames 0-11 at 12 fps: red 0-2, green 3-5, blue 6-11 (two identical keys)."""
+
+    document = Document(16, 16)
+    layer = document.layer_manager.active_layer
+    layer.keys[0].image.fill(QColor(255, 0, 0, 255))
+    for frame, color in ((3, QColor(0, 255, 0, 128)), (6, QColor(0, 0, 255, 255)), (8, QColor(0, 0, 255, 255))):
+        key = Key(16, 16, frame_number=frame)
+        key.image.fill(color)
+        layer._register_key(key)
+        layer.keys.append(key)
+    document.set_playback_fps(12)
+    document.set_playback_loop_range(0, 11)
+    return document
+
+
+def _frames(path):
+    frames = []
+    with Image.open(path) as image:
+        for index in range(image.n_frames):
+            image.seek(index)
+            image.load()
+            frames.append((image.info.get("duration"), image.convert("RGBA").getpixel((0, 0))))
+    return frames
+
+
+@pytest.mark.usefixtures("qapp")
+@pytest.mark.parametrize("suffix", [".gif", ".png", ".webp"])
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_export_deduplicates_held_frames(tmp_path, suffix, max_workers):
+    document = _held_animation()
+    path = tmp_path / f"walk{suffix}"
+
+    result = export_animation(document, str(path), max_workers=max_workers)
+
+    assert result.rendered_frames == 4
+    assert result.frame_count == 3
+    assert result.durations == [250, 250, 500]
+    frames = _frames(path)
+    assert [duration for duration, _ in frames] == [250, 250, 500]
+    green = (0, 255, 0, 255) if suffix == ".gif" else (0, 255, 0, 128)
+    assert [pixel for _, pixel in frames] == [(255, 0, 0, 255), green, (0, 0, 255, 255)]
+
+
+@pytest.mark.usefixtures("qapp")
+def test_sprite_sheet_writes_frame_metadata(tmp_path):
+    document = _held_animation()
+    path = tmp_path / "walk.png"
+
+    result = export_animation(document, str(path), format=animation_export.FORMAT_SPRITE_SHEET)
+
+    with open(result.metadata_path, encoding="utf-8") as handle:
+        metadata = json.load(handle)
+    assert metadata["image"] == "walk.png"
+    assert [entry["source_frames"] for entry in metadata["frames"]] == [
+        [0, 1, 2],
+        [3, 4, 5],
+        list(range(6, 12)),
+    ]
+    with Image.open(path) as sheet:
+        assert sheet.size == (metadata["size"]["w"], metadata["size"]["h"])
+        for entry, expected in zip(metadata["frames"], [(255, 0, 0, 255), (0, 255, 0, 128), (0, 0, 255, 255)]):
+            assert sheet.getpixel((entry["x"], entry["y"])) == expected
+
+
+@pytest.mark.usefixtures("qapp")
+def test_gif_shares_one_palette_when_colors_exceed_the_limit(tmp_path, monkeypatch):
+    from PIL import GifImagePlugin
+
+    # Frames only switch to RGB when their palette differs from the first.
+    monkeypatch.setattr(
+        GifImagePlugin,
+        "LOADING_STRATEGY",
+        GifImagePlugin.LoadingStrategy.RGB_AFTER_DIFFERENT_PALETTE_ONLY,
+    )
+    document = Document(32, 32)
+    layer = document.layer_manager.active_layer
+    for frame in range(4):
+        key = layer.keys[0] if frame == 0 else Key(32, 32, frame_number=frame)
+        for y in range(32):
+            for x in range(32):
+                key.image.setPixelColor(x, y, QColor((x * 8 + frame) % 256, y * 8, frame * 60, 255))
+        if frame:
+            layer._register_key(key)
+            layer.keys.append(key)
+    document.set_playback_loop_range(0, 3)
+    path = tmp_path / "gradient.gif"
+
+    export_animation(document, str(path))
+
+    with Image.open(path) as image:
+        assert image.n_frames == 4
+        for frame in ImageSequence.Iterator(image):
+            assert frame.mode == "P"
+            assert frame.convert("RGBA").getpixel((31, 31))[3] == 255
+
+
+@pytest.mark.parametrize("writer", ["gif", "apng"])
+def test_writers_release_each_frame_once_written(tmp_path, writer):
+    palette = animation_export._Palette()
+    palette.add(np.array([0xFF0000], dtype=np.uint32), np.array([1]))
+    palette.build()
+    released = []
+
+    def frames():
+        for index in range(6):
+            frame = Image.new("P", (8, 8), 0)
+            frame.putpalette(palette.palette)
+            weakref.finalize(frame, released.append, index)
+            yield frame
+            # Only the last couple of frames may still be referenced.
+            gc.collect()
+            assert index - len(released) <= 2
+
+    path = str(tmp_path / f"held.{writer}")
+    if writer == "gif":
+        animation_export._write_gif(frames(), [100] * 6, QSize(8, 8), path, 0, palette)
+    else:
+        animation_export._write_apng(frames(), [100] * 6, path, 0)
+
+    with Image.open(path) as image:
+        assert image.n_frames == 6
+        assert image.info["duration"] == 100
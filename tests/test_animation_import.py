@@ -0,0 +1,109 @@
+import pytest
+from PIL import Image
+from PySide6.QtGui import QColor
+
+from portal.core import animation_export
+from portal.core.animation_export import export_animation
+from portal.core.animation_import import (
+    build_animation_layer,
+    read_animation_frames,
+    read_sprite_sheet_frames,
+)
+from portal.core.command import AddLayerCommand
+from portal.core.document import Document
+from portal.core.key import Key
+
+
+def _write_gif(path, colors, durations):
+    frames = [Image.new("RGBA", (8, 8), color) for color in colors]
+    frames[0].save(
+        path,
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=0,
+        disposal=2,
+        optimize=False,
+    )
+
+
+@pytest.mark.usefixtures("qapp")
+def test_gif_import_collapses_held_frames_into_keys(tmp_path):
+    path = tmp_path / "walk.gif"
+    red, green = (255, 0, 0, 255), (0, 255, 0, 255)
+    _write_gif(str(path), [red, red, green, green, red], [100, 100, 100, 100, 200])
+    document = Document(8, 8)
+
+    layer = build_animation_layer(
+        document.layer_manager,
+        read_animation_frames(str(path)),
+        name="walk",
+        start_frame=2,
+        fps=10,
+    )
+
+    assert [key.frame_number for key in layer.keys] == [2, 4, 6]
+    assert [key.image.pixelColor(0, 0).red() for key in layer.keys] == [255, 0, 255]
+    assert all(key.image.size().width() == 8 for key in layer.keys)
+
+
+@pytest.mark.usefixtures("qapp")
+def test_sprite_sheet_round_trips_through_its_metadata(tmp_path):
+    document = Document(16, 16)
+    layer = document.layer_manager.active_layer
+    layer.keys[0].image.fill(QColor(255, 0, 0, 255))
+    for frame, color in ((3, QColor(0, 255, 0, 128)), (7, QColor(0, 0, 255, 255))):
+        key = Key(16, 16, frame_number=frame)
+        key.image.fill(color)
+        layer._register_key(key)
+        layer.keys.append(key)
+    document.set_playback_loop_range(0, 9)
+    path = tmp_path / "walk.png"
+    export_animation(document, str(path), format=animation_export.FORMAT_SPRITE_SHEET)
+
+    imported = build_animation_layer(
+        document.layer_manager, read_sprite_sheet_frames(str(path)), name="walk", fps=12
+    )
+
+    assert [key.frame_number for key in imported.keys] == [0, 3, 7]
+    for source, loaded in zip(layer.keys, imported.keys):
+        assert loaded.image.pixelColor(4, 4) == source.image.pixelColor(4, 4)
+
+
+@pytest.mark.usefixtures("qapp")
+def test_sprite_sheet_grid_requires_a_size_and_slices_cells(tmp_path):
+    sheet = Image.new("RGBA", (24, 16), (0, 0, 0, 0))
+    for index in range(6):
+        cell = Image.new("RGBA", (8, 8), (index * 40, 0, 0, 255))
+        sheet.paste(cell, ((index % 3) * 8, (index // 3) * 8))
+    path = tmp_path / "grid.png"
+    sheet.save(path)
+
+    with pytest.raises(ValueError):
+        list(read_sprite_sheet_frames(str(path)))
+
+    frames = list(read_sprite_sheet_frames(str(path), columns=3, rows=2, frame_count=5))
+    assert [frame.image.pixelColor(0, 0).red() for frame in frames] == [0, 40, 80, 120, 160]
+
+
+@pytest.mark.usefixtures("qapp")
+def test_imported_layer_is_added_in_one_structure_change(tmp_path):
+    path = tmp_path / "many.gif"
+    colors = [(index * 8, 0, 0, 255) for index in range(30)]
+    _write_gif(str(path), colors, [100] * 30)
+    document = Document(8, 8)
+    manager = document.layer_manager
+    layer = build_animation_layer(manager, read_animation_frames(str(path)), name="many")
+    emitted = []
+    manager.layer_structure_changed.connect(lambda: emitted.append(True))
+
+    command = AddLayerCommand(document, layer=layer)
+    command.execute()
+
+    assert len(emitted) == 1
+    assert manager.active_layer is layer
+    assert [key.frame_number for key in layer.keys] == list(range(30))
+    command.undo()
+    assert layer not in manager.layers
+    command.execute()
+    assert manager.layers[-1] is layer
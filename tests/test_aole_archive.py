@@ -0,0 +1,397 @@
+import time
+
+import pytest
+from PySide6.QtGui import QColor, QImage, QPainter
+
+from portal.core.aole_archive import AOLEArchive
+from portal.core.document import Document
+from portal.core.key import Key
+
+
+def _build_animated_document(layer_count: int, key_count: int, size: int = 64) -> Document:
+    document = Document(size, size)
+    layer_manager = document.layer_manager
+    while len(layer_manager.layers) < layer_count:
+        layer_manager.add_layer(f"Layer {len(layer_manager.layers)}")
+
+    for layer_index, layer in enumerate(layer_manager.layers):
+        layer.keys[0].image.fill(QColor(layer_index * 7 % 256, 0, 0, 255))
+        for frame in range(1, key_count):
+            key = Key(size, size, frame_number=frame * 2)
+            key.image.fill(QColor(layer_index * 7 % 256, frame * 11 % 256, 64, 255))
+            key.image.setPixelColor(frame % size, layer_index % size, QColor(255, 255, 255, 255))
+            layer._register_key(key)
+            layer.keys.append(key)
+    return document
+
+
+def _assert_documents_match(expected: Document, actual: Document) -> None:
+    assert len(actual.layer_manager.layers) == len(expected.layer_manager.layers)
+    for source, loaded in zip(expected.layer_manager.layers, actual.layer_manager.layers):
+        assert loaded.name == source.name
+        assert [key.frame_number for key in loaded.keys] == [
+            key.frame_number for key in source.keys
+        ]
+        for source_key, loaded_key in zip(source.keys, loaded.keys):
+            assert loaded_key.image.convertToFormat(source_key.image.format()) == source_key.image
+
+
+@pytest.mark.usefixtures("qapp")
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_aole_roundtrip_many_keys(tmp_path, max_workers):
+    document = _build_animated_document(layer_count=3, key_count=5)
+    path = tmp_path / "animated.aole"
+
+    AOLEArchive.save(document, str(path), max_workers=max_workers)
+    loaded = AOLEArchive.load(Document, str(path), max_workers=max_workers)
+
+    _assert_documents_match(document, loaded)
+
+
+@pytest.mark.usefixtures("qapp")
+def test_aole_entries_are_written_in_deterministic_order(tmp_path):
+    import zipfile
+
+    document = _build_animated_document(layer_count=2, key_count=4)
+    first = tmp_path / "first.aole"
+    second = tmp_path / "second.aole"
+
+    AOLEArchive.save(document, str(first), max_workers=1)
+    AOLEArchive.save(document, str(second), max_workers=8)
+
+    with zipfile.ZipFile(first) as a, zipfile.ZipFile(second) as b:
+        assert a.namelist() == b.namelist()
+        for name in a.namelist():
+            assert a.read(name) == b.read(name)
+
+
+@pytest.mark.usefixtures("qapp")
+def test_aole_save_load_benchmark(tmp_path):
+    document = _build_animated_document(layer_count=10, key_count=20, size=128)
+    timings = {}
+    for max_workers in (1, None):
+        path = tmp_path / f"bench_{max_workers}.aole"
+        start = time.perf_counter()
+        AOLEArchive.save(document, str(path), max_workers=max_workers)
+        saved = time.perf_counter()
+        loaded = AOLEArchive.load(Document, str(path), max_workers=max_workers)
+        finished = time.perf_counter()
+        timings[max_workers] = (saved - start, finished - saved)
+        assert len(loaded.layer_manager.layers) == 10
+
+    # 200 keys at 128px take a few hundred milliseconds; the bounds only
+    # catch regressions such as a lost thread pool or per-key re-encoding.
+    for save_time, load_time in timings.values():
+        assert save_time < 5.0 and load_time < 5.0
+    sequential, parallel = timings[1], timings[None]
+    assert sum(parallel) < sum(sequential) * 2 + 0.5
+
+
+@pytest.mark.usefixtures("qapp")
+def test_incremental_save_reencodes_only_modified_keys(tmp_path, monkeypatch):
+    from portal.core import aole_archive
+
+    document = _build_animated_document(layer_count=2, key_count=3)
+    path = tmp_path / "incremental.aole"
+    document.save_aole(str(path))
+
+    encoded = []
+    original_encode = aole_archive.encode_png
+    monkeypatch.setattr(
+        aole_archive,
+        "encode_png",
+        lambda image: encoded.append(image) or original_encode(image),
+    )
+
+    document.save_aole(str(path))
+    assert encoded == []
+
+    edited_key = document.layer_manager.layers[1].keys[2]
+    edited_key.image.setPixelColor(0, 0, QColor(0, 255, 0, 255))
+    document.save_aole(str(path))
+    assert len(encoded) == 1
+
+    loaded = Document.load_aole(str(path))
+    _assert_documents_match(document, loaded)
+
+    encoded.clear()
+    loaded.save_aole(str(tmp_path / "resaved.aole"))
+    assert encoded == []
+    assert not list(tmp_path.glob(".*.tmp"))
+
+
+@pytest.mark.usefixtures("qapp")
+def test_lazy_load_decodes_only_current_frame_keys(tmp_path):
+    document = _build_animated_document(layer_count=3, key_count=4)
+    path = tmp_path / "lazy.aole"
+    document.save_aole(str(path))
+
+    loaded = Document.load_aole(str(path))
+    layer_manager = loaded.layer_manager
+    for layer in layer_manager.layers:
+        assert layer.keys[0].is_loaded
+        assert not any(key.is_loaded for key in layer.keys[1:])
+
+    _assert_documents_match(document, loaded)
+    assert all(key.is_loaded for layer in layer_manager.layers for key in layer.keys)
+
+    edited_key = layer_manager.layers[0].keys[2]
+    edited_key.image.setPixelColor(1, 1, QColor(0, 0, 255, 255))
+    released = layer_manager.evict_inactive_keys()
+    assert released == 3 * 3 - 1
+    assert edited_key.is_loaded
+    assert not layer_manager.layers[1].keys[1].is_loaded
+
+    resaved = tmp_path / "lazy_resaved.aole"
+    loaded.save_aole(str(resaved))
+    assert not layer_manager.layers[1].keys[1].is_loaded
+    _assert_documents_match(loaded, Document.load_aole(str(resaved)))
+
+
+@pytest.mark.usefixtures("qapp")
+def test_playback_evicts_inactive_keys_over_the_decoded_budget(tmp_path):
+    document = _build_animated_document(layer_count=3, key_count=4)
+    path = tmp_path / "playback.aole"
+    document.save_aole(str(path))
+
+    loaded = Document.load_aole(str(path))
+    layer_manager = loaded.layer_manager
+    key_bytes = layer_manager.layers[0].keys[0].image.sizeInBytes()
+    layer_manager.decoded_bytes_budget = 4 * key_bytes
+    edited_key = layer_manager.layers[0].keys[1]
+    edited_key.image.setPixelColor(1, 1, QColor(0, 0, 255, 255))
+
+    for frame in range(7):
+        layer_manager.set_current_frame(frame)
+        for layer in layer_manager.layers:
+            layer.active_key.image  # what the canvas would draw
+        # The budget is enforced before the new frame's keys are drawn.
+        assert layer_manager.decoded_bytes() <= (4 + 3) * key_bytes
+
+    assert edited_key.is_loaded
+    assert all(layer.active_key.is_loaded for layer in layer_manager.layers)
+    assert not any(layer.keys[0].is_loaded for layer in layer_manager.layers)
+    reloaded = layer_manager.layers[2].keys[0].image
+    assert reloaded.convertToFormat(QImage.Format_ARGB32) == document.layer_manager.layers[2].keys[0].image
+
+
+@pytest.mark.usefixtures("qapp")
+def test_identical_keys_are_stored_once_and_share_pixels(tmp_path):
+    import zipfile
+
+    document = Document(16, 16)
+    layer = document.layer_manager.active_layer
+    layer.keys[0].image.fill(QColor(10, 20, 30, 255))
+    for frame in (2, 4, 6):
+        held = layer.keys[0].clone(deep_copy=True)
+        held.frame_number = frame
+        layer._register_key(held)
+        layer.keys.append(held)
+
+    path = tmp_path / "held.aole"
+    document.save_aole(str(path))
+
+    with zipfile.ZipFile(path) as archive:
+        pngs = [name for name in archive.namelist() if name.startswith("layers/") and name.endswith(".png")]
+    assert len(pngs) == 1
+
+    loaded = AOLEArchive.load(Document, str(path))
+    keys = loaded.layer_manager.layers[0].keys
+    assert len({key.image.cacheKey() for key in keys}) == 1
+
+    lazy = Document.load_aole(str(path))
+    lazy_keys = lazy.layer_manager.layers[0].keys
+    assert len({id(key.encoded_image) for key in lazy_keys}) == 1
+    _assert_documents_match(document, lazy)
+
+
+def _paint(key, color):
+    painter = QPainter(key.image)
+    painter.fillRect(0, 0, 4, 4, color)
+    painter.end()
+
+
+@pytest.mark.usefixtures("qapp")
+def test_painting_a_deduplicated_key_leaves_its_twins_unchanged(tmp_path):
+    document = Document(16, 16)
+    document.layer_manager.add_layer("Second")
+    layer = document.layer_manager.layers[0]
+    held = layer.keys[0].clone(deep_copy=True)
+    held.frame_number = 3
+    layer._register_key(held)
+    layer.keys.append(held)
+    path = tmp_path / "twins.aole"
+    document.save_aole(str(path))
+
+    loaded = AOLEArchive.load(Document, str(path))
+    keys = loaded.layer_manager.layers[0].keys
+    _paint(keys[1], QColor(0, 0, 255, 255))
+    assert keys[1].image.pixelColor(0, 0) == QColor(0, 0, 255, 255)
+    assert keys[0].image.pixelColor(0, 0).alpha() == 0
+
+    # Two blank layers share one entry and are decoded together when opened.
+    lazy = Document.load_aole(str(path))
+    first, second = (layer.keys[0] for layer in lazy.layer_manager.layers)
+    _paint(first, QColor(255, 0, 0, 255))
+    assert first.image.pixelColor(0, 0) == QColor(255, 0, 0, 255)
+    assert second.image.pixelColor(0, 0).alpha() == 0
+
+
+@pytest.mark.usefixtures("qapp")
+def test_archives_with_positional_entry_names_still_load(tmp_path):
+    import json
+    import zipfile
+
+    from PySide6.QtCore import QBuffer
+
+    def _png(color):
+        image = Key(8, 8).image
+        image.fill(color)
+        buffer = QBuffer()
+        buffer.open(QBuffer.ReadWrite)
+        image.save(buffer, "PNG")
+        return bytes(buffer.data())
+
+    path = tmp_path / "legacy.aole"
+    metadata = {
+        "version": 3,
+        "width": 8,
+        "height": 8,
+        "active_layer_index": 0,
+        "layers": [
+            {
+                "uid": 1,
+                "name": "Layer",
+                "visible": True,
+                "opacity": 1.0,
+                "onion_skin_enabled": False,
+                "image": "layers/0_1.png",
+                "keys": [
+                    {"frame": 0, "image": "layers/0_1.png"},
+                    {"frame": 3, "image": "layers/0_1_key1.png"},
+                ],
+            }
+        ],
+    }
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("layers/0_1.png", _png(QColor(255, 0, 0, 255)))
+        archive.writestr("layers/0_1_key1.png", _png(QColor(255, 0, 0, 255)))
+        archive.writestr("document.json", json.dumps(metadata))
+
+    loaded = Document.load_aole(str(path))
+    resaved = tmp_path / "resaved.aole"
+    loaded.save_aole(str(resaved))
+
+    with zipfile.ZipFile(resaved) as archive:
+        pngs = [name for name in archive.namelist() if name.startswith("layers/") and name.endswith(".png")]
+    assert len(pngs) == 1
+    _assert_documents_match(loaded, Document.load_aole(str(resaved)))
+
+
+@pytest.mark.usefixtures("qapp")
+@pytest.mark.parametrize("compression_level", [0, 1, 9])
+def test_raw_key_format_roundtrip(tmp_path, compression_level):
+    import zipfile
+
+    document = _build_animated_document(layer_count=2, key_count=3, size=32)
+    sparse = document.layer_manager.layers[0].keys[1]
+    sparse.image.fill(QColor(0, 0, 0, 0))
+    sparse.image.setPixelColor(5, 7, QColor(12, 34, 56, 128))
+    sparse.image.setPixelColor(20, 9, QColor(255, 255, 255, 255))
+    document.layer_manager.layers[1].keys[2].image.fill(QColor(0, 0, 0, 0))
+
+    path = tmp_path / "fast.aole"
+    AOLEArchive.save(
+        document,
+        str(path),
+        key_format=AOLEArchive.KEY_FORMAT_RAW,
+        compression_level=compression_level,
+    )
+
+    with zipfile.ZipFile(path) as archive:
+        key_entries = [info for info in archive.infolist() if info.filename.startswith("layers/")]
+    assert key_entries
+    assert all(info.filename.endswith(".raw") for info in key_entries)
+    assert all(info.compress_type == zipfile.ZIP_STORED for info in key_entries)
+
+    for lazy in (False, True):
+        loaded = AOLEArchive.load(Document, str(path), lazy=lazy)
+        _assert_documents_match(document, loaded)
+
+
+@pytest.mark.usefixtures("qapp")
+def test_regular_save_converts_raw_entries_back_to_png(tmp_path):
+    import zipfile
+
+    document = _build_animated_document(layer_count=1, key_count=3, size=16)
+    fast_path = tmp_path / "fast.aole"
+    document.save_aole(str(fast_path), fast=True)
+
+    loaded = Document.load_aole(str(fast_path))
+    png_path = tmp_path / "regular.aole"
+    loaded.save_aole(str(png_path))
+
+    with zipfile.ZipFile(png_path) as archive:
+        names = [name for name in archive.namelist() if name.startswith("layers/")]
+    assert names and all(name.endswith(".png") for name in names)
+    _assert_documents_match(document, Document.load_aole(str(png_path)))
+
+
+@pytest.mark.usefixtures("qapp")
+def test_peek_reads_only_metadata_and_thumbnail(tmp_path, monkeypatch):
+    import zipfile
+
+    document = _build_animated_document(layer_count=2, key_count=3, size=300)
+    path = tmp_path / "peek.aole"
+    AOLEArchive.save(document, str(path))
+
+    opened = []
+    original_open = zipfile.ZipFile.open
+
+    def recording_open(self, name, *args, **kwargs):
+        opened.append(getattr(name, "filename", name))
+        return original_open(self, name, *args, **kwargs)
+
+    monkeypatch.setattr(zipfile.ZipFile, "open", recording_open)
+    summary = AOLEArchive.peek(str(path))
+
+    assert sorted(opened) == [AOLEArchive.METADATA_FILE, AOLEArchive.THUMBNAIL_FILE]
+    assert (summary.width, summary.height) == (300, 300)
+    assert summary.layer_count == 2
+    assert summary.key_count == 6
+    assert summary.frame_count == 5
+    assert summary.image_count == 6
+    assert summary.pixel_bytes == 6 * 300 * 300 * 4
+    assert 0 < summary.image_bytes < summary.file_size
+    assert summary.layer_names == [layer.name for layer in document.layer_manager.layers]
+    thumbnail = summary.thumbnail
+    assert (thumbnail.width(), thumbnail.height()) == (AOLEArchive.THUMBNAIL_SIZE, AOLEArchive.THUMBNAIL_SIZE)
+    expected = document.render().pixelColor(150, 150)
+    assert thumbnail.pixelColor(64, 64) == expected
+
+
+@pytest.mark.usefixtures("qapp")
+def test_peek_falls_back_for_archives_without_a_summary(tmp_path):
+    import json
+    import zipfile
+
+    document = _build_animated_document(layer_count=1, key_count=2)
+    path = tmp_path / "full.aole"
+    legacy = tmp_path / "legacy.aole"
+    AOLEArchive.save(document, str(path))
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(legacy, "w") as target:
+        for info in source.infolist():
+            if info.filename == AOLEArchive.THUMBNAIL_FILE:
+                continue
+            data = source.read(info)
+            if info.filename == AOLEArchive.METADATA_FILE:
+                metadata = json.loads(data)
+                expected = metadata.pop("summary")
+                data = json.dumps(metadata).encode("utf-8")
+            target.writestr(info, data)
+
+    summary = AOLEArchive.peek(str(legacy))
+
+    assert summary.thumbnail is None
+    assert (summary.key_count, summary.frame_count, summary.image_count) == (2, 3, 2)
+    assert summary.image_bytes == expected["image_bytes"]
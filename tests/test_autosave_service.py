@@ -0,0 +1,136 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+from PySide6.QtGui import QColor
+
+from portal.core.document import Document
+from portal.core.document_controller import DocumentController
+from portal.core.key import Key
+from portal.core.services.autosave_service import AutosaveService
+from portal.core.settings_controller import SettingsController
+
+
+def _make_app(document):
+    return SimpleNamespace(document=document, is_dirty=True, config=None)
+
+
+def _animated_document():
+    document = Document(16, 16)
+    layer = document.layer_manager.active_layer
+    layer.keys[0].image.fill(QColor(255, 0, 0, 255))
+    key = Key(16, 16, frame_number=4)
+    key.image.fill(QColor(0, 0, 255, 255))
+    layer._register_key(key)
+    layer.keys.append(key)
+    return document
+
+
+@pytest.mark.usefixtures("qapp")
+def test_autosave_writes_recovery_and_skips_unchanged_documents(tmp_path):
+    document = _animated_document()
+    document.file_path = str(tmp_path / "artwork.aole")
+    service = AutosaveService(_make_app(document), recovery_dir=str(tmp_path / "recovery"))
+    finished = []
+    service.autosave_finished.connect(finished.append)
+
+    assert service.autosave_now()
+    service.wait_for_idle()
+    assert finished == [service.recovery_path]
+    assert service.has_recovery()
+
+    assert not service.autosave_now()
+
+    document.layer_manager.active_layer.keys[1].image.setPixelColor(0, 0, QColor(0, 255, 0, 255))
+    assert service.autosave_now()
+    service.wait_for_idle()
+
+    recovered = service.load_recovery()
+    assert recovered.file_path == document.file_path
+    recovered_keys = recovered.layer_manager.layers[0].keys
+    assert [key.frame_number for key in recovered_keys] == [0, 4]
+    assert recovered_keys[1].image.pixelColor(0, 0) == QColor(0, 255, 0, 255)
+
+    service.shutdown()
+    assert not service.has_recovery()
+
+
+@pytest.mark.usefixtures("qapp")
+def test_autosave_skips_clean_documents(tmp_path):
+    app = _make_app(_animated_document())
+    app.is_dirty = False
+    service = AutosaveService(app, recovery_dir=str(tmp_path))
+
+    assert not service.autosave_now()
+    assert not service.has_recovery()
+    service.shutdown()
+
+
+@pytest.mark.usefixtures("qapp")
+def test_saving_discards_the_recovery_copy(tmp_path):
+    controller = DocumentController(SettingsController())
+    controller.attach_document(_animated_document())
+    controller.is_dirty = True
+    service = AutosaveService(controller, recovery_dir=str(tmp_path))
+
+    assert service.autosave_now()
+    service.wait_for_idle()
+    assert service.has_recovery()
+
+    controller.is_dirty = False
+    assert not service.has_recovery()
+
+    # A copy still being written when the document is saved is dropped too.
+    controller.is_dirty = True
+    controller.document.layer_manager.layers[0].keys[0].image.fill(QColor(0, 255, 0, 255))
+    assert service.autosave_now()
+    controller.is_dirty = False
+    service.wait_for_idle()
+    assert not service.has_recovery()
+    service.shutdown()
+
+
+@pytest.mark.usefixtures("qapp")
+def test_snapshot_is_isolated_from_later_edits():
+    document = _animated_document()
+    snapshot = document.snapshot()
+    live_key = document.layer_manager.layers[0].keys[0]
+    snapshot_key = snapshot.layer_manager.layers[0].keys[0]
+    assert snapshot_key.image.cacheKey() == live_key.image.cacheKey()
+
+    live_key.image.setPixelColor(1, 1, QColor(0, 0, 0, 0))
+    assert snapshot_key.image.pixelColor(1, 1) == QColor(255, 0, 0, 255)
+
+
+@pytest.mark.usefixtures("qapp")
+def test_instances_keep_separate_recovery_copies(tmp_path):
+    first = AutosaveService(_make_app(_animated_document()), recovery_dir=str(tmp_path))
+    second = AutosaveService(_make_app(_animated_document()), recovery_dir=str(tmp_path))
+    assert first.recovery_path != second.recovery_path
+
+    for service in (first, second):
+        assert service.autosave_now()
+        service.wait_for_idle()
+    # Running sessions are not offered for recovery, even by each other.
+    assert first.recovery_candidates() == [] and second.recovery_candidates() == []
+
+    first.app.is_dirty = False
+    first.autosave_now()
+    assert not first.has_recovery() and second.has_recovery()
+
+    # A session that stops without shutting down leaves a candidate behind.
+    crashed_path = second.recovery_path
+    second.stop()
+    second._executor.shutdown(wait=True)
+    second._lock.unlock()
+    third = AutosaveService(_make_app(None), recovery_dir=str(tmp_path))
+    assert first.recovery_candidates() == [crashed_path]
+    assert third.recovery_candidates() == [crashed_path]
+    recovered = third.load_recovery(crashed_path)
+    assert [key.frame_number for key in recovered.layer_manager.layers[0].keys] == [0, 4]
+
+    third.discard_recovery(crashed_path)
+    assert third.recovery_candidates() == []
+    for service in (first, third):
+        service.shutdown()
+    assert sorted(os.listdir(tmp_path)) == []
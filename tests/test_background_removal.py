@@ -0,0 +1,145 @@
+import threading
+
+import pytest
+from PySide6.QtGui import QColor, QImage
+
+from portal.core.document_controller import BackgroundRemovalScope, DocumentController
+from portal.core.key import Key
+from portal.core.services import background_removal_service
+from portal.core.services.background_removal_service import BackgroundRemovalService
+from portal.core.settings_controller import SettingsController
+
+
+class FakeRemover:
+    """Turns every pixel transparent and records the images it was given."""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, image):
+        with self.lock:
+            self.calls.append(image.pixelColor(0, 0).red())
+        self.release.wait(5)
+        result = QImage(image)
+        result.fill(QColor(0, 0, 0, 0))
+        return result
+
+
+def _controller_with_keys(colors):
+    controller = DocumentController(SettingsController())
+    controller.new_document(8, 8)
+    layer = controller.document.layer_manager.active_layer
+    layer.keys[0].image.fill(QColor(colors[0], 0, 0, 255))
+    for frame, red in enumerate(colors[1:], start=1):
+        key = Key(8, 8, frame_number=frame)
+        key.image.fill(QColor(red, 0, 0, 255))
+        layer._register_key(key)
+        layer.keys.append(key)
+    return controller, layer
+
+
+@pytest.mark.usefixtures("qapp")
+def test_all_keys_are_processed_once_per_unique_image_and_undo_together(qtbot, monkeypatch):
+    controller, layer = _controller_with_keys([10, 20, 10, 20, 30])
+    remover = FakeRemover()
+    monkeypatch.setattr(controller.background_removal, "_remover", remover)
+    progress = []
+    controller.background_removal_progress.connect(lambda done, total: progress.append((done, total)))
+
+    with qtbot.waitSignal(controller.background_removal_finished, timeout=5000) as blocker:
+        assert controller.remove_background_from_layer(BackgroundRemovalScope.ALL_KEYS)
+    assert blocker.args == [True]
+
+    assert sorted(remover.calls) == [10, 20, 30]
+    # Progress counts the five distinct key images; equal pixels are removed once.
+    assert progress[0] == (0, 5) and progress[-1] == (5, 5)
+    assert all(key.image.pixelColor(0, 0).alpha() == 0 for key in layer.keys)
+
+    controller.undo()
+    assert [key.image.pixelColor(0, 0).red() for key in layer.keys] == [10, 20, 10, 20, 30]
+    controller.redo()
+    assert all(key.image.pixelColor(0, 0).alpha() == 0 for key in layer.keys)
+
+    # Unchanged keys are served from the results of the previous run.
+    controller.undo()
+    with qtbot.waitSignal(controller.background_removal_finished, timeout=5000):
+        controller.remove_background_from_layer(BackgroundRemovalScope.THIS_KEY)
+    assert len(remover.calls) == 3
+    assert layer.keys[0].image.pixelColor(0, 0).alpha() == 0
+    assert layer.keys[1].image.pixelColor(0, 0).alpha() == 255
+
+
+@pytest.mark.usefixtures("qapp")
+def test_cancelled_removal_leaves_the_layer_untouched(qtbot):
+    remover = FakeRemover()
+    remover.release.clear()
+    service = BackgroundRemovalService(remover, max_workers=1)
+    keys = [Key(4, 4, frame_number=frame) for frame in range(3)]
+    for red, key in enumerate(keys):
+        key.image.fill(QColor(red, 0, 0, 255))
+    finished = []
+    service.finished.connect(finished.append)
+
+    try:
+        assert service.start(keys)
+        assert not service.start(keys)
+        qtbot.waitUntil(lambda: len(remover.calls) == 1, timeout=5000)
+        with qtbot.waitSignal(service.cancelled, timeout=5000):
+            service.cancel()
+        remover.release.set()
+    finally:
+        service.shutdown()
+
+    qtbot.wait(50)
+    assert finished == [] and not service.is_running
+    assert len(remover.calls) == 1
+
+
+@pytest.mark.usefixtures("qapp")
+def test_fast_removals_are_delivered_once_every_key_is_done(qtbot, monkeypatch):
+    hashed_on = []
+    content_hash = background_removal_service.image_content_hash
+    monkeypatch.setattr(
+        background_removal_service,
+        "image_content_hash",
+        lambda image: hashed_on.append(threading.current_thread()) or content_hash(image),
+    )
+    service = BackgroundRemovalService(lambda image: QImage(image), max_workers=4)
+    keys = [Key(4, 4, frame_number=frame) for frame in range(50)]
+    for red, key in enumerate(keys):
+        key.image.fill(QColor(red, 0, 0, 255))
+    finished = []
+    service.finished.connect(finished.append)
+
+    try:
+        with qtbot.waitSignal(service.finished, timeout=5000):
+            assert service.start(keys)
+    finally:
+        service.shutdown()
+
+    qtbot.wait(10)
+    assert len(finished) == 1 and set(finished[0]) == set(keys)
+    # Pixels are hashed by the workers, never on the UI thread.
+    assert len(hashed_on) == 50 and threading.main_thread() not in hashed_on
+
+
+@pytest.mark.usefixtures("qapp")
+def test_keys_edited_during_removal_keep_the_edit(qtbot, monkeypatch):
+    controller, layer = _controller_with_keys([10, 20, 30])
+    remover = FakeRemover()
+    remover.release.clear()
+    monkeypatch.setattr(controller.background_removal, "_remover", remover)
+
+    assert controller.remove_background_from_layer(BackgroundRemovalScope.ALL_KEYS)
+    qtbot.waitUntil(lambda: len(remover.calls) >= 1, timeout=5000)
+    layer.keys[1].image.fill(QColor(99, 0, 0, 255))
+    with qtbot.waitSignal(controller.background_removal_finished, timeout=5000):
+        remover.release.set()
+
+    assert [key.image.pixelColor(0, 0).alpha() for key in layer.keys] == [0, 255, 0]
+    assert layer.keys[1].image.pixelColor(0, 0).red() == 99
+    controller.undo()
+    assert [key.image.pixelColor(0, 0).red() for key in layer.keys] == [10, 99, 30]
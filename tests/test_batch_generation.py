@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from portal.ai.image_generator import ImageGenerator
+from portal.core.document_controller import DocumentController
+from portal.core.settings_controller import SettingsController
+
+
+class FakePipeline:
+    def __init__(self):
+        self.encoded = []
+        self.calls = []
+
+    def encode_prompt(self, prompt, device, num_images_per_prompt, do_classifier_free_guidance, negative_prompt=None, clip_skip=None):
+        self.encoded.append((prompt, negative_prompt, clip_skip))
+        return f"embeds:{prompt}", f"negative:{negative_prompt}"
+
+    def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        colors = [(index * 40, 0, 0) for index in range(kwargs["num_images_per_prompt"])]
+        return SimpleNamespace(images=[Image.new("RGB", (kwargs["width"], kwargs["height"]), color) for color in colors])
+
+
+def test_batch_shares_one_call_and_cached_prompt_embeddings(tmp_path):
+    generator = ImageGenerator()
+    generator.pipe = FakePipeline()
+    generator.current_model = "SD1.5"
+    options = dict(original_size=(16, 8), generation_size=(64, 32), output_dir=str(tmp_path))
+
+    images = generator.prompt_to_image("knight", negative_prompt="blurry", num_images_per_prompt=4, **options)
+    single = generator.prompt_to_image("knight", negative_prompt="blurry", **options)
+
+    assert [image.size for image in images] == [(16, 8)] * 4
+    assert images[3].getpixel((0, 0)) == (120, 0, 0)
+    assert isinstance(single, Image.Image)
+    assert generator.pipe.encoded == [("knight", "blurry", 2)]
+    first_call = generator.pipe.calls[0]
+    assert first_call["num_images_per_prompt"] == 4
+    assert first_call["prompt_embeds"] == "embeds:knight"
+    assert "prompt" not in first_call and "negative_prompt" not in first_call
+    generator.output_writer.flush()
+    assert len(list(tmp_path.glob("*.png"))) == 5
+
+    generator.prompt_to_image("archer", **options)
+    assert generator.pipe.encoded[-1] == ("archer", None, 2)
+
+
+@pytest.mark.usefixtures("qapp")
+def test_candidates_are_added_as_one_undo_step():
+    controller = DocumentController(SettingsController())
+    controller.new_document(8, 8)
+    manager = controller.document.layer_manager
+    before = [layer.name for layer in manager.layers]
+
+    candidates = [Image.new("RGBA", (8, 8), (255, 0, 0, 255)) for _ in range(3)]
+    controller.add_new_layers_with_images(candidates)
+
+    assert [layer.name for layer in manager.layers] == before + [f"AI Candidate {i}" for i in (1, 2, 3)]
+    assert manager.layers[-1].image.pixelColor(4, 4).red() == 255
+    controller.undo()
+    assert [layer.name for layer in manager.layers] == before
+    controller.redo()
+    assert len(manager.layers) == len(before) + 3
@@ -0,0 +1,103 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from PIL import Image
+from PySide6.QtGui import QColor
+
+from portal import cli
+from portal.core.document import Document
+from portal.core.key import Key
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _save_animation(path) -> None:
+    document = Document(4, 4)
+    manager = document.layer_manager
+    base = manager.active_layer
+    base.name = "Base"
+    base.keys[0].image.fill(QColor(255, 0, 0, 255))
+    key = Key(4, 4, frame_number=2)
+    key.image.fill(QColor(0, 0, 255, 255))
+    base._register_key(key)
+    base.keys.append(key)
+    manager.add_layer("Overlay")
+    manager.active_layer.keys[0].image.setPixelColor(0, 0, QColor(0, 255, 0, 255))
+    document.set_playback_loop_range(0, 3)
+    document.save_aole(str(path))
+
+
+def test_cli_imports_no_ui_or_ai_modules():
+    code = (
+        "import sys, portal.cli\n"
+        "bad = [m for m in sys.modules if m.startswith(('portal.ui', 'portal.ai', 'torch', 'diffusers',"
+        " 'rembg', 'PySide6.QtWidgets'))]\n"
+        "print(bad)\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == "[]"
+
+
+def test_parse_frames():
+    document = Document(4, 4)
+    document.set_playback_loop_range(2, 4)
+    assert cli.parse_frames("0-2,5,1", document) == [0, 1, 2, 5]
+    assert cli.parse_frames("loop", document) == [2, 3, 4]
+    assert cli.parse_frames(None, document) == [0]
+    with pytest.raises(ValueError):
+        cli.parse_frames("3-1", document)
+
+
+@pytest.mark.usefixtures("qapp")
+def test_renders_selected_frames_and_layers_scaled(tmp_path, capsys):
+    _save_animation(tmp_path / "walk.aole")
+    out = tmp_path / "out"
+
+    status = cli.main(
+        [str(tmp_path), "-o", str(out), "--frames", "1-2", "--layers", "Base", "--scale", "2", "-j", "1"]
+    )
+
+    assert status == 0
+    assert sorted(os.listdir(out)) == ["walk_0001.png", "walk_0002.png"]
+    with Image.open(out / "walk_0001.png") as image:
+        assert image.size == (8, 8)
+        assert image.convert("RGBA").getpixel((7, 7)) == (255, 0, 0, 255)
+    with Image.open(out / "walk_0002.png") as image:
+        assert image.convert("RGBA").getpixel((0, 0)) == (0, 0, 255, 255)
+    assert "Converted 1 of 1 document(s) into 2 file(s)" in capsys.readouterr().err
+
+
+@pytest.mark.usefixtures("qapp")
+def test_batch_reports_failures_and_exports_sprite_sheets(tmp_path, capsys):
+    _save_animation(tmp_path / "a.aole")
+    _save_animation(tmp_path / "b.aole")
+    missing = tmp_path / "missing.aole"
+
+    status = cli.main(
+        [str(tmp_path / "a.aole"), str(tmp_path / "b.aole"), str(missing), "-f", "sprite_sheet", "--scale", "3", "-j", "2"]
+    )
+
+    assert status == 1
+    for stem in ("a", "b"):
+        with open(tmp_path / f"{stem}.json", encoding="utf-8") as handle:
+            metadata = json.load(handle)
+        assert metadata["frame_size"] == {"w": 12, "h": 12}
+        assert [entry["source_frames"] for entry in metadata["frames"]] == [[0, 1], [2, 3]]
+    report = capsys.readouterr().err
+    assert "FAILED" in report and str(missing) in report
+    assert "Converted 2 of 3 document(s)" in report
+
+
+@pytest.mark.usefixtures("qapp")
+def test_info_prints_archive_summaries(tmp_path, capsys):
+    _save_animation(tmp_path / "walk.aole")
+
+    assert cli.main([str(tmp_path / "walk.aole"), "--info"]) == 0
+
+    assert "4x4, 2 layer(s), 3 key(s), 3 frame(s)" in capsys.readouterr().out
+    assert not (tmp_path / "walk.png").exists()
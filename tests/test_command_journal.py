@@ -0,0 +1,125 @@
+import json
+
+import pytest
+from PySide6.QtCore import QPoint, QRect
+from PySide6.QtGui import QColor, QPainterPath
+
+from portal.core.command import DrawCommand, FillCommand, ModifyImageCommand, ShapeCommand
+from portal.core import command_journal
+from portal.core.command_journal import CommandJournal, journal_path_for
+from portal.core.document_controller import DocumentController
+from portal.core.settings_controller import SettingsController
+
+
+def _records(journal):
+    with open(journal.path, encoding="utf-8") as handle:
+        lines = handle.read().splitlines()
+    return json.loads(lines[0]), [json.loads(line) for line in lines[1:]]
+
+
+def _assert_pixels_match(expected, actual):
+    assert [layer.uid for layer in actual.layer_manager.layers] == [
+        layer.uid for layer in expected.layer_manager.layers
+    ]
+    for source, loaded in zip(expected.layer_manager.layers, actual.layer_manager.layers):
+        assert loaded.name == source.name
+        assert [key.frame_number for key in loaded.keys] == [key.frame_number for key in source.keys]
+        for source_key, loaded_key in zip(source.keys, loaded.keys):
+            assert loaded_key.image.convertToFormat(source_key.image.format()) == source_key.image
+
+
+@pytest.fixture
+def journaled(qapp, tmp_path):
+    controller = DocumentController(SettingsController())
+    controller.new_document(32, 32)
+    path = tmp_path / "art.aole"
+    controller.document.save_aole(str(path))
+    controller.is_dirty = False
+    journal = CommandJournal(str(tmp_path / "recovery"), fsync=False)
+    controller.set_command_journal(journal)
+    return controller, journal
+
+
+def test_stroke_tools_are_journaled_as_parameters(journaled, monkeypatch):
+    controller, journal = journaled
+    document = controller.document
+    layer = document.layer_manager.active_layer
+    # Strokes neither copy the document's keys nor diff their pixels.
+    monkeypatch.setattr(command_journal, "_capture_keys", None)
+    monkeypatch.setattr(command_journal, "_dirty_rect", None)
+    selection = QPainterPath()
+    selection.addRect(0, 0, 20, 32)
+
+    controller.execute_command(
+        DrawCommand(layer, [QPoint(1, 1), QPoint(30, 12)], QColor(255, 0, 0), 3, "Circular", document, selection)
+    )
+    controller.execute_command(FillCommand(document, layer, QPoint(25, 25), QColor(0, 0, 255), None, False, False))
+    controller.execute_command(
+        ShapeCommand(layer, QRect(4, 4, 10, 8), "ellipse", QColor(0, 255, 0), 1, document, None, mirror_x=True)
+    )
+
+    header, records = _records(journal)
+    assert header["base"].endswith("art.aole")
+    assert journal.path == journal_path_for(document.file_path, journal.fallback_dir)
+    assert [record["op"] for record in records] == ["draw", "fill", "shape"]
+    assert all(len(json.dumps(record)) < 1024 for record in records)
+
+    recovered = CommandJournal.recover(journal.path)
+    assert recovered.file_path == document.file_path
+    _assert_pixels_match(document, recovered)
+
+
+def test_opaque_commands_and_undo_store_dirty_rects(journaled):
+    controller, journal = journaled
+    document = controller.document
+    layer = document.layer_manager.active_layer
+
+    def paint(image):
+        image.setPixelColor(3, 5, QColor(10, 20, 30, 255))
+        image.setPixelColor(7, 6, QColor(40, 50, 60, 128))
+
+    controller.execute_command(ModifyImageCommand(layer, paint))
+    controller.execute_command(
+        DrawCommand(layer, [QPoint(10, 10), QPoint(20, 20)], QColor(255, 0, 0), 2, "Square", document, None)
+    )
+    controller.undo()
+
+    _, records = _records(journal)
+    assert [record["op"] for record in records] == ["pixels", "draw", "pixels"]
+    assert records[0]["keys"][0]["rect"] == [3, 5, 5, 2]
+
+    _assert_pixels_match(document, CommandJournal.recover(journal.path))
+
+
+def test_structural_commands_checkpoint_and_torn_records_are_ignored(journaled):
+    controller, journal = journaled
+    document = controller.document
+    layer = document.layer_manager.active_layer
+
+    controller.add_keyframe(5)
+    header, records = _records(journal)
+    assert header["base"] == journal.checkpoint_path
+    assert records == []
+
+    document.layer_manager.set_current_frame(5)
+    controller.execute_command(
+        DrawCommand(layer, [QPoint(2, 2)], QColor(0, 0, 0), 4, "Circular", document, None)
+    )
+    expected = CommandJournal.recover(journal.path)
+    _assert_pixels_match(document, expected)
+
+    with open(journal.path, "a", encoding="utf-8") as handle:
+        handle.write('{"op": "draw", "layer"')
+    _assert_pixels_match(document, CommandJournal.recover(journal.path))
+
+
+def test_saving_rebases_the_journal(journaled):
+    controller, journal = journaled
+    document = controller.document
+    layer = document.layer_manager.active_layer
+    controller.execute_command(FillCommand(document, layer, QPoint(0, 0), QColor(9, 9, 9), None, False, False))
+    assert CommandJournal.has_recovery(journal.path)
+
+    document.save_aole(document.file_path)
+    controller.is_dirty = False
+    assert not CommandJournal.has_recovery(journal.path)
@@ -0,0 +1,140 @@
+import threading
+from dataclasses import replace
+
+import pytest
+from PIL import Image
+
+from portal.ai.backends import StubBackend
+from portal.ai.enums import GenerationMode
+from portal.ai.generation_queue import MAX_SEED, GenerationJob, JobQueue, ResultCache
+from portal.ai.image_generator import ImageGenerator
+from portal.ui.ai_panel import GenerationWorker
+
+
+def _job(prompt="knight", **overrides):
+    options = dict(
+        mode=GenerationMode.PROMPT_TO_IMAGE,
+        prompt=prompt,
+        model_name="SD1.5",
+        original_size=(8, 8),
+        num_inference_steps=3,
+    )
+    options.update(overrides)
+    return GenerationJob(**options)
+
+
+def test_queue_orders_by_priority_and_can_be_reordered():
+    queue = JobQueue()
+    low, normal, urgent, later = _job("low", priority=-1), _job("a"), _job("urgent", priority=5), _job("b")
+    for job in (low, normal, urgent, later):
+        queue.put(job)
+    assert [job.prompt for job in queue.pending()] == ["urgent", "a", "b", "low"]
+
+    assert queue.move(low.job_id, 0)
+    assert queue.set_priority(later.job_id, 10)
+    assert [job.prompt for job in queue.pending()] == ["b", "low", "urgent", "a"]
+
+    assert queue.take() is later
+    assert queue.cancel(later.job_id) and later.cancelled
+    assert queue.cancel(normal.job_id) and normal not in queue.pending()
+    queue.close()
+    assert queue.take() is None and low.cancelled
+
+
+def test_queued_jobs_without_a_seed_get_a_random_one():
+    queue = JobQueue()
+    random_job, seeded = _job(), _job(seed=5)
+    assert not random_job.cacheable
+    queue.put(random_job)
+    queue.put(seeded)
+    queue.close()
+
+    assert 0 <= random_job.seed <= MAX_SEED and random_job.cacheable
+    assert f"seed {random_job.seed}" in random_job.describe()
+    assert seeded.seed == 5
+    # Resubmitting the drawn seed reproduces the job, so it shares its cache key.
+    assert _job(seed=random_job.seed).cache_key() == random_job.cache_key()
+
+
+def test_cache_key_covers_parameters_and_input_pixels(tmp_path):
+    image = Image.new("RGBA", (4, 4), (1, 2, 3, 255))
+    job = _job(mode=GenerationMode.IMAGE_TO_IMAGE, image=image, seed=7, strength=0.5)
+    assert job.cache_key() == _job(mode=GenerationMode.IMAGE_TO_IMAGE, image=image.copy(), seed=7, strength=0.5).cache_key()
+    changed = image.copy()
+    changed.putpixel((0, 0), (0, 0, 0, 255))
+    assert job.cache_key() != _job(mode=GenerationMode.IMAGE_TO_IMAGE, image=changed, seed=7, strength=0.5).cache_key()
+    assert job.cache_key() != _job(mode=GenerationMode.IMAGE_TO_IMAGE, image=image, seed=8, strength=0.5).cache_key()
+
+    # Configuration that changes the images is part of the key as well.
+    settings = ImageGenerator(backend=StubBackend()).result_settings()
+    assert job.cache_key(settings=settings) == job.cache_key(settings=ImageGenerator().result_settings())
+    pixel_art = ImageGenerator(backend=StubBackend())
+    pixel_art.pixel_art = replace(pixel_art.pixel_art, colors=8)
+    margin = ImageGenerator(backend=StubBackend())
+    margin.defaults["inpaint_context_margin"] = 8
+    for generator in (pixel_art, margin):
+        assert job.cache_key(settings=settings) != job.cache_key(settings=generator.result_settings())
+
+    cache = ResultCache(str(tmp_path), max_entries=1)
+    cache.put("a", [image])
+    cache.put("b", [image, image])
+    assert cache.get("a") is None
+    assert [result.getpixel((0, 0)) for result in cache.get("b")] == [(1, 2, 3, 255)] * 2
+
+
+class FakeGenerator:
+    def __init__(self):
+        self.model_configs = {"SD1.5": {"path": "model.safetensors"}}
+        self.last_load = None
+        self.runs = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def load_pipeline(self, model_name, is_img2img=False, is_inpaint=False):
+        self.last_load = (model_name, is_img2img, is_inpaint)
+
+    def result_settings(self):
+        return {}
+
+    def prompt_to_image(self, prompt, *, cancellation_token, progress_callback, num_inference_steps, **kwargs):
+        self.runs.append(prompt)
+        for step in range(num_inference_steps):
+            self.release.wait(5)
+            if cancellation_token():
+                break
+            progress_callback(step + 1)
+        return Image.new("RGB", kwargs.get("generation_size") or (8, 8), (len(self.runs), 0, 0))
+
+
+@pytest.mark.usefixtures("qapp")
+def test_worker_reports_progress_cancels_and_serves_cached_results(qtbot, tmp_path):
+    generator = FakeGenerator()
+    worker = GenerationWorker(generator, ResultCache(str(tmp_path)))
+    progress, finished, cancelled = [], [], []
+    worker.job_progress.connect(lambda job_id, step, total: progress.append((job_id, step, total)))
+    worker.job_finished.connect(lambda job_id, result, cached: finished.append((job_id, result, cached)))
+    worker.job_cancelled.connect(cancelled.append)
+
+    try:
+        first = _job(seed=1)
+        with qtbot.waitSignal(worker.job_finished, timeout=5000):
+            worker.submit(first)
+        assert [entry[1:] for entry in progress] == [(1, 3), (2, 3), (3, 3)]
+
+        generator.release.clear()
+        slow = _job("slow")
+        with qtbot.waitSignal(worker.job_started, timeout=5000):
+            worker.submit(slow)
+        repeat = _job(seed=1)
+        worker.submit(repeat)
+        assert worker.cancel(slow.job_id)
+        generator.release.set()
+        qtbot.waitUntil(lambda: len(finished) == 2, timeout=5000)
+    finally:
+        worker.stop()
+
+    assert cancelled == [slow.job_id]
+    assert generator.runs == ["knight", "slow"]
+    job_id, result, cached = finished[1]
+    assert (job_id, cached) == (repeat.job_id, True)
+    assert result.getpixel((0, 0)) == finished[0][1].getpixel((0, 0))
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from PIL import Image
+from PySide6.QtGui import QColor, QImage
+
+from portal.core.document import Document
+from portal.core.image_conversion import (
+    numpy_to_pil,
+    numpy_to_qimage,
+    pil_to_numpy,
+    pil_to_qimage,
+    qimage_to_numpy,
+    qimage_to_pil,
+    qimage_view,
+)
+
+
+def _random_rgba(width=7, height=5, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(height, width, 4), dtype=np.uint8)
+
+
+@pytest.mark.usefixtures("qapp")
+def test_round_trips_preserve_straight_rgba():
+    pixels = _random_rgba()
+
+    image = numpy_to_qimage(pixels)
+    assert image.format() == QImage.Format_ARGB32
+    color = image.pixelColor(3, 2)
+    assert (color.red(), color.green(), color.blue(), color.alpha()) == tuple(pixels[2, 3])
+
+    np.testing.assert_array_equal(qimage_to_numpy(image), pixels)
+    pil_image = qimage_to_pil(image)
+    assert pil_image.mode == "RGBA" and pil_image.size == (7, 5)
+    np.testing.assert_array_equal(pil_to_numpy(pil_image), pixels)
+    assert pil_to_qimage(pil_image) == image
+    np.testing.assert_array_equal(pil_to_numpy(numpy_to_pil(pixels)), pixels)
+
+
+@pytest.mark.usefixtures("qapp")
+def test_premultiplied_and_rgb_inputs_are_normalized():
+    source = QImage(2, 1, QImage.Format_ARGB32)
+    source.setPixelColor(0, 0, QColor(200, 100, 50, 255))
+    source.setPixelColor(1, 0, QColor(255, 0, 0, 128))
+    premultiplied = source.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+    pixels = qimage_to_numpy(premultiplied)
+    assert tuple(pixels[0, 0]) == (200, 100, 50, 255)
+    assert tuple(pixels[0, 1]) == (255, 0, 0, 128)
+
+    rgb = pil_to_qimage(Image.new("RGB", (2, 2), (1, 2, 3)))
+    assert rgb.pixelColor(1, 1) == QColor(1, 2, 3, 255)
+    assert numpy_to_qimage(np.zeros((1, 1, 3), np.uint8)).pixelColor(0, 0).alpha() == 255
+
+
+@pytest.mark.usefixtures("qapp")
+def test_views_share_the_qimage_buffer_and_conversions_own_theirs():
+    image = QImage(4, 3, QImage.Format_ARGB32)
+    image.fill(QColor(0, 0, 0, 0))
+    shared = QImage(image)
+
+    view = qimage_view(image, writable=True)
+    view[1, 2] = (30, 20, 10, 255)  # memory order is B, G, R, A
+    assert image.pixelColor(2, 1) == QColor(10, 20, 30, 255)
+    assert shared.pixelColor(2, 1).alpha() == 0
+
+    pil_image = qimage_to_pil(image)
+    image.fill(QColor(255, 255, 255, 255))
+    assert pil_image.getpixel((2, 1)) == (10, 20, 30, 255)
+
+    with pytest.raises(ValueError):
+        qimage_view(image.convertToFormat(QImage.Format_RGB32))
+
+
+@pytest.mark.usefixtures("qapp")
+def test_document_helpers_use_direct_conversion(tmp_path):
+    document = Document(6, 4)
+    document.layer_manager.active_layer.image.fill(QColor(12, 34, 56, 200))
+
+    rendered = document.get_current_image_for_ai()
+    assert rendered.getpixel((5, 3)) == (12, 34, 56, 200)
+
+    pasted = QImage(3, 3, QImage.Format_ARGB32_Premultiplied)
+    pasted.fill(QColor(255, 0, 0, 255))
+    document.add_layer_from_clipboard(pasted)
+    assert document.layer_manager.active_layer.image.pixelColor(2, 2) == QColor(255, 0, 0, 255)
+
+    path = tmp_path / "layers.tiff"
+    document.save_tiff(str(path))
+    loaded = Document.load_tiff(str(path))
+    assert [layer.image.pixelColor(0, 0) for layer in loaded.layer_manager.layers] == [
+        QColor(12, 34, 56, 200),
+        QColor(255, 0, 0, 255),
+    ]
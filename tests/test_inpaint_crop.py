@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+from PIL import Image
+
+from portal.ai.image_generator import ImageGenerator
+from portal.ai.inpaint_crop import crop_to_mask, paste_masked
+
+
+class FakeInpaintPipeline:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        size = (kwargs["width"], kwargs["height"])
+        return SimpleNamespace(images=[Image.new("RGB", size, (255, 0, 0))])
+
+
+def _canvas_and_mask(size=(256, 256), box=(100, 120, 110, 126)):
+    image = Image.new("RGBA", size, (0, 0, 255, 255))
+    mask = Image.new("L", size, 0)
+    mask.paste(255, box)
+    return image, mask
+
+
+def test_crop_covers_the_mask_plus_margin_within_the_image():
+    _, mask = _canvas_and_mask(box=(4, 100, 20, 110))
+    region = crop_to_mask(mask, margin=8)
+    assert region.box == (0, 92, 28, 118)
+    assert region.mask.size == region.size == (28, 26)
+    assert crop_to_mask(Image.new("L", (8, 8), 0)) is None
+
+    patch = Image.new("RGB", (14, 13), (255, 0, 0))
+    result = paste_masked(Image.new("RGBA", (256, 256), (0, 0, 255, 255)), patch, region)
+    assert result.getpixel((10, 105)) == (255, 0, 0, 255)
+    assert result.getpixel((2, 95)) == (0, 0, 255, 255)
+
+
+def test_inpaint_diffuses_the_crop_and_keeps_unmasked_pixels(tmp_path):
+    generator = ImageGenerator()
+    generator.pipe = FakeInpaintPipeline()
+    generator.current_model = "SD1.5"
+    image, mask = _canvas_and_mask()
+    options = dict(output_dir=str(tmp_path), generation_size=(1024, 1024), context_margin=16)
+
+    result = generator.inpaint_image(image, mask, "patch", **options)
+    generator.inpaint_image(image, mask.copy(), "patch", **options)
+    full = generator.inpaint_image(image, mask, "patch", crop_to_mask=False, **options)
+
+    cropped_call, _, full_call = generator.pipe.calls
+    assert cropped_call["image"].size == (cropped_call["width"], cropped_call["height"])
+    assert cropped_call["width"] * cropped_call["height"] < full_call["width"] * full_call["height"]
+    assert min(cropped_call["width"], cropped_call["height"]) >= 512
+    assert generator.mask_crop_cache.hits == 1 and generator.mask_crop_cache.misses == 1
+
+    assert result.size == image.size
+    assert result.getpixel((105, 123)) == (255, 0, 0, 255)
+    assert result.getpixel((99, 123)) == (0, 0, 255, 255)
+    assert result.getpixel((0, 0)) == (0, 0, 255, 255)
+    assert full.getpixel((0, 0)) == (255, 0, 0)
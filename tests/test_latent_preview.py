@@ -0,0 +1,62 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from portal.ai import latent_preview
+from portal.ai.latent_preview import latents_to_image, make_step_callback
+
+
+def _latents(size=64, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((1, 4, size, size)).astype(np.float32)
+
+
+def _run_steps(callback, steps, latents):
+    pipe = SimpleNamespace(_interrupt=False)
+    for step in range(steps):
+        callback(pipe, step, 1000 - step, {"latents": latents})
+    return pipe
+
+
+def test_latent_projection_matches_the_image_size():
+    latents = np.zeros((1, 4, 6, 5), np.float32)
+    latents[0, 0] = 1.0
+
+    image = latents_to_image(latents, "SD1.5")
+
+    assert image.mode == "RGB" and image.size == (40, 48)
+    # Channel 0 weights are (0.3512, 0.2297, 0.3227) in [-1, 1].
+    assert image.getpixel((0, 0)) == (172, 156, 168)
+    assert latents_to_image(latents, "SDXL", upscale=False).size == (5, 6)
+
+
+def test_preview_interval_and_mode(monkeypatch):
+    decoded = []
+    monkeypatch.setattr(latent_preview, "decode_latents", lambda pipe, latents: decoded.append(latents) or "image")
+    previews = []
+    cancelled = False
+
+    callback = make_step_callback(previews.append, lambda: cancelled, mode="decode", interval=5)
+    _run_steps(callback, 20, _latents(8))
+    assert len(decoded) == len(previews) == 4
+
+    previews.clear()
+    cancelled = True
+    pipe = _run_steps(make_step_callback(previews.append, lambda: cancelled, mode="off"), 3, _latents(8))
+    assert previews == [] and pipe._interrupt
+
+
+def test_latent_preview_per_step_benchmark():
+    steps = 20
+    for size in (64, 128):  # 512 and 1024 pixel images
+        latents = _latents(size)
+        timings = {}
+        for mode in ("off", "latent"):
+            callback = make_step_callback(lambda image: None, mode=mode)
+            start = time.perf_counter()
+            _run_steps(callback, steps, latents)
+            timings[mode] = (time.perf_counter() - start) / steps
+        # A VAE decode takes seconds per step on CPU; the projection must
+        # stay in the low milliseconds (about 2 ms at 1024px).
+        assert timings["latent"] - timings["off"] < 0.025
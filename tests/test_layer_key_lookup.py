@@ -0,0 +1,86 @@
+import pytest
+
+from portal.core.document import Document
+from portal.core.key import Key
+
+
+def _append_key(layer, frame_number: int) -> Key:
+    key = Key(layer.image.width(), layer.image.height(), frame_number=frame_number)
+    layer._register_key(key)
+    layer.keys.append(key)
+    return key
+
+
+@pytest.mark.usefixtures("qapp")
+def test_index_for_frame_resolves_held_and_leading_frames():
+    document = Document(4, 4)
+    layer = document.layer_manager.active_layer
+    first = layer.keys[0]
+    first.frame_number = 3
+    later = _append_key(layer, 10)
+    middle = _append_key(layer, 6)
+
+    assert layer.keys[layer._index_for_frame(0)] is first
+    assert layer.keys[layer._index_for_frame(3)] is first
+    assert layer.keys[layer._index_for_frame(7)] is middle
+    assert layer.keys[layer._index_for_frame(10)] is later
+    assert layer.keys[layer._index_for_frame(500)] is later
+
+
+@pytest.mark.usefixtures("qapp")
+def test_active_key_tracks_key_list_mutations():
+    document = Document(4, 4)
+    layer_manager = document.layer_manager
+    layer = layer_manager.active_layer
+    base = layer.keys[0]
+    layer_manager.set_current_frame(5)
+
+    assert layer.active_key is base
+
+    inserted = _append_key(layer, 4)
+    assert layer.active_key is inserted
+
+    inserted.frame_number = 8
+    assert layer.active_key is base
+
+    layer.keys.remove(inserted)
+    layer_manager.set_current_frame(9)
+    assert layer.active_key is base
+
+    layer.keys = [base, inserted]
+    assert layer.active_key is inserted
+
+
+@pytest.mark.usefixtures("qapp")
+def test_duplicate_frames_resolve_to_first_key():
+    document = Document(4, 4)
+    layer = document.layer_manager.active_layer
+    first = layer.keys[0]
+    _append_key(layer, 0)
+
+    assert layer.keys[layer._index_for_frame(0)] is first
+
+
+@pytest.mark.usefixtures("qapp")
+def test_set_current_frame_emits_single_batched_notification():
+    document = Document(4, 4)
+    layer_manager = document.layer_manager
+    layer_manager.add_layer("Animated")
+    layer_manager.add_layer("Static")
+    animated = layer_manager.layers[1]
+    static = layer_manager.layers[2]
+    _append_key(animated, 3)
+
+    per_layer_changes = []
+    for layer in layer_manager.layers:
+        layer.on_image_change.connect(lambda layer=layer: per_layer_changes.append(layer))
+    batches = []
+    layer_manager.frame_content_changed.connect(batches.append)
+
+    layer_manager.set_current_frame(1)
+    assert batches == []
+
+    layer_manager.set_current_frame(4)
+    assert batches == [[animated]]
+    assert static not in batches[0]
+    assert per_layer_changes == []
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+HEAVY_MODULES = ("torch", "diffusers", "rembg")
+
+
+def _run(code, extra_path):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    env["PYTHONPATH"] = os.pathsep.join([str(extra_path), ROOT])
+    return subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+def _fake_heavy_modules(tmp_path):
+    # Importable stand-ins, so the check holds whether or not the real
+    # packages are installed here.
+    for name in HEAVY_MODULES:
+        package = tmp_path / name
+        package.mkdir()
+        (package / "__init__.py").write_text("", encoding="utf-8")
+    return tmp_path
+
+
+def test_importing_the_ui_does_not_import_the_ai_stack(tmp_path):
+    path = _fake_heavy_modules(tmp_path)
+    code = (
+        "import sys, portal.ui.ui, portal.ai.image_generator as generator\n"
+        "assert generator.is_torch_available() and generator.REMBG_AVAILABLE\n"
+        f"print([m for m in sys.modules if m.split('.')[0] in {HEAVY_MODULES!r}"
+        " or m == 'portal.ui.ai_panel'])\n"
+    )
+    assert _run(code, path) == "[]"
+
+
+def test_heavy_modules_load_on_first_use(tmp_path):
+    path = _fake_heavy_modules(tmp_path)
+    (path / "rembg" / "__init__.py").write_text("def new_session():\n    return 'session'\n\ndef remove(image, session=None):\n    return 'removed'\n", encoding="utf-8")
+    code = (
+        "import sys\n"
+        "from portal.ai.image_generator import ImageGenerator\n"
+        "assert 'rembg' not in sys.modules\n"
+        "print(ImageGenerator._remove_background(None, 'image'), 'rembg' in sys.modules, 'torch' in sys.modules)\n"
+    )
+    assert _run(code, path) == "removed True False"
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from portal.ai.backends import StubBackend
+from portal.ai.image_generator import ImageGenerator
+from portal.ai.output_writer import INDEX_FILENAME, OutputWriter, read_index
+
+
+def _image(value, size=(16, 16)):
+    return Image.new("RGB", size, (value, value, value))
+
+
+def test_writer_indexes_outputs_and_prunes_the_oldest(tmp_path):
+    stale = tmp_path / "generated_00000000_000000.png"
+    _image(1).save(stale)
+    os.utime(stale, (0, 0))
+    (tmp_path / "notes.png").write_bytes(b"not an output")
+
+    writer = OutputWriter(max_files=3)
+    try:
+        for value in range(4):
+            writer.submit(_image(value), str(tmp_path / f"generated_{value}.png"), {"seed": value})
+        writer.flush()
+    finally:
+        writer.close()
+
+    assert sorted(os.listdir(tmp_path)) == [
+        "generated_1.png", "generated_2.png", "generated_3.png", INDEX_FILENAME, "notes.png",
+    ]
+    assert [entry["seed"] for entry in read_index(str(tmp_path))] == [1, 2, 3]
+    assert writer.lookup(str(tmp_path / "generated_2.png"))["seed"] == 2
+    assert writer.lookup(str(tmp_path / "generated_0.png")) is None
+
+    # Byte limits keep the newest files that fit.
+    size = os.path.getsize(tmp_path / "generated_3.png")
+    writer = OutputWriter(max_bytes=size * 2)
+    writer.submit(_image(9), str(tmp_path / "generated_9.png"))
+    writer.close()
+    assert [entry["file"] for entry in read_index(str(tmp_path))] == ["generated_3.png", "generated_9.png"]
+
+
+def test_submit_blocks_while_the_queue_is_full(tmp_path):
+    release = threading.Event()
+
+    class SlowImage:
+        def save(self, path, **_options):
+            release.wait(5)
+            _image(0).save(path, format="PNG")
+
+    writer = OutputWriter(queue_size=1)
+    writer.submit(SlowImage(), str(tmp_path / "generated_a.png"))
+    writer.submit(_image(1), str(tmp_path / "generated_b.png"))
+    third = threading.Thread(target=writer.submit, args=(_image(2), str(tmp_path / "generated_c.png")))
+    third.start()
+    third.join(0.2)
+    assert third.is_alive()
+
+    release.set()
+    third.join(5)
+    writer.close()
+    assert writer.written == 3 and writer.failed == 0
+
+
+def test_generation_returns_before_the_output_is_written(tmp_path, monkeypatch):
+    generator = ImageGenerator(backend=StubBackend())
+    generator.load_pipeline("SD1.5")
+    generator.output_writer = OutputWriter(compress_level=1)
+    options = dict(original_size=(32, 32), generation_size=(1024, 1024), num_inference_steps=2,
+                   output_dir=str(tmp_path))
+    release = threading.Event()
+    write = generator.output_writer._write
+    monkeypatch.setattr(generator.output_writer, "_write", lambda task: release.wait(5) and write(task))
+
+    try:
+        start = time.perf_counter()
+        generator.prompt_to_image("knight", seed=7, num_images_per_prompt=2, **options)
+        returned = time.perf_counter() - start
+        # Nothing is on disk yet: the writer is still blocked.
+        assert read_index(str(tmp_path)) == [] and not list(tmp_path.glob("*.png"))
+        assert returned < 2.0
+        release.set()
+        generator.prompt_to_image("knight", seed=7, **options)
+    finally:
+        release.set()
+        generator.shutdown()
+
+    entries = read_index(str(tmp_path))
+    assert [entry["seed"] for entry in entries] == [7, 8, 7]
+    assert entries[0]["prompt"] == "knight" and entries[0]["model"] == "SD1.5"
+    assert entries[0]["size"] == [1024, 1024] and entries[0]["mode"] == "txt2img"
+    assert len({entry["file"] for entry in entries}) == 3
+    with Image.open(tmp_path / entries[-1]["file"]) as saved:
+        assert saved.size == (1024, 1024)
+        assert np.asarray(saved).any()
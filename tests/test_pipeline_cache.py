@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import pytest
+
+from portal.ai import image_generator
+from portal.ai.image_generator import ImageGenerator
+from portal.ai.pipeline_cache import PipelineCache
+
+MB = 1 << 20
+
+
+class FakeTensor:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+    def numel(self):
+        return self.nbytes
+
+    def element_size(self):
+        return 1
+
+
+class FakeModule:
+    def __init__(self, nbytes):
+        self._tensors = [FakeTensor(nbytes)]
+
+    def parameters(self):
+        return iter(self._tensors)
+
+
+class FakePipeline:
+    disk_loads = 0
+
+    def __init__(self, components):
+        self.components = components
+
+    @classmethod
+    def from_single_file(cls, path, **kwargs):
+        FakePipeline.disk_loads += 1
+        return cls({"unet": FakeModule(100 * MB), "vae": FakeModule(10 * MB)})
+
+    @classmethod
+    def from_pipe(cls, pipe):
+        return cls(dict(pipe.components))
+
+    def to(self, device):
+        return self
+
+
+def test_shared_components_count_once_and_lru_is_evicted_first():
+    evicted = []
+    cache = PipelineCache(max_pipelines=3, max_bytes=250 * MB, on_evict=lambda key, pipe: evicted.append(key))
+    base = FakePipeline.from_single_file("a")
+    cache.put("A", "txt2img", base)
+    cache.put("A", "img2img", FakePipeline.from_pipe(base))
+    assert cache.memory_bytes() == 110 * MB
+
+    cache.put("B", "txt2img", FakePipeline.from_single_file("b"))
+    assert cache.get("A", "txt2img") is base
+    cache.put("C", "txt2img", FakePipeline.from_single_file("c"))
+
+    # Over both caps: A/img2img is least recently used, then B.
+    assert evicted == [("A", "img2img"), ("B", "txt2img")]
+    assert cache.keys() == [("A", "txt2img"), ("C", "txt2img")]
+    assert cache.memory_bytes() == 220 * MB
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+@pytest.fixture()
+def fake_backend(monkeypatch):
+    FakePipeline.disk_loads = 0
+    monkeypatch.setattr(image_generator, "is_torch_available", lambda: True)
+    monkeypatch.setattr(image_generator, "is_diffusers_available", lambda: True)
+    monkeypatch.setattr(image_generator, "is_cuda_available", lambda: False)
+    monkeypatch.setattr(
+        image_generator, "_import_optional_module", lambda name: SimpleNamespace(float16="fp16", float32="fp32")
+    )
+    monkeypatch.setattr(image_generator, "_pipeline_class", lambda name: FakePipeline)
+
+
+@pytest.mark.usefixtures("fake_backend")
+def test_switching_modes_reuses_loaded_weights():
+    generator = ImageGenerator()
+
+    txt2img = generator.load_pipeline("SD1.5")
+    assert generator.last_load.source == "disk"
+    inpaint = generator.load_pipeline("SD1.5", is_img2img=True, is_inpaint=True)
+    assert generator.last_load.source == "derived"
+    assert inpaint.components["unet"] is txt2img.components["unet"]
+    assert generator.load_pipeline("SD1.5") is txt2img
+    assert generator.last_load.hit
+    assert FakePipeline.disk_loads == 1
+    assert (generator.pipeline_cache.hits, generator.pipeline_cache.misses) == (1, 2)
+
+    generator.cleanup()
+    assert generator.pipe is None and len(generator.pipeline_cache) == 0
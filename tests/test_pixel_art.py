@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+from PIL import Image
+
+from portal.ai.pixel_art import PixelArtOptions, pixelate
+
+
+def _cells_image():
+    # Two 4x4 cells: mostly red with a stray blue pixel, and mostly green.
+    pixels = np.zeros((4, 8, 3), np.uint8)
+    pixels[:, :4] = (200, 0, 0)
+    pixels[1, 2] = (0, 0, 255)
+    pixels[:, 4:] = (0, 180, 0)
+    pixels[0, 4:6] = (250, 250, 250)
+    return Image.fromarray(pixels, "RGB")
+
+
+def test_mode_keeps_the_dominant_colour_of_each_cell():
+    for colors in (0, 4):
+        result = pixelate(_cells_image(), (2, 1), PixelArtOptions(colors=colors))
+        assert result.mode == "RGB"
+        assert [result.getpixel((x, 0)) for x in range(2)] == [(200, 0, 0), (0, 180, 0)]
+
+
+def test_palette_cleanup_and_alpha_binarization():
+    rng = np.random.default_rng(1)
+    noisy = Image.fromarray(rng.integers(0, 256, (32, 32, 3), dtype=np.uint8), "RGB")
+    palette = ["#000000", "#ffffff", "#ff0000"]
+    result = pixelate(noisy, (8, 8), PixelArtOptions(downsample="median"), palette=palette)
+    colors = {tuple(color) for color in np.asarray(result).reshape(-1, 3).tolist()}
+    assert colors <= {(0, 0, 0), (255, 255, 255), (255, 0, 0)}
+
+    orphan = np.zeros((3, 3, 4), np.uint8)
+    orphan[..., 3] = 255
+    orphan[1, 1] = (255, 255, 255, 100)
+    result = pixelate(Image.fromarray(orphan, "RGBA"), (3, 3), PixelArtOptions(colors=0))
+    assert result.getpixel((1, 1)) == (0, 0, 0, 255)
+    result = pixelate(Image.fromarray(orphan, "RGBA"), (3, 3), PixelArtOptions(colors=0, cleanup=False))
+    assert result.getpixel((1, 1)) == (255, 255, 255, 0)
+
+
+def test_pixelate_benchmark():
+    rng = np.random.default_rng(0)
+    sprite = Image.fromarray(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8), "RGB")
+    generated = sprite.resize((1024, 1024), Image.Resampling.BILINEAR)
+    for options in (PixelArtOptions(), PixelArtOptions(downsample="median")):
+        pixelate(generated, (64, 64), options)
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            result = pixelate(generated, (64, 64), options)
+            timings.append(time.perf_counter() - start)
+        assert result.size == (64, 64)
+        # Tens of milliseconds at 1024²; the bound leaves room for slow machines.
+        assert min(timings) < 0.2
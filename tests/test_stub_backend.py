@@ -0,0 +1,81 @@
+import statistics
+import time
+from types import SimpleNamespace
+
+import pytest
+from PySide6.QtWidgets import QLabel
+
+from portal.ai.backends import StubBackend, StubPipeline
+from portal.ai.enums import GenerationMode
+from portal.ai.image_generator import ImageGenerator
+from portal.core.app import App
+from portal.ui.ai_panel import AIPanel
+
+
+def _generator(tmp_path, **backend_options):
+    generator = ImageGenerator(backend=StubBackend(**backend_options))
+    generator.defaults["output_dir"] = str(tmp_path)
+    return generator
+
+
+def test_stub_pipeline_honours_steps_sizes_callbacks_and_interrupt(tmp_path):
+    generator = _generator(tmp_path)
+    generator.load_pipeline("SD1.5")
+    assert isinstance(generator.pipe, StubPipeline)
+    progress, previews = [], []
+    options = dict(original_size=(32, 32), generation_size=(64, 48), num_inference_steps=6)
+
+    first = generator.prompt_to_image(
+        "knight", step_callback=previews.append, progress_callback=progress.append, **options
+    )
+    second = generator.prompt_to_image("knight", **options)
+
+    assert progress == [1, 2, 3, 4, 5, 6]
+    assert [preview.size for preview in previews] == [(64, 48)] * 6
+    assert first.size == (32, 32) and first.tobytes() == second.tobytes()
+
+    generator.prompt_to_image("knight", cancellation_token=lambda: True, **options)
+    assert generator.pipe.steps_run == 1
+
+    generator.load_pipeline("SD1.5", is_img2img=True)
+    assert generator.last_load.source == "derived"
+    progress.clear()
+    generator.image_to_image(
+        first, "knight", strength=0.5, num_inference_steps=10, progress_callback=progress.append
+    )
+    assert progress == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.usefixtures("qapp")
+def test_start_generation_to_layer_insert_benchmark(qtbot, tmp_path, monkeypatch):
+    app = App()
+    app.document_controller.new_document(64, 64)
+    monkeypatch.setattr(app, "save_settings", lambda: None)
+    generator = _generator(tmp_path)
+    generator.defaults["result_cache_dir"] = str(tmp_path / "cache")
+    preview_panel = SimpleNamespace(preview_label=QLabel(), update_preview=lambda: None)
+    panel = AIPanel(app, preview_panel, image_generator=generator)
+    panel.image_generated.connect(app.add_new_layer_with_image)
+    panel.steps_slider.setValue(20)
+    layers = app.document.layer_manager.layers
+
+    timings = []
+    try:
+        for _ in range(5):
+            count = len(layers)
+            start = time.perf_counter()
+            assert panel.start_generation(GenerationMode.PROMPT_TO_IMAGE) is not None
+            qtbot.waitUntil(lambda: len(layers) == count + 1, timeout=10000)
+            timings.append(time.perf_counter() - start)
+    finally:
+        panel.worker.stop()
+        generator.shutdown()
+
+    inserted = layers[-1].image
+    assert (inserted.width(), inserted.height()) == (64, 64)
+    assert inserted.pixelColor(32, 32).alpha() == 255
+    assert generator.last_load.model == panel.model_combo.currentText()
+    assert layers[-1].image == layers[-2].image
+    # The stub pipeline takes a few milliseconds; everything else is the
+    # queue, post-processing and layer insertion around it.
+    assert statistics.median(timings) < 1.0
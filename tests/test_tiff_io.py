@@ -0,0 +1,98 @@
+import gc
+import weakref
+
+import pytest
+from PIL import Image
+from PySide6.QtGui import QColor
+
+from portal.core import tiff_io
+from portal.core.document import Document
+
+COLORS = [QColor(255, 0, 0, 255), QColor(0, 255, 0, 128), QColor(0, 0, 255, 64)]
+
+
+def _layered_document() -> Document:
+    document = Document(8, 6)
+    manager = document.layer_manager
+    while len(manager.layers) < len(COLORS):
+        manager.add_layer(f"Layer {len(manager.layers) + 1}")
+    for layer, color in zip(manager.layers, COLORS):
+        layer.image.fill(color)
+    manager.layers[1].visible = False
+    manager.layers[2].opacity = 0.5
+    return document
+
+
+@pytest.mark.usefixtures("qapp")
+def test_tiff_pages_decode_when_their_layer_is_used(tmp_path):
+    path = tmp_path / "layers.tiff"
+    _layered_document().save_tiff(str(path))
+    with Image.open(path) as image:
+        assert image.n_frames == 3
+
+    loaded = Document.load_tiff(str(path))
+    layers = loaded.layer_manager.layers
+
+    assert [layer.name for layer in layers] == ["Background", "Layer 2", "Layer 3"]
+    assert [layer.visible for layer in layers] == [True, False, True]
+    assert layers[2].opacity == 0.5
+    assert not any(layer.keys[0].is_loaded for layer in layers)
+
+    assert layers[1].image.pixelColor(7, 5) == COLORS[1]
+    assert [layer.keys[0].is_loaded for layer in layers] == [False, True, False]
+    assert [layer.image.pixelColor(0, 0) for layer in layers] == COLORS
+
+
+@pytest.mark.usefixtures("qapp")
+def test_saving_leaves_undecoded_pages_undecoded(tmp_path):
+    path = tmp_path / "layers.tiff"
+    _layered_document().save_tiff(str(path))
+    loaded = Document.load_tiff(str(path))
+    layers = loaded.layer_manager.layers
+    layers[1].image.fill(QColor(9, 9, 9, 255))
+
+    copy_path = tmp_path / "copy.tiff"
+    loaded.save_tiff(str(copy_path))
+
+    assert [layer.keys[0].is_loaded for layer in layers] == [False, True, False]
+    copied = Document.load_tiff(str(copy_path)).layer_manager.layers
+    assert [layer.image.pixelColor(0, 0) for layer in copied] == [COLORS[0], QColor(9, 9, 9, 255), COLORS[2]]
+
+
+@pytest.mark.usefixtures("qapp")
+def test_saving_over_the_source_keeps_undecoded_clones_intact(tmp_path):
+    path = tmp_path / "layers.tiff"
+    _layered_document().save_tiff(str(path))
+    loaded = Document.load_tiff(str(path))
+    snapshot = loaded.snapshot()
+
+    loaded.layer_manager.layers[0].image.fill(QColor(9, 9, 9, 255))
+    loaded.save_tiff(str(path))
+
+    assert [layer.keys[0].is_loaded for layer in snapshot.layer_manager.layers] == [False] * 3
+    assert snapshot.layer_manager.layers[0].image.pixelColor(0, 0) == COLORS[0]
+    reloaded = Document.load_tiff(str(path))
+    assert reloaded.layer_manager.layers[0].image.pixelColor(0, 0) == QColor(9, 9, 9, 255)
+
+
+@pytest.mark.usefixtures("qapp")
+def test_save_converts_one_page_at_a_time(tmp_path, monkeypatch):
+    document = _layered_document()
+    live_pages = []
+    most_alive = 0
+    original = tiff_io.qimage_to_pil
+
+    def tracking(image):
+        nonlocal most_alive
+        gc.collect()
+        alive = sum(1 for ref in live_pages if ref() is not None)
+        most_alive = max(most_alive, alive)
+        page = original(image)
+        live_pages.append(weakref.ref(page))
+        return page
+
+    monkeypatch.setattr(tiff_io, "qimage_to_pil", tracking)
+    document.save_tiff(str(tmp_path / "streamed.tiff"))
+
+    assert len(live_pages) == 3
+    assert most_alive == 0